@@ -0,0 +1,33 @@
+"""notify on run_events insert
+
+Revision ID: 20250901_0002
+Revises: 20250820_0001
+Create Date: 2025-09-01 00:02:00
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20250901_0002"
+down_revision = "20250820_0001"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # payload is "<run_id>:<event_id>"; the server's event hub LISTENs on this
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_run_event() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('run_events', NEW.run_id::text || ':' || NEW.id::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER run_events_notify
+        AFTER INSERT ON run_events
+        FOR EACH ROW EXECUTE FUNCTION notify_run_event();
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS run_events_notify ON run_events")
+    op.execute("DROP FUNCTION IF EXISTS notify_run_event()")
@@ -0,0 +1,22 @@
+"""run leases for concurrent agent workers
+
+Revision ID: 20250905_0003
+Revises: 20250901_0002
+Create Date: 2025-09-05 00:03:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20250905_0003"
+down_revision = "20250901_0002"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("runs", sa.Column("claimed_by", sa.String(length=100), nullable=True))
+    op.add_column("runs", sa.Column("lease_expires_at", sa.DateTime, nullable=True))
+
+def downgrade() -> None:
+    op.drop_column("runs", "lease_expires_at")
+    op.drop_column("runs", "claimed_by")
@@ -0,0 +1,26 @@
+"""idempotency keys for run events, model -> run link
+
+Revision ID: 20250910_0004
+Revises: 20250905_0003
+Create Date: 2025-09-10 00:04:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20250910_0004"
+down_revision = "20250905_0003"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("run_events", sa.Column("idempotency_key", sa.String(length=100), nullable=True))
+    op.create_unique_constraint("uq_run_events_idempotency", "run_events", ["run_id", "idempotency_key"])
+    op.add_column("models", sa.Column("run_id", sa.Integer, sa.ForeignKey("runs.id"), nullable=True))
+    op.create_unique_constraint("uq_models_run_id", "models", ["run_id"])
+
+def downgrade() -> None:
+    op.drop_constraint("uq_models_run_id", "models", type_="unique")
+    op.drop_column("models", "run_id")
+    op.drop_constraint("uq_run_events_idempotency", "run_events", type_="unique")
+    op.drop_column("run_events", "idempotency_key")
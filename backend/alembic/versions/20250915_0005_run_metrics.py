@@ -0,0 +1,28 @@
+"""append-only run_metrics history
+
+Revision ID: 20250915_0005
+Revises: 20250910_0004
+Create Date: 2025-09-15 00:05:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20250915_0005"
+down_revision = "20250910_0004"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # the (run_id, key, step) primary key doubles as the range-scan index for curve reads
+    op.create_table(
+        "run_metrics",
+        sa.Column("run_id", sa.Integer, sa.ForeignKey("runs.id"), primary_key=True),
+        sa.Column("key", sa.String(length=100), primary_key=True),
+        sa.Column("step", sa.Integer, primary_key=True),
+        sa.Column("value", sa.Float, nullable=False),
+        sa.Column("ts", sa.DateTime, nullable=False),
+    )
+
+def downgrade() -> None:
+    op.drop_table("run_metrics")
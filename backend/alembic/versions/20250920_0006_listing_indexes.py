@@ -0,0 +1,35 @@
+"""indexes for keyset listing of runs, models and apps
+
+Revision ID: 20250920_0006
+Revises: 20250915_0005
+Create Date: 2025-09-20 00:06:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20250920_0006"
+down_revision = "20250915_0005"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index("ix_runs_status_id", "runs", ["status", "id"])
+    op.create_index("ix_runs_workflow_id_id", "runs", ["workflow_id", "id"])
+    op.create_index("ix_runs_created_at", "runs", ["created_at"])
+    op.create_index("ix_models_created_at", "models", ["created_at"])
+    # `apps` is created by the server on startup (apps_routes), not by a migration,
+    # so it may not exist yet; create_all adds these indexes for a fresh table
+    if sa.inspect(op.get_bind()).has_table("apps"):
+        op.create_index("ix_apps_status_id", "apps", ["status", "id"], if_not_exists=True)
+        op.create_index("ix_apps_template_id", "apps", ["template", "id"], if_not_exists=True)
+        op.create_index("ix_apps_created_at", "apps", ["created_at"], if_not_exists=True)
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_apps_created_at")
+    op.execute("DROP INDEX IF EXISTS ix_apps_template_id")
+    op.execute("DROP INDEX IF EXISTS ix_apps_status_id")
+    op.drop_index("ix_models_created_at", table_name="models")
+    op.drop_index("ix_runs_created_at", table_name="runs")
+    op.drop_index("ix_runs_workflow_id_id", table_name="runs")
+    op.drop_index("ix_runs_status_id", table_name="runs")
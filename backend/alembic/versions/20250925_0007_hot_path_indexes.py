@@ -0,0 +1,25 @@
+"""indexes for the run_events replay and agent claim hot paths
+
+Revision ID: 20250925_0007
+Revises: 20250920_0006
+Create Date: 2025-09-25 00:07:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20250925_0007"
+down_revision = "20250920_0006"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index("ix_run_events_run_id_id", "run_events", ["run_id", "id"])
+    op.create_index("ix_runs_queued", "runs", ["id"], postgresql_where=sa.text("status = 'queued'"))
+    op.create_index("ix_runs_running_lease", "runs", ["lease_expires_at"],
+                    postgresql_where=sa.text("status = 'running'"))
+
+def downgrade() -> None:
+    op.drop_index("ix_runs_running_lease", table_name="runs")
+    op.drop_index("ix_runs_queued", table_name="runs")
+    op.drop_index("ix_run_events_run_id_id", table_name="run_events")
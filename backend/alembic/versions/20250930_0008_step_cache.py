@@ -0,0 +1,33 @@
+"""step result cache index
+
+Revision ID: 20250930_0008
+Revises: 20250925_0007
+Create Date: 2025-09-30 00:08:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20250930_0008"
+down_revision = "20250925_0007"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "step_cache",
+        sa.Column("key", sa.String(length=64), primary_key=True),
+        sa.Column("step_type", sa.String(length=100), nullable=False),
+        sa.Column("path", sa.String(length=500), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger, nullable=False),
+        sa.Column("artifact_hash", sa.String(length=64), nullable=False),
+        sa.Column("hits", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("last_used_at", sa.DateTime, nullable=False),
+    )
+    # LRU eviction walks entries oldest-used first
+    op.create_index("ix_step_cache_last_used_at", "step_cache", ["last_used_at"])
+
+def downgrade() -> None:
+    op.drop_index("ix_step_cache_last_used_at", table_name="step_cache")
+    op.drop_table("step_cache")
@@ -0,0 +1,39 @@
+"""content-addressed blob store for generated apps
+
+Revision ID: 20251005_0009
+Revises: 20250930_0008
+Create Date: 2025-10-05 00:09:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251005_0009"
+down_revision = "20250930_0008"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # like `apps`, the server also creates these on startup (apps_routes)
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("app_blobs"):
+        op.create_table(
+            "app_blobs",
+            sa.Column("digest", sa.String(length=64), primary_key=True),
+            sa.Column("size_bytes", sa.BigInteger, nullable=False),
+            sa.Column("refcount", sa.Integer, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+    if not insp.has_table("app_files"):
+        op.create_table(
+            "app_files",
+            sa.Column("app_id", sa.Integer, primary_key=True),
+            sa.Column("path", sa.String(length=300), primary_key=True),
+            sa.Column("digest", sa.String(length=64), sa.ForeignKey("app_blobs.digest"), nullable=False),
+        )
+        op.create_index("ix_app_files_digest", "app_files", ["digest"])
+
+def downgrade() -> None:
+    op.drop_index("ix_app_files_digest", table_name="app_files")
+    op.drop_table("app_files")
+    op.drop_table("app_blobs")
@@ -0,0 +1,31 @@
+"""chunked model artifact uploads
+
+Revision ID: 20251010_0010
+Revises: 20251005_0009
+Create Date: 2025-10-10 00:10:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251010_0010"
+down_revision = "20251005_0009"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("models", sa.Column("size_bytes", sa.BigInteger, nullable=True))
+    op.add_column("models", sa.Column("sha256", sa.String(length=64), nullable=True))
+    op.create_table(
+        "model_parts",
+        sa.Column("model_id", sa.Integer, sa.ForeignKey("models.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("part_number", sa.Integer, primary_key=True),
+        sa.Column("size_bytes", sa.BigInteger, nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("uploaded_at", sa.DateTime, nullable=False),
+    )
+
+def downgrade() -> None:
+    op.drop_table("model_parts")
+    op.drop_column("models", "sha256")
+    op.drop_column("models", "size_bytes")
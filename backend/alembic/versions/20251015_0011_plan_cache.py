@@ -0,0 +1,44 @@
+"""semantic plan cache (pgvector)
+
+Revision ID: 20251015_0011
+Revises: 20251010_0010
+Create Date: 2025-10-15 00:11:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251015_0011"
+down_revision = "20251010_0010"
+branch_labels = None
+depends_on = None
+
+EMBED_DIM = 512   # src.models.PLAN_EMBED_DIM
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.create_table(
+        "plan_cache",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("embedder", sa.String(length=100), nullable=False),
+        sa.Column("entities", sa.String(length=64), nullable=False),
+        sa.Column("prompt_hash", sa.String(length=64), nullable=False),
+        sa.Column("prompt", sa.Text, nullable=False),
+        sa.Column("spec", sa.JSON, nullable=False),
+        sa.Column("planner", sa.String(length=100), nullable=False),
+        sa.Column("hits", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("last_used_at", sa.DateTime, nullable=False),
+    )
+    op.execute(f"ALTER TABLE plan_cache ADD COLUMN embedding vector({EMBED_DIM}) NOT NULL")
+    op.create_index("ix_plan_cache_lookup", "plan_cache", ["embedder", "entities", "prompt_hash"])
+    # approximate nearest neighbour search by cosine distance (ORDER BY embedding <=> :q LIMIT k)
+    op.execute(
+        "CREATE INDEX ix_plan_cache_embedding ON plan_cache "
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_plan_cache_embedding", table_name="plan_cache")
+    op.drop_index("ix_plan_cache_lookup", table_name="plan_cache")
+    op.drop_table("plan_cache")
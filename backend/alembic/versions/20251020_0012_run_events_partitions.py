@@ -0,0 +1,148 @@
+"""monthly range partitions for run_events, archive offset index
+
+Revision ID: 20251020_0012
+Revises: 20251015_0011
+Create Date: 2025-10-20 00:12:00
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251020_0012"
+down_revision = "20251015_0011"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 2   # src.event_archive.PARTITION_MONTHS_AHEAD keeps this many ready
+
+COLUMNS = "id, run_id, ts, level, title, detail, idempotency_key"
+
+
+def _add_months(d: datetime, n: int) -> datetime:
+    m = d.month - 1 + n
+    return d.replace(year=d.year + m // 12, month=m % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "run_event_archive",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("run_id", sa.Integer, sa.ForeignKey("runs.id"), nullable=False),
+        sa.Column("segment", sa.String(length=255), nullable=False),
+        sa.Column("offset", sa.BigInteger, nullable=False),
+        sa.Column("length", sa.Integer, nullable=False),
+        sa.Column("first_id", sa.Integer, nullable=False),
+        sa.Column("last_id", sa.Integer, nullable=False),
+        sa.Column("count", sa.Integer, nullable=False),
+        sa.Column("first_ts", sa.DateTime, nullable=False),
+        sa.Column("last_ts", sa.DateTime, nullable=False),
+        sa.Column("archived_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_run_event_archive_run", "run_event_archive", ["run_id", "first_id"])
+
+    # swap in a partitioned parent: keep the id sequence, copy the rows, then
+    # build indexes and triggers once on the filled partitions
+    op.execute("ALTER TABLE run_events RENAME TO run_events_unpartitioned")
+    op.execute("ALTER TABLE run_events_unpartitioned RENAME CONSTRAINT run_events_pkey TO run_events_unpartitioned_pkey")
+    op.execute("ALTER SEQUENCE run_events_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE run_events (
+            id integer NOT NULL DEFAULT nextval('run_events_id_seq'),
+            run_id integer NOT NULL REFERENCES runs (id),
+            ts timestamp without time zone NOT NULL,
+            level varchar(20) NOT NULL,
+            title varchar(200) NOT NULL,
+            detail varchar(4000),
+            idempotency_key varchar(100),
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts)
+    """)
+    bind = op.get_bind()
+    oldest = bind.execute(sa.text("SELECT MIN(ts) FROM run_events_unpartitioned")).scalar()
+    now = datetime.utcnow()
+    month = _add_months(min(oldest or now, now), 0)
+    last = _add_months(now, MONTHS_AHEAD)
+    while month <= last:
+        nxt = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE run_events_p{month:%Y%m} PARTITION OF run_events "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{nxt:%Y-%m-%d}')"
+        )
+        month = nxt
+    # anything outside the monthly ranges (clock skew, far-future client ts)
+    op.execute("CREATE TABLE run_events_default PARTITION OF run_events DEFAULT")
+
+    op.execute(f"INSERT INTO run_events ({COLUMNS}) SELECT {COLUMNS} FROM run_events_unpartitioned")
+    op.execute("DROP TABLE run_events_unpartitioned")
+    op.execute("ALTER SEQUENCE run_events_id_seq OWNED BY run_events.id")
+
+    op.execute("CREATE INDEX ix_run_events_run_id_id ON run_events (run_id, id)")
+    op.execute("CREATE INDEX ix_run_events_idempotency ON run_events (run_id, idempotency_key) "
+               "WHERE idempotency_key IS NOT NULL")
+
+    # retried callbacks: skip a row whose (run_id, idempotency_key) exists in
+    # any partition; the advisory lock serializes concurrent retries of one key
+    op.execute("""
+        CREATE OR REPLACE FUNCTION run_events_dedupe() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.idempotency_key IS NULL THEN
+                RETURN NEW;
+            END IF;
+            PERFORM pg_advisory_xact_lock(NEW.run_id, hashtext(NEW.idempotency_key));
+            IF EXISTS (SELECT 1 FROM run_events
+                       WHERE run_id = NEW.run_id AND idempotency_key = NEW.idempotency_key) THEN
+                RETURN NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER run_events_dedupe
+        BEFORE INSERT ON run_events
+        FOR EACH ROW EXECUTE FUNCTION run_events_dedupe();
+    """)
+    op.execute("""
+        CREATE TRIGGER run_events_notify
+        AFTER INSERT ON run_events
+        FOR EACH ROW EXECUTE FUNCTION notify_run_event();
+    """)
+    op.execute("ANALYZE run_events")
+
+
+def downgrade() -> None:
+    # archived events stay in their segment files; only live rows come back
+    op.execute("ALTER TABLE run_events RENAME TO run_events_partitioned")
+    op.execute("ALTER TABLE run_events_partitioned RENAME CONSTRAINT run_events_pkey TO run_events_partitioned_pkey")
+    op.execute("ALTER SEQUENCE run_events_id_seq OWNED BY NONE")
+    op.execute("DROP TRIGGER IF EXISTS run_events_notify ON run_events_partitioned")
+    op.execute("DROP TRIGGER IF EXISTS run_events_dedupe ON run_events_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS run_events_dedupe()")
+    op.execute("DROP INDEX IF EXISTS ix_run_events_run_id_id")
+    op.execute("DROP INDEX IF EXISTS ix_run_events_idempotency")
+    op.execute("""
+        CREATE TABLE run_events (
+            id integer PRIMARY KEY DEFAULT nextval('run_events_id_seq'),
+            run_id integer NOT NULL REFERENCES runs (id),
+            ts timestamp without time zone NOT NULL,
+            level varchar(20) NOT NULL,
+            title varchar(200) NOT NULL,
+            detail varchar(4000),
+            idempotency_key varchar(100),
+            CONSTRAINT uq_run_events_idempotency UNIQUE (run_id, idempotency_key)
+        )
+    """)
+    op.execute(f"INSERT INTO run_events ({COLUMNS}) SELECT {COLUMNS} FROM run_events_partitioned "
+               "ON CONFLICT DO NOTHING")
+    op.execute("DROP TABLE run_events_partitioned CASCADE")
+    op.execute("ALTER SEQUENCE run_events_id_seq OWNED BY run_events.id")
+    op.execute("CREATE INDEX ix_run_events_run_id_id ON run_events (run_id, id)")
+    op.execute("""
+        CREATE TRIGGER run_events_notify
+        AFTER INSERT ON run_events
+        FOR EACH ROW EXECUTE FUNCTION notify_run_event();
+    """)
+    op.drop_index("ix_run_event_archive_run", table_name="run_event_archive")
+    op.drop_table("run_event_archive")
@@ -0,0 +1,33 @@
+"""full-text search vector on run_events
+
+Revision ID: 20251025_0013
+Revises: 20251020_0012
+Create Date: 2025-10-25 00:13:00
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20251025_0013"
+down_revision = "20251020_0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # stored generated column: Postgres fills it on every insert (and on the
+    # copy into a new partition), no trigger or application code involved.
+    # Adding it rewrites each partition once.
+    op.execute("""
+        ALTER TABLE run_events ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(detail, '')), 'B')
+        ) STORED
+    """)
+    # on the partitioned parent: every partition (current and future) gets its own
+    op.execute("CREATE INDEX ix_run_events_search ON run_events USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_run_events_search")
+    op.execute("ALTER TABLE run_events DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,20 @@
+"""mark model artifacts being assembled
+
+Revision ID: 20251030_0014
+Revises: 20251025_0013
+Create Date: 2025-10-30 00:14:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251030_0014"
+down_revision = "20251025_0013"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("models", sa.Column("assembling_at", sa.DateTime, nullable=True))
+
+def downgrade() -> None:
+    op.drop_column("models", "assembling_at")
@@ -0,0 +1,132 @@
+# backend/benchmarks/bench_indexes.py
+# Seed a scratch database with lots of run events and time the two hot
+# queries with and without their indexes:
+#   - WebSocket replay / hub fan-out: run_events WHERE run_id = ? AND id > ? ORDER BY id
+#   - agent claim queue:              runs WHERE status = 'queued' ORDER BY id
+#
+#   python -m benchmarks.bench_indexes --events 5000000
+#   python -m benchmarks.bench_indexes --database-url postgresql+psycopg2://.../scratch_db
+#
+# Point it at a scratch database only: it creates and fills the tables.
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from src.database import Base
+from src import models  # noqa: F401
+from src.models import Run, RunEvent
+
+def _index(table, name):
+    return next(ix for ix in table.indexes if ix.name == name)
+
+HOT_INDEXES = [
+    _index(RunEvent.__table__, "ix_run_events_run_id_id"),
+    _index(Run.__table__, "ix_runs_queued"),
+]
+# other indexes that happen to serve the same queries; dropped too so "before"
+# matches the original schema (SQLite can't drop the unique constraint's index)
+INCIDENTAL_INDEXES = [_index(Run.__table__, "ix_runs_status_id")]
+
+REPLAY_SQL = text(
+    "SELECT id, ts, level, title, detail FROM run_events "
+    "WHERE run_id = :run_id AND id > :last_id ORDER BY id LIMIT 500"
+)
+CLAIM_SQL = text("SELECT id FROM runs WHERE status = 'queued' ORDER BY id LIMIT 10")
+
+
+def seed(engine, n_runs: int, n_events: int, queued_ratio: float):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    pg = engine.dialect.name == "postgresql"
+    series = ("generate_series(1, :n) AS s(i)" if pg else "s")
+    prefix = "" if pg else "WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < :n) "
+    every = max(1, int(1 / queued_ratio)) if queued_ratio > 0 else n_runs + 1
+    with engine.begin() as conn:
+        status = f"CASE WHEN i % {every} = 0 THEN 'queued' ELSE 'completed' END"
+        if pg:
+            status = f"CAST({status} AS runstatus)"
+        conn.execute(text(
+            prefix + "INSERT INTO runs (status, created_at, updated_at) "
+            f"SELECT {status}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM {series}"
+        ), {"n": n_runs})
+        # events interleaved across runs, like concurrent pipelines logging
+        conn.execute(text(
+            prefix + "INSERT INTO run_events (run_id, ts, level, title, detail) "
+            f"SELECT (i % :runs) + 1, CURRENT_TIMESTAMP, 'info', 'Step ' || i, 'seeded event' FROM {series}"
+        ), {"n": n_events, "runs": n_runs})
+        if pg:
+            conn.execute(text("ANALYZE runs"))
+            conn.execute(text("ANALYZE run_events"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def _timed(conn, stmt, params_fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        params = params_fn()
+        t0 = time.perf_counter()
+        conn.execute(stmt, params).fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    q = statistics.quantiles(samples, n=100)
+    return {"p50_ms": round(q[49], 3), "p95_ms": round(q[94], 3), "max_ms": round(samples[-1], 3)}
+
+
+def measure(engine, n_runs: int, iterations: int):
+    with engine.connect() as conn:
+        max_id = conn.execute(text("SELECT MAX(id) FROM run_events")).scalar() or 0
+        # tail replay: what a reconnecting client / the hub asks for
+        replay = _timed(conn, REPLAY_SQL, lambda: {
+            "run_id": random.randint(1, n_runs),
+            "last_id": max(0, max_id - random.randint(0, max_id // 10 or 1)),
+        }, iterations)
+        claim = _timed(conn, CLAIM_SQL, dict, iterations)
+    return {"replay": replay, "claim": claim}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--database-url", default=None, help="scratch DB (default: temp SQLite file)")
+    ap.add_argument("--runs", type=int, default=200_000)
+    ap.add_argument("--events", type=int, default=2_000_000)
+    ap.add_argument("--queued-ratio", type=float, default=0.0001)
+    ap.add_argument("--iterations", type=int, default=200)
+    args = ap.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url, future=True)
+
+    t0 = time.perf_counter()
+    seed(engine, args.runs, args.events, args.queued_ratio)
+    seed_s = time.perf_counter() - t0
+
+    pg = engine.dialect.name == "postgresql"
+    for ix in HOT_INDEXES + INCIDENTAL_INDEXES:
+        ix.drop(engine, checkfirst=True)
+    if pg:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE run_events DROP CONSTRAINT uq_run_events_idempotency"))
+    before = measure(engine, args.runs, args.iterations)
+    for ix in HOT_INDEXES:
+        ix.create(engine, checkfirst=True)
+    after = measure(engine, args.runs, args.iterations)
+
+    print(json.dumps({
+        "dialect": engine.dialect.name,
+        "runs": args.runs,
+        "events": args.events,
+        "seed_seconds": round(seed_s, 2),
+        "before": before,
+        "after": after,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
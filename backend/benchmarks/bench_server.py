@@ -0,0 +1,371 @@
+# backend/benchmarks/bench_server.py
+# Load test for the backend: boots the app under uvicorn on a scratch
+# database, seeds it and drives the hot paths end to end over HTTP and
+# WebSockets. Prints JSON: p50/p95/p99/max latency and throughput per
+# operation, plus the DB statements each scenario cost the server (from its
+# /metrics).
+#
+#   scenarios      what is measured
+#   runs_burst     POST /api/runs from many concurrent clients
+#   ws_fanout      N subscribers on /ws/runs/{id}: connect time and
+#                  event delivery latency (callback POST -> WebSocket frame)
+#   callbacks      trainer callback storm: events:batch, PUT metrics and
+#                  metrics:batch from many simulated trainers at once
+#   list_runs      GET /api/runs on a seeded runs table: first page, deep
+#                  keyset pages, cursor walks, status filter
+#   appgen         app generation burst: submit latency and time to ready
+#
+#   python -m benchmarks.bench_server --scale smoke
+#   python -m benchmarks.bench_server --scale full --database-url postgresql+psycopg2://.../scratch_db
+#   python -m benchmarks.bench_server --out results.json --baseline baseline.json --tolerance 0.2
+#
+# With --baseline, every op is compared against the stored results and the
+# process exits 1 when something regressed (see harness.compare), so a CI job
+# can keep a baseline.json per machine and fail on slowdowns. Compare runs
+# from the same machine, scale and dialect only.
+#
+# Point it at a scratch database only: it drops and recreates the schema
+# (unless --keep-db). Needs httpx and websockets (test deps / uvicorn[standard]).
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import websockets
+from sqlalchemy import create_engine, text
+
+from benchmarks.harness import (
+    Recorder, Server, compare, load_json, meta, prepare_database, print_comparison,
+    raise_fd_limit, scrape_counter,
+)
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "smoke": dict(burst_runs=200, burst_concurrency=20,
+                  ws_subscribers=50, ws_runs=5, ws_events=5,
+                  cb_trainers=10, cb_steps=10,
+                  list_rows=50_000, list_requests=100,
+                  appgen_apps=10, appgen_concurrency=5),
+    "default": dict(burst_runs=2_000, burst_concurrency=50,
+                    ws_subscribers=1_000, ws_runs=20, ws_events=20,
+                    cb_trainers=50, cb_steps=40,
+                    list_rows=1_000_000, list_requests=500,
+                    appgen_apps=50, appgen_concurrency=20),
+    "full": dict(burst_runs=10_000, burst_concurrency=100,
+                 ws_subscribers=1_000, ws_runs=50, ws_events=50,
+                 cb_trainers=200, cb_steps=50,
+                 list_rows=10_000_000, list_requests=2_000,
+                 appgen_apps=200, appgen_concurrency=50),
+}
+SCENARIOS = ("runs_burst", "ws_fanout", "callbacks", "list_runs", "appgen")
+NOOP_PIPELINE = {"pipeline": {"steps": [{"type": "noop"}]}}
+EVENTS_PER_BATCH = 10
+SEED_CHUNK = 1_000_000
+
+
+async def _bounded(n: int, concurrency: int, fn: Callable[[int], Any]):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            await fn(i)
+
+    await asyncio.gather(*(one(i) for i in range(n)), return_exceptions=True)
+
+
+async def _create_runs(client: httpx.AsyncClient, n: int) -> List[int]:
+    ids = []
+    for _ in range(n):
+        r = await client.post("/api/runs", json=NOOP_PIPELINE)
+        r.raise_for_status()
+        ids.append(r.json()["run_id"])
+    return ids
+
+
+# --- scenarios ---
+async def runs_burst(server: Server, client: httpx.AsyncClient, s: Dict[str, int]) -> Recorder:
+    rec = Recorder()
+
+    async def create(i):
+        with rec.timed("POST /api/runs"):
+            (await client.post("/api/runs", json=NOOP_PIPELINE)).raise_for_status()
+
+    await _bounded(s["burst_runs"], s["burst_concurrency"], create)
+    return rec
+
+
+async def ws_fanout(server: Server, client: httpx.AsyncClient, s: Dict[str, int]) -> Recorder:
+    rec = Recorder()
+    run_ids = await _create_runs(client, s["ws_runs"])
+    expected = s["ws_events"]
+    received = [0] * s["ws_subscribers"]
+    ready = [asyncio.Event() for _ in range(s["ws_subscribers"])]
+    done = asyncio.Event()
+    pending = [s["ws_subscribers"] * expected]
+    conns: List[Any] = [None] * s["ws_subscribers"]
+
+    async def subscriber(i: int):
+        uri = f"{server.ws_base}/ws/runs/{run_ids[i % len(run_ids)]}"
+        t0 = time.perf_counter()
+        try:
+            ws = await websockets.connect(uri, open_timeout=60, max_queue=None, ping_interval=None)
+        except Exception:
+            rec.error("ws connect")
+            ready[i].set()
+            return
+        rec.add("ws connect", (time.perf_counter() - t0) * 1000)
+        conns[i] = ws
+        try:
+            async for msg in ws:
+                ev = json.loads(msg)
+                detail = ev.get("detail") or ""
+                if not detail.startswith("bench:"):
+                    ready[i].set()   # "Run queued" replayed: subscribed and caught up
+                    continue
+                rec.add("ws delivery", (time.perf_counter() - float(detail[6:])) * 1000)
+                received[i] += 1
+                pending[0] -= 1
+                if pending[0] <= 0:
+                    done.set()
+        except websockets.ConnectionClosed:
+            pass
+
+    # the server's accept backlog is the limit, not the bench: connect in waves
+    sem = asyncio.Semaphore(100)
+
+    async def connect(i):
+        async with sem:
+            task = asyncio.create_task(subscriber(i))
+            await ready[i].wait()
+            return task
+
+    tasks = await asyncio.gather(*(connect(i) for i in range(s["ws_subscribers"])))
+
+    for k in range(expected):
+        for run_id in run_ids:
+            with rec.timed("POST events (ws source)"):
+                (await client.post(f"/api/runs/{run_id}/events:batch", json={"events": [
+                    {"level": "info", "title": f"bench {k}", "detail": f"bench:{time.perf_counter()!r}"}
+                ]})).raise_for_status()
+        await asyncio.sleep(0.05)
+    try:
+        await asyncio.wait_for(done.wait(), timeout=60)
+    except asyncio.TimeoutError:
+        pass
+    missing = sum(expected - n for n, ws in zip(received, conns) if ws is not None)
+    rec.errors["ws delivery"] = missing   # frames that never arrived
+    for ws in conns:
+        if ws is not None:
+            await ws.close()
+    for t in tasks:
+        t.cancel()
+    return rec
+
+
+async def callbacks(server: Server, client: httpx.AsyncClient, s: Dict[str, int]) -> Recorder:
+    rec = Recorder()
+    run_ids = await _create_runs(client, s["cb_trainers"])
+
+    async def trainer(i: int):
+        run_id = run_ids[i]
+        for step in range(s["cb_steps"]):
+            events = [{"level": "info", "title": f"Step {step}", "detail": f"batch {j}"} for j in range(EVENTS_PER_BATCH)]
+            try:
+                with rec.timed("POST events:batch"):
+                    (await client.post(f"/api/runs/{run_id}/events:batch", json={"events": events},
+                                       headers={"Idempotency-Key": f"bench-{run_id}-{step}"})).raise_for_status()
+                with rec.timed("PUT metrics"):
+                    (await client.put(f"/api/runs/{run_id}/metrics", json={"metrics": {
+                        "step": step, "loss": 1.0 / (step + 1), "accuracy": 1 - 1.0 / (step + 2)}})).raise_for_status()
+                steps = list(range(step * 10, step * 10 + 10))
+                with rec.timed("POST metrics:batch"):
+                    (await client.post(f"/api/runs/{run_id}/metrics:batch", json={
+                        "steps": steps, "series": {"loss": [random.random() for _ in steps]}})).raise_for_status()
+            except httpx.HTTPError:
+                pass
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(trainer(i) for i in range(len(run_ids))))
+    wall = time.perf_counter() - t0
+    rec.extra = {"events_per_s": round(len(rec.ops.get("POST events:batch", [])) * EVENTS_PER_BATCH / wall, 1)}
+    return rec
+
+
+def seed_runs(url: str, n: int):
+    # bulk INSERT ... SELECT in chunks; ~0.1% queued like a healthy system
+    engine = create_engine(url, future=True)
+    pg = engine.dialect.name == "postgresql"
+    with engine.connect() as conn:
+        have = conn.execute(text("SELECT COUNT(*) FROM runs")).scalar() or 0
+    status = "CASE WHEN i % 1000 = 0 THEN 'queued' WHEN i % 17 = 0 THEN 'failed' ELSE 'completed' END"
+    if pg:
+        status = f"CAST({status} AS runstatus)"
+    start = have
+    while start < n:
+        stop = min(n, start + SEED_CHUNK)
+        series = ("generate_series(:a, :b) AS s(i)" if pg else "s")
+        prefix = "" if pg else "WITH RECURSIVE s(i) AS (SELECT :a UNION ALL SELECT i + 1 FROM s WHERE i < :b) "
+        with engine.begin() as conn:
+            conn.execute(text(
+                prefix + "INSERT INTO runs (status, created_at, updated_at) "
+                f"SELECT {status}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM {series}"
+            ), {"a": start + 1, "b": stop})
+        start = stop
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE runs" if pg else "ANALYZE"))
+    engine.dispose()
+
+
+async def list_runs(server: Server, client: httpx.AsyncClient, s: Dict[str, int]) -> Recorder:
+    rec = Recorder()
+    r = await client.get("/api/runs", params={"limit": 1})
+    top = r.json()[0]["id"]
+
+    async def request(i: int):
+        kind = i % 4
+        try:
+            if kind == 0:
+                with rec.timed("GET /api/runs first page"):
+                    (await client.get("/api/runs", params={"limit": 50})).raise_for_status()
+            elif kind == 1:
+                with rec.timed("GET /api/runs deep page"):
+                    (await client.get("/api/runs", params={"limit": 50, "after": random.randint(1, top)})).raise_for_status()
+            elif kind == 2:
+                with rec.timed("GET /api/runs?status=queued"):
+                    (await client.get("/api/runs", params={"limit": 50, "status": "queued"})).raise_for_status()
+            else:
+                # a client walking five pages by cursor
+                cursor = None
+                for _ in range(5):
+                    with rec.timed("GET /api/runs cursor walk"):
+                        r = await client.get("/api/runs", params={"limit": 100, **({"after": cursor} if cursor else {})})
+                        r.raise_for_status()
+                    cursor = r.headers.get("X-Next-Cursor")
+                    if not cursor:
+                        break
+        except httpx.HTTPError:
+            pass
+
+    await _bounded(s["list_requests"], 20, request)
+    return rec
+
+
+async def appgen(server: Server, client: httpx.AsyncClient, s: Dict[str, int]) -> Recorder:
+    rec = Recorder()
+
+    async def build(i: int):
+        t0 = time.perf_counter()
+        while True:
+            r = await client.post("/api/appgen/generate", json={"prompt": f"bench dashboard {i}", "mode": "app"})
+            if r.status_code != 429:
+                break
+            rec.error("appgen rejected (429, retried)")
+            await asyncio.sleep(float(r.headers.get("Retry-After", "1")) / 5)
+        if r.status_code != 202:
+            rec.error("POST /api/appgen/generate")
+            return
+        rec.add("POST /api/appgen/generate", (time.perf_counter() - t0) * 1000)
+        app_id = r.json()["app_id"]
+        deadline = time.perf_counter() + 120
+        while time.perf_counter() < deadline:
+            status = (await client.get(f"/api/appgen/apps/{app_id}")).json().get("status")
+            if status == "ready":
+                rec.add("app submit -> ready", (time.perf_counter() - t0) * 1000)
+                return
+            if status == "error":
+                break
+            await asyncio.sleep(0.05)
+        rec.error("app submit -> ready")
+
+    await _bounded(s["appgen_apps"], s["appgen_concurrency"], build)
+    return rec
+
+
+RUNNERS = {"runs_burst": runs_burst, "ws_fanout": ws_fanout, "callbacks": callbacks,
+           "list_runs": list_runs, "appgen": appgen}
+
+
+async def run_all(server: Server, scenarios: List[str], s: Dict[str, int]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=500, max_keepalive_connections=500)
+    out: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=server.base, limits=limits, timeout=120) as client:
+        for name in scenarios:
+            before = scrape_counter((await client.get("/metrics")).text, "flowops_db_queries_total")
+            t0 = time.perf_counter()
+            rec = await RUNNERS[name](server, client, s)
+            wall = time.perf_counter() - t0
+            after = scrape_counter((await client.get("/metrics")).text, "flowops_db_queries_total")
+            out[name] = {"wall_seconds": round(wall, 3), "ops": rec.summary(),
+                         "server": {"db_queries": int(after - before)}, **rec.extra}
+            # errors recorded for ops that never succeeded still belong in the report
+            for op, n in rec.errors.items():
+                out[name]["ops"].setdefault(op, {"count": 0, "errors": n})
+            print(f"[bench] {name}: {wall:.1f}s", file=sys.stderr)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="FlowOpsAI backend load test")
+    ap.add_argument("--database-url", default=None, help="scratch DB (default: temp SQLite file)")
+    ap.add_argument("--scale", default="default", choices=sorted(SCALES))
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=N",
+                    help="override one scale knob, e.g. --set list_rows=10000000")
+    ap.add_argument("--keep-db", action="store_true", help="reuse the schema and seeded rows")
+    ap.add_argument("--server-workers", type=int, default=1)
+    ap.add_argument("--out", default=None, help="write the JSON here as well as to stdout")
+    ap.add_argument("--baseline", default=None, help="results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    s = dict(SCALES[args.scale])
+    for kv in args.set:
+        key, _, value = kv.partition("=")
+        if key not in s:
+            ap.error(f"unknown knob {key!r}; one of {', '.join(sorted(s))}")
+        s[key] = int(value)
+    scenarios = [x for x in args.scenarios.split(",") if x]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    raise_fd_limit()
+    tmp = tempfile.mkdtemp(prefix="bench-server-")
+    url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    prepare_database(url, fresh=not args.keep_db)
+    seed_s = None
+    if "list_runs" in scenarios:
+        t0 = time.perf_counter()
+        seed_runs(url, s["list_rows"])
+        seed_s = round(time.perf_counter() - t0, 2)
+
+    env = {"MODELS_ROOT": os.path.join(tmp, "models"), "STEP_CACHE_DIR": os.path.join(tmp, "step-cache")}
+    with Server(url, env=env, workers=args.server_workers) as server:
+        results = asyncio.run(run_all(server, scenarios, s))
+
+    report = {"meta": meta({"scale": args.scale, "knobs": s, "server_workers": args.server_workers,
+                            "seed_seconds": seed_s}, url.split(":", 1)[0].split("+")[0]),
+              "scenarios": results}
+    regressed = False
+    if args.baseline:
+        rows = compare(report, load_json(args.baseline), args.tolerance)
+        print_comparison(rows)
+        report["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance,
+                                "regressions": [r for r in rows if r["regressed"]]}
+        regressed = bool(report["comparison"]["regressions"])
+
+    text_out = json.dumps(report, indent=2)
+    print(text_out)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text_out + "\n")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
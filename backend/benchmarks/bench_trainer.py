@@ -0,0 +1,65 @@
+# backend/benchmarks/bench_trainer.py
+# Training throughput of src.mlops.trainer on a synthetic memory-mapped
+# dataset: rows/s overall and per core for a few worker/thread settings.
+#
+#   python -m benchmarks.bench_trainer --rows 5000000 --features 50
+#   python -m benchmarks.bench_trainer --workers 0,2,4 --threads 1,4
+#
+# "cores" counts the preprocessing processes plus the gradient process.
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from src.mlops.trainer import TrainConfig, make_synthetic, train
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--features", type=int, default=32)
+    ap.add_argument("--model", default="logistic", choices=["logistic", "linear"])
+    ap.add_argument("--epochs", type=int, default=2)
+    ap.add_argument("--batch-size", type=int, default=8192)
+    ap.add_argument("--workers", default="0,1,2,4", help="comma-separated preprocessing pool sizes")
+    ap.add_argument("--threads", default="1", help="comma-separated BLAS thread caps")
+    ap.add_argument("--dataset", default=None, help="existing dataset dir (default: generate one)")
+    args = ap.parse_args()
+
+    dataset = args.dataset
+    t0 = time.perf_counter()
+    if dataset is None:
+        dataset = make_synthetic(tempfile.mkdtemp(prefix="bench-trainer-"), args.rows, args.features, task=args.model)
+    gen_s = time.perf_counter() - t0
+
+    results = []
+    for threads in [int(t) for t in args.threads.split(",")]:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            cfg = TrainConfig(model=args.model, epochs=args.epochs, batch_size=args.batch_size,
+                              workers=workers, threads=threads)
+            r = train(dataset, cfg)
+            cores = max(workers, 0) + 1
+            results.append({
+                "workers": workers,
+                "threads": threads,
+                "wall_seconds": round(r["wall_seconds"], 3),
+                "rows_per_sec": round(r["rows_per_sec"]),
+                "rows_per_sec_per_core": round(r["rows_per_sec"] / cores),
+                "accuracy": r["accuracy"],
+            })
+
+    print(json.dumps({
+        "rows": args.rows,
+        "features": args.features,
+        "model": args.model,
+        "epochs": args.epochs,
+        "batch_size": args.batch_size,
+        "cpu_count": os.cpu_count(),
+        "generate_seconds": round(gen_s, 2),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
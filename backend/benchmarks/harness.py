@@ -0,0 +1,211 @@
+# backend/benchmarks/harness.py
+# Shared plumbing for the load-test suite (bench_server.py):
+#   - boot the real app under uvicorn against a scratch database
+#   - record per-operation latencies -> count, errors, p50/p95/p99, throughput
+#   - compare a result file with a stored baseline and flag regressions
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# below these absolute differences a "regression" is noise, whatever the ratio
+MIN_DELTA_MS = 1.0
+MIN_DELTA_RATE = 5.0
+
+
+# --- latency recording ---
+class Recorder:
+    def __init__(self):
+        self.ops: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started: Dict[str, float] = {}
+        self.finished: Dict[str, float] = {}
+        self.extra: Dict[str, Any] = {}   # scenario-level numbers for the report
+
+    def add(self, op: str, ms: float):
+        now = time.perf_counter()
+        self.started.setdefault(op, now - ms / 1000)
+        self.finished[op] = now
+        self.ops.setdefault(op, []).append(ms)
+
+    def error(self, op: str):
+        self.errors[op] = self.errors.get(op, 0) + 1
+
+    @contextmanager
+    def timed(self, op: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(op)
+            raise
+        self.add(op, (time.perf_counter() - t0) * 1000)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {op: summarize(samples, self.errors.get(op, 0),
+                              self.finished[op] - self.started[op])
+                for op, samples in self.ops.items()}
+
+
+def summarize(samples_ms: List[float], errors: int = 0, wall_s: Optional[float] = None) -> Dict[str, Any]:
+    s = sorted(samples_ms)
+    out: Dict[str, Any] = {"count": len(s), "errors": errors}
+    if not s:
+        return out
+    q = statistics.quantiles(s, n=100, method="inclusive") if len(s) > 1 else [s[0]] * 99
+    out.update(p50_ms=round(q[49], 3), p95_ms=round(q[94], 3), p99_ms=round(q[98], 3),
+               max_ms=round(s[-1], 3), mean_ms=round(statistics.fmean(s), 3))
+    if wall_s:
+        out["throughput_per_s"] = round(len(s) / wall_s, 1)
+    return out
+
+
+# --- scratch server ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def raise_fd_limit(want: int = 65536):
+    # a thousand WebSockets need a thousand descriptors on each side
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(want, hard) if hard != resource.RLIM_INFINITY else want
+    if soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def prepare_database(url: str, fresh: bool = True):
+    # Postgres gets the real schema (migrations: NOTIFY trigger, partial
+    # indexes, pgvector); the SQLite stand-in gets create_all
+    env = {**os.environ, "DATABASE_URL": url}
+    if url.startswith("postgresql"):
+        if fresh:
+            subprocess.run([sys.executable, "-m", "alembic", "downgrade", "base"], cwd=BACKEND_DIR, env=env, check=True)
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=BACKEND_DIR, env=env, check=True)
+        return
+    subprocess.run([sys.executable, "-c",
+                    "from src.database import Base, engine; from src import models, models_app; "
+                    "Base.metadata.drop_all(engine) if %r else None; Base.metadata.create_all(engine)" % fresh],
+                   cwd=BACKEND_DIR, env=env, check=True)
+
+
+class Server:
+    # the real app in a child process: uvicorn, its event loop and its pools
+    # are part of what is measured
+    def __init__(self, database_url: str, env: Optional[Dict[str, str]] = None, workers: int = 1):
+        self.port = _free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.ws_base = f"ws://127.0.0.1:{self.port}"
+        self.database_url = database_url
+        self.env = {**os.environ, "DATABASE_URL": database_url, "PYTHONPATH": BACKEND_DIR, **(env or {})}
+        self.workers = workers
+        self.proc: Optional[subprocess.Popen] = None
+        self.log = tempfile.NamedTemporaryFile(prefix="bench-server-", suffix=".log", delete=False)
+
+    def __enter__(self) -> "Server":
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.server.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning",
+             "--ws-max-queue", "1024", "--backlog", "4096"],
+            cwd=BACKEND_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT,
+            preexec_fn=raise_fd_limit,
+        )
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited with {self.proc.returncode}, see {self.log.name}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"server did not come up, see {self.log.name}")
+
+    def __exit__(self, *exc):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def scrape_counter(text: str, name: str) -> float:
+    # sum of every sample of a counter in a /metrics exposition
+    total = 0.0
+    for line in text.splitlines():
+        if line.startswith(name) and (line[len(name):len(name) + 1] in ("{", " ")):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+# --- results ---
+def meta(args: Dict[str, Any], dialect: str) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "dialect": dialect,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "args": args,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    # -> one row per (scenario, op, metric) present in both; "regressed" when
+    # latency grew or throughput fell by more than `tolerance` (and by more
+    # than the noise floor), or an op that had no errors now has some
+    rows = []
+    for scenario, cur in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base:
+            continue
+        for op, c in cur.get("ops", {}).items():
+            b = base.get("ops", {}).get(op)
+            if not b:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"):
+                if c.get(metric) is None or b.get(metric) is None:
+                    continue
+                new, old = c[metric], b[metric]
+                change = (new - old) / old if old else 0.0
+                if metric == "throughput_per_s":
+                    regressed = change < -tolerance and old - new > MIN_DELTA_RATE
+                else:
+                    regressed = change > tolerance and new - old > MIN_DELTA_MS
+                rows.append({"scenario": scenario, "op": op, "metric": metric, "baseline": old,
+                             "current": new, "change": round(change, 4), "regressed": regressed})
+            if c.get("errors", 0) and not b.get("errors", 0):
+                rows.append({"scenario": scenario, "op": op, "metric": "errors", "baseline": 0,
+                             "current": c["errors"], "change": None, "regressed": True})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], out=sys.stderr):
+    for r in rows:
+        change = f"{r['change'] * 100:+.1f}%" if r["change"] is not None else "new"
+        flag = "REGRESSED" if r["regressed"] else "ok"
+        print(f"{r['scenario']:>14} {r['op']:<28} {r['metric']:<17} "
+              f"{r['baseline']:>12} -> {r['current']:<12} {change:>8}  {flag}", file=out)
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
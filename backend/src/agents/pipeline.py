@@ -0,0 +1,354 @@
+# backend/src/agents/pipeline.py
+# DAG executor for Workflow.pipeline_spec.
+#
+# A spec is {"steps": [{"id", "type", "params", "depends_on"}, ...]}. Steps
+# whose dependencies are done run concurrently on a pool, so a pipeline takes
+# roughly its critical-path time. A step receives its upstream results by
+# reference (`ctx.inputs[dep_id]`), and whatever it returns becomes its own
+# artifact.
+#
+# Older specs carry no ids or depends_on at all; those run as a chain in list
+# order, exactly like before.
+#
+# With a StepCache, a step whose type, params and input artifacts match an
+# earlier execution reuses that result instead of running (unless `force`).
+# Steps that read data named in their params (a dataset URL, a model file)
+# register a `data_key` function; what it returns (the dataset digest, file
+# sizes and mtimes) is part of the key, so changed data is never served stale.
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from src import telemetry
+from src.agents.step_cache import StepCache, artifact_hash, step_key
+
+MAX_PARALLEL = int(os.getenv("PIPELINE_MAX_PARALLEL", "4"))
+EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "thread")   # "thread" | "process" (CPU-bound steps)
+
+Emit = Callable[..., None]   # emit(title, detail=None, level="info")
+
+# observed in the process driving the DAG, whichever executor ran the step
+STEPS_TOTAL = telemetry.Counter("flowops_pipeline_steps_total", "Pipeline steps by outcome (ok, failed, cached)",
+                                ("type", "outcome"))
+STEP_SECONDS = telemetry.Histogram("flowops_pipeline_step_duration_seconds", "Pipeline step run time",
+                                   ("type",), buckets=telemetry.DURATION_BUCKETS)
+STEPS_RUNNING = telemetry.Gauge("flowops_pipeline_steps_running", "Pipeline steps executing right now")
+
+
+class PipelineError(Exception):
+    pass
+
+
+@dataclass
+class Step:
+    id: str
+    type: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    depends_on: List[str] = field(default_factory=list)
+
+
+@dataclass
+class StepContext:
+    run_id: Optional[int]
+    step: Step
+    inputs: Dict[str, Any]    # upstream step id -> artifact
+    data: Dict[str, Any] = field(default_factory=dict)   # the step's data_key result, if any
+
+
+# --- step registry ---
+STEP_HANDLERS: Dict[str, Callable[[StepContext], Any]] = {}
+UNCACHEABLE: Set[str] = set()   # step types with side effects: always executed
+# step type -> data_key(params): fingerprint of the external data the step
+# reads, or None when it can't be taken (the step then always executes)
+DATA_KEYS: Dict[str, Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
+
+def register_step(type_name: str, cacheable: bool = True,
+                  data_key: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None):
+    def deco(fn):
+        STEP_HANDLERS[type_name] = fn
+        if data_key is not None:
+            DATA_KEYS[type_name] = data_key
+        if cacheable:
+            UNCACHEABLE.discard(type_name)
+        else:
+            UNCACHEABLE.add(type_name)
+        return fn
+    return deco
+
+@register_step("noop")
+def _noop(ctx: StepContext):
+    return None
+
+@register_step("sleep", cacheable=False)   # simulated work: always pay for it
+def _sleep(ctx: StepContext):
+    time.sleep(float(ctx.step.params.get("seconds", 1)))
+    return None
+
+def _file_key(path: str) -> Optional[List[Any]]:
+    # (name, size, mtime) of a file, or of every file under a directory
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return [["", st.st_size, st.st_mtime_ns]]
+    if not os.path.isdir(path):
+        return None
+    out = []
+    for root, _, files in os.walk(path):
+        for f in files:
+            st = os.stat(os.path.join(root, f))
+            out.append([os.path.relpath(os.path.join(root, f), path), st.st_size, st.st_mtime_ns])
+    return sorted(out)
+
+def _data_key(params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # train/evaluate: digest of the dataset_url content (fetched into the dataset
+    # cache, which the step then reads by that digest), stat of dataset/model_path
+    from src import datasets
+    data: Dict[str, Any] = {}
+    if params.get("dataset_url"):
+        data["dataset_digest"] = datasets.ingest(params["dataset_url"])["digest"]
+    for name in ("dataset", "model_path"):
+        if params.get(name):
+            data[name] = _file_key(params[name])
+            if data[name] is None:
+                return None
+    return data
+
+def _cached_dataset(params: Dict[str, Any], target: Optional[str], features: Optional[List[str]],
+                   labels: Optional[List[str]] = None, digest: Optional[str] = None):
+    # dataset_url (CSV/JSONL) -> training layout from the columnar cache in src.datasets.
+    # A string target is mapped by `labels` ([negative, positive]; evaluate passes the
+    # train step's), else by params.positive or sorted order; the mapping is returned.
+    # `digest` pins the content the step's cache key was computed from
+    from src import datasets
+    if not target:
+        raise PipelineError("dataset_url needs params.target")
+    schema = (digest and datasets.get_schema(digest)) or datasets.ingest(params["dataset_url"])
+    labels = labels or datasets.target_labels(schema, target, params.get("positive"))
+    path, features = datasets.training_set(schema, target, features, labels=labels)
+    return path, {"digest": schema["digest"], "target": target, "features": features, "labels": labels}
+
+
+@register_step("train", data_key=_data_key)
+def _train(ctx: StepContext):
+    # params: dataset (dir with X.npy / y.npy), dataset_url + target (+ features,
+    # positive: the string target value that means 1), or rows/features for a
+    # synthetic set, plus any TrainConfig field (model, epochs, batch_size, lr,
+    # workers, ...)
+    import tempfile
+    from src.mlops.trainer import TrainConfig, make_synthetic, train
+    params = ctx.step.params
+    cfg = TrainConfig.from_params(params)
+    if params.get("dataset_url"):
+        path, dataset = _cached_dataset(params, params.get("target"), params.get("features"),
+                                        digest=ctx.data.get("dataset_digest"))
+        return {**train(path, cfg), "dataset": dataset}
+    if params.get("dataset"):
+        return train(params["dataset"], cfg)
+    with tempfile.TemporaryDirectory() as tmp:
+        make_synthetic(tmp, rows=int(params.get("rows", 20_000)), features=int(params.get("features", 10)),
+                       task=cfg.model, seed=cfg.seed)
+        return train(tmp, cfg)
+
+@register_step("evaluate", data_key=_data_key)
+def _evaluate(ctx: StepContext):
+    # the model comes from an upstream train step (or params.model_path); params:
+    # dataset (held-out dir), dataset_url (target and features default to the
+    # train step's) or rows for a fresh synthetic sample of the train task, plus
+    # chunk_rows, workers, threshold. The metrics end up in run.metrics
+    import tempfile
+    from src.mlops.evaluator import CHUNK_ROWS, evaluate
+    from src.mlops.trainer import make_synthetic
+    params = ctx.step.params
+    upstream = [a for a in ctx.inputs.values() if isinstance(a, dict) and "model" in a]
+    if params.get("model_path"):
+        model, seed = params["model_path"], int(params.get("seed", 0))
+    elif upstream:
+        model, seed = upstream[-1]["model"], int(upstream[-1].get("config", {}).get("seed", 0))
+    else:
+        raise PipelineError(f"step {ctx.step.id}: no model (add a train dependency or params.model_path)")
+    opts = {"chunk_rows": int(params.get("chunk_rows", CHUNK_ROWS)), "workers": params.get("workers"),
+            "threshold": float(params.get("threshold", 0.5))}
+    if params.get("dataset_url"):
+        trained_on = upstream[-1].get("dataset", {}) if upstream else {}
+        target = params.get("target") or trained_on.get("target")
+        # same 0/1 mapping as training, or the metrics would come out inverted
+        labels = trained_on.get("labels") if target == trained_on.get("target") and not params.get("positive") else None
+        path, _ = _cached_dataset(params, target, params.get("features") or trained_on.get("features"), labels,
+                                  digest=ctx.data.get("dataset_digest"))
+        return evaluate(path, model, **opts)
+    if params.get("dataset"):
+        return evaluate(params["dataset"], model, **opts)
+    if isinstance(model, str):
+        raise PipelineError(f"step {ctx.step.id}: params.dataset is required with model_path")
+    with tempfile.TemporaryDirectory() as tmp:
+        make_synthetic(tmp, rows=int(params.get("rows", 20_000)), features=len(model["weights"]) - 1,
+                       task=model["kind"], seed=seed, sample_seed=int(params.get("sample_seed", 1)))
+        return evaluate(tmp, model, **opts)
+
+
+def _run_step(ctx: StepContext):
+    # module-level so it pickles for the process executor
+    handler = STEP_HANDLERS[ctx.step.type]
+    t0 = time.perf_counter()
+    result = handler(ctx)
+    return result, time.perf_counter() - t0
+
+
+# --- spec parsing ---
+def parse_steps(spec: Optional[Dict[str, Any]]) -> List[Step]:
+    raw = (spec or {}).get("steps") or []
+    explicit = any("depends_on" in s for s in raw)
+    steps: List[Step] = []
+    for i, s in enumerate(raw):
+        sid = str(s.get("id") or f"step{i + 1}")
+        if explicit:
+            deps = [str(d) for d in (s.get("depends_on") or [])]
+        else:
+            deps = [steps[-1].id] if steps else []
+        steps.append(Step(id=sid, type=s["type"], params=dict(s.get("params") or {}), depends_on=deps))
+    validate(steps)
+    return steps
+
+
+def validate(steps: List[Step]):
+    ids = [s.id for s in steps]
+    if len(ids) != len(set(ids)):
+        raise PipelineError("duplicate step ids")
+    known = set(ids)
+    for s in steps:
+        if s.type not in STEP_HANDLERS:
+            raise PipelineError(f"step {s.id}: unknown type {s.type!r}")
+        missing = [d for d in s.depends_on if d not in known]
+        if missing:
+            raise PipelineError(f"step {s.id}: unknown dependencies {missing}")
+    topo_order(steps)
+
+
+def topo_order(steps: List[Step]) -> List[str]:
+    indeg = {s.id: len(set(s.depends_on)) for s in steps}
+    children: Dict[str, List[str]] = {s.id: [] for s in steps}
+    for s in steps:
+        for d in set(s.depends_on):
+            children[d].append(s.id)
+    ready = [s.id for s in steps if indeg[s.id] == 0]
+    order = []
+    while ready:
+        sid = ready.pop(0)
+        order.append(sid)
+        for c in children[sid]:
+            indeg[c] -= 1
+            if indeg[c] == 0:
+                ready.append(c)
+    if len(order) != len(steps):
+        raise PipelineError("pipeline has a dependency cycle")
+    return order
+
+
+# --- execution ---
+def _make_executor(max_parallel: int, kind: str) -> Executor:
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_parallel)
+    return ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="pipeline-step")
+
+
+def _step_data(step: Step) -> Optional[Dict[str, Any]]:
+    # None: the data can't be fingerprinted (unreachable URL, missing file), so
+    # the step runs uncached and reports the problem itself
+    fn = DATA_KEYS.get(step.type)
+    if fn is None:
+        return {}
+    try:
+        return fn(step.params)
+    except Exception as e:
+        print(f"[pipeline] step {step.id}: no cache key ({e})")
+        return None
+
+
+def run_pipeline(steps: List[Step], run_id: Optional[int] = None, emit: Optional[Emit] = None,
+                 max_parallel: int = MAX_PARALLEL, executor: str = EXECUTOR,
+                 cache: Optional[StepCache] = None, force: bool = False) -> Dict[str, Any]:
+    emit = emit or (lambda *a, **k: None)
+    by_id = {s.id: s for s in steps}
+    remaining = {s.id: set(s.depends_on) for s in steps}
+    artifacts: Dict[str, Any] = {}
+    hashes: Dict[str, Optional[str]] = {}   # artifact content hashes, feed downstream cache keys
+    keys: Dict[str, Optional[str]] = {}
+    timings: Dict[str, float] = {}
+    cache_hits: List[str] = []
+    t_start = time.perf_counter()
+
+    def finish(sid: str):
+        for deps in remaining.values():
+            deps.discard(sid)
+
+    with _make_executor(max_parallel, executor) as pool:
+        running = {}
+
+        def submit_ready():
+            # cache hits complete immediately and may unlock more steps, hence the loop
+            while True:
+                ready = [sid for sid, deps in remaining.items() if not deps]
+                if not ready:
+                    return
+                for sid in ready:
+                    del remaining[sid]
+                    step = by_id[sid]
+                    key, data = None, {}
+                    if cache is not None and step.type not in UNCACHEABLE:
+                        data = _step_data(step)
+                        if data is not None:
+                            key = step_key(step.type, step.params, {d: hashes[d] for d in step.depends_on}, data)
+                    keys[sid] = key
+                    if key is not None and not force:
+                        hit, value, digest = cache.get(key)
+                        if hit:
+                            artifacts[sid], hashes[sid], timings[sid] = value, digest, 0.0
+                            cache_hits.append(sid)
+                            STEPS_TOTAL.labels(step.type, "cached").inc()
+                            emit(f"Step {sid} cache hit", f"{step.type} reused result {key[:12]}")
+                            finish(sid)
+                            continue
+                        emit(f"Step {sid} cache miss", f"{step.type} key {key[:12]}")
+                    ctx = StepContext(run_id=run_id, step=step,
+                                      inputs={d: artifacts[d] for d in step.depends_on}, data=data or {})
+                    emit(f"Step {sid} started", f"{step.type}")
+                    running[pool.submit(_run_step, ctx)] = sid
+                    STEPS_RUNNING.inc()
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                sid = running.pop(fut)
+                STEPS_RUNNING.dec()
+                try:
+                    artifacts[sid], timings[sid] = fut.result()
+                except Exception as e:
+                    STEPS_TOTAL.labels(by_id[sid].type, "failed").inc()
+                    for other in running:
+                        other.cancel()
+                    STEPS_RUNNING.dec(len(running))
+                    emit(f"Step {sid} failed", f"{by_id[sid].type}: {e}", level="error")
+                    raise PipelineError(f"step {sid} failed: {e}") from e
+                emit(f"Step {sid} done", f"{by_id[sid].type} finished in {timings[sid]:.3f}s")
+                STEPS_TOTAL.labels(by_id[sid].type, "ok").inc()
+                STEP_SECONDS.labels(by_id[sid].type).observe(timings[sid])
+                if keys.get(sid) is not None:
+                    hashes[sid] = cache.put(keys[sid], by_id[sid].type, artifacts[sid])
+                else:
+                    hashes[sid] = artifact_hash(artifacts[sid]) if cache is not None else None
+                finish(sid)
+            submit_ready()
+
+    wall = time.perf_counter() - t_start
+    emit("Pipeline finished",
+         f"{len(steps)} steps in {wall:.3f}s wall (sum of step times {sum(timings.values()):.3f}s)")
+    return {"artifacts": artifacts, "timings": timings, "wall_seconds": wall, "cache_hits": cache_hits}
+
+
+def run_metrics(steps: List[Step], artifacts: Dict[str, Any]) -> Dict[str, Any]:
+    # what a finished pipeline contributes to run.metrics: evaluation results by step id
+    evals = {s.id: artifacts[s.id] for s in steps
+             if s.type == "evaluate" and isinstance(artifacts.get(s.id), dict)}
+    return {"evaluation": evals} if evals else {}
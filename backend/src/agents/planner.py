@@ -0,0 +1,357 @@
+# backend/src/agents/planner.py
+# Prompt -> pipeline spec, behind a semantic cache.
+#
+#   plan_prompt(db, prompt)
+#     1. exact match:    same normalized prompt text          (no embedding call)
+#     2. semantic match: nearest cached prompt by cosine similarity, at least
+#                        PLAN_CACHE_MIN_SIMILARITY, among prompts with the same
+#                        literals (numbers, URLs, quoted names) and the same
+#                        target column and model kind, so "train for 5 epochs"
+#                        never reuses the plan for 50, nor "predict churn" the
+#                        plan for "predict tenure"
+#     3. miss:           ask the planner, validate the spec, cache it
+#
+# On Postgres the cache lives in plan_cache with a pgvector HNSW index and the
+# nearest neighbour is a single ORDER BY embedding <=> :q LIMIT 1; elsewhere
+# (SQLite in tests) the candidates are compared in NumPy.
+#
+# Embedders and planners are pluggable. PLANNER_BACKEND / PLANNER_EMBEDDER
+# pick "openai" (needs OPENAI_API_KEY) or "local": a feature-hashing embedder
+# and a rule-based planner that work offline. "auto" uses OpenAI when a key
+# is set. A failing remote planner falls back to the local one; a failing
+# embedder skips the cache.
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import requests
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import Session
+
+from src.agents.pipeline import parse_steps
+from src.models import PLAN_EMBED_DIM, PlanCacheEntry, utcnow_naive
+
+BACKEND = os.getenv("PLANNER_BACKEND", "auto")          # auto | openai | local
+EMBEDDER = os.getenv("PLANNER_EMBEDDER", BACKEND)       # auto | openai | local
+MIN_SIMILARITY = float(os.getenv("PLAN_CACHE_MIN_SIMILARITY", "0.9"))
+HNSW_EF_SEARCH = int(os.getenv("PLAN_CACHE_EF_SEARCH", "40"))
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_EMBED_MODEL = os.getenv("PLANNER_EMBED_MODEL", "text-embedding-3-small")
+OPENAI_CHAT_MODEL = os.getenv("PLANNER_MODEL", "gpt-4o-mini")
+OPENAI_TIMEOUT = float(os.getenv("PLANNER_TIMEOUT", "30"))
+
+
+def normalize(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+
+_LITERALS = re.compile(r"https?://\S+|[\w./-]+\.(?:csv|tsv|jsonl|ndjson|json)(?:\.gz)?|\"[^\"]*\"|'[^']*'|`[^`]*`|\d+(?:\.\d+)?(?:e-?\d+)?")
+_LINEAR = re.compile(r"\b(regress\w*|linear|forecast\w*|price|amount|continuous)\b", re.I)
+_TARGET = re.compile(r"\b(?:predict(?:ing)?|target|label|forecast(?:ing)?)\s+(?:the\s+|column\s+)?[`'\"]?([A-Za-z_]\w*)", re.I)
+
+
+def identifiers(prompt: str) -> Dict[str, str]:
+    # the model kind and target column the prompt names, quoted or not
+    target = _TARGET.search(prompt)
+    return {"model": "linear" if _LINEAR.search(prompt) else "logistic",
+            "target": target.group(1).lower() if target else ""}
+
+
+def entities(prompt: str) -> str:
+    # the prompt's literals and identifiers; plans are only shared between
+    # prompts that agree on them
+    found = sorted(set(m.rstrip(".,;)") for m in _LITERALS.findall(prompt.lower())))
+    return hashlib.sha256(json.dumps([found, identifiers(prompt)], sort_keys=True).encode()).hexdigest()
+
+
+# --- embedders ---
+class HashEmbedder:
+    # Local stand-in: signed feature hashing of words and character trigrams,
+    # L2-normalized. Rewordings and typos stay close in cosine terms.
+    name = f"hash-v1-{PLAN_EMBED_DIM}"
+
+    def __init__(self, dim: int = PLAN_EMBED_DIM):
+        self.dim = dim
+
+    def embed(self, text_: str) -> np.ndarray:
+        v = np.zeros(self.dim)
+        for word in re.findall(r"\w+", text_.lower()):
+            feats = [(word, 1.0)] + [(f"#{g}", 0.5) for g in (word[i:i + 3] for i in range(max(1, len(word) - 2)))]
+            for feat, weight in feats:
+                h = zlib.crc32(feat.encode())
+                v[h % self.dim] += weight if (h >> 16) & 1 else -weight
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+
+class OpenAIEmbedder:
+    def __init__(self, model: str = OPENAI_EMBED_MODEL, dim: int = PLAN_EMBED_DIM):
+        self.model, self.dim = model, dim
+        self.name = f"openai-{model}-{dim}"
+
+    def embed(self, text_: str) -> np.ndarray:
+        r = requests.post(f"{OPENAI_BASE_URL}/embeddings", timeout=OPENAI_TIMEOUT,
+                          headers={"Authorization": f"Bearer {os.environ['OPENAI_API_KEY']}"},
+                          json={"model": self.model, "input": text_, "dimensions": self.dim})
+        r.raise_for_status()
+        v = np.asarray(r.json()["data"][0]["embedding"], dtype=np.float64)
+        return v / (np.linalg.norm(v) or 1.0)
+
+
+# --- planners ---
+class RulePlanner:
+    # Local stand-in: reads the model type, dataset, target and a few
+    # hyper-parameters from the prompt; always yields a valid train (+ evaluate) spec
+    name = "rules-v1"
+
+    def plan(self, prompt: str) -> Dict[str, Any]:
+        low = prompt.lower()
+        train: Dict[str, Any] = {"model": "linear" if _LINEAR.search(low) else "logistic"}
+        dataset = re.search(r"(https?://\S+|[\w./-]+\.(?:csv|tsv|jsonl|ndjson|json)(?:\.gz)?)", prompt)
+        target = _TARGET.search(prompt)
+        data: Dict[str, Any] = {}
+        if dataset:
+            data["dataset_url"] = dataset.group(1).rstrip(".,;)")
+            if target:
+                data["target"] = target.group(1)
+        for key, pattern, cast in (
+            ("epochs", r"(\d+)\s*epochs?", int),
+            ("batch_size", r"batch(?:\s*size)?\s*(?:of|=|:)?\s*(\d+)", int),
+            ("lr", r"(?:\blr\b|learning rate)\s*(?:of|=|:)?\s*(\d*\.?\d+(?:e-?\d+)?)", float),
+        ):
+            m = re.search(pattern, low)
+            if m:
+                train[key] = cast(m.group(1))
+        rows = re.search(r"(\d[\d,_]*)\s*(k|m)?\s*(?:synthetic\s+)?rows", low)
+        if rows and not dataset:
+            train["rows"] = int(rows.group(1).replace(",", "").replace("_", "")) * {"k": 1_000, "m": 1_000_000}.get(rows.group(2), 1)
+        steps = [{"id": "train", "type": "train", "params": {**data, **train}, "depends_on": []}]
+        if not re.search(r"\b(no|skip|without)\s+eval", low):
+            steps.append({"id": "evaluate", "type": "evaluate", "params": dict(data), "depends_on": ["train"]})
+        return {"steps": steps}
+
+
+PLANNER_SYSTEM = """You turn a request for an ML training job into a pipeline spec.
+Reply with JSON only: {"steps": [{"id": str, "type": str, "params": object, "depends_on": [ids]}]}.
+Step types:
+- "train": params model ("logistic" | "linear"), epochs, batch_size, lr, l2; data from
+  dataset_url + target (CSV/JSONL column to predict), or rows + features for synthetic data.
+- "evaluate": depends on a train step; params dataset_url (target/features default to the
+  train step's) or rows for a synthetic held-out sample; threshold.
+- "sleep": params seconds. "noop".
+Only use parameters the request asks for or clearly implies."""
+
+
+class OpenAIPlanner:
+    def __init__(self, model: str = OPENAI_CHAT_MODEL):
+        self.model = model
+        self.name = f"openai-{model}"
+
+    def plan(self, prompt: str) -> Dict[str, Any]:
+        r = requests.post(f"{OPENAI_BASE_URL}/chat/completions", timeout=OPENAI_TIMEOUT,
+                          headers={"Authorization": f"Bearer {os.environ['OPENAI_API_KEY']}"},
+                          json={"model": self.model, "temperature": 0,
+                                "response_format": {"type": "json_object"},
+                                "messages": [{"role": "system", "content": PLANNER_SYSTEM},
+                                             {"role": "user", "content": prompt}]})
+        r.raise_for_status()
+        return json.loads(r.json()["choices"][0]["message"]["content"])
+
+
+def _choose(kind: str) -> str:
+    if kind == "auto":
+        return "openai" if os.getenv("OPENAI_API_KEY") else "local"
+    return kind
+
+
+def make_embedder(kind: str = EMBEDDER):
+    return OpenAIEmbedder() if _choose(kind) == "openai" else HashEmbedder()
+
+
+def make_planner(kind: str = BACKEND):
+    return OpenAIPlanner() if _choose(kind) == "openai" else RulePlanner()
+
+
+# --- semantic cache ---
+def _literal(v: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6g}" for x in v) + "]"
+
+
+class PlanCache:
+    def __init__(self, embedder, min_similarity: float = MIN_SIMILARITY):
+        self.embedder = embedder
+        self.min_similarity = min_similarity
+
+    def exact(self, db: Session, prompt_hash: str, ents: str) -> Optional[PlanCacheEntry]:
+        return db.execute(
+            select(PlanCacheEntry)
+            .where(PlanCacheEntry.embedder == self.embedder.name, PlanCacheEntry.entities == ents,
+                   PlanCacheEntry.prompt_hash == prompt_hash)
+            .limit(1)
+        ).scalar_one_or_none()
+
+    def nearest(self, db: Session, vec: np.ndarray, ents: str) -> Tuple[Optional[int], float]:
+        # -> (entry id, cosine similarity) of the closest cached prompt
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL hnsw.ef_search = {int(HNSW_EF_SEARCH)}"))
+            row = db.execute(text(
+                "SELECT id, embedding <=> CAST(:q AS vector) AS dist FROM plan_cache "
+                "WHERE embedder = :e AND entities = :ents "
+                "ORDER BY embedding <=> CAST(:q AS vector) LIMIT 1"
+            ), {"q": _literal(vec), "e": self.embedder.name, "ents": ents}).first()
+            return (row.id, 1.0 - float(row.dist)) if row else (None, 0.0)
+        rows = db.execute(
+            select(PlanCacheEntry.id, PlanCacheEntry.embedding)
+            .where(PlanCacheEntry.embedder == self.embedder.name, PlanCacheEntry.entities == ents)
+        ).all()
+        if not rows:
+            return None, 0.0
+        sims = np.asarray([r.embedding for r in rows]) @ vec
+        best = int(np.argmax(sims))
+        return rows[best].id, float(sims[best])
+
+    def touch(self, db: Session, entry_id: int):
+        db.execute(update(PlanCacheEntry).where(PlanCacheEntry.id == entry_id)
+                   .values(hits=PlanCacheEntry.hits + 1, last_used_at=utcnow_naive()))
+        db.commit()
+
+    def put(self, db: Session, prompt: str, prompt_hash: str, ents: str, vec: np.ndarray,
+            spec: Dict[str, Any], planner: str):
+        db.add(PlanCacheEntry(embedder=self.embedder.name, entities=ents, prompt_hash=prompt_hash,
+                              prompt=prompt, spec=spec, planner=planner, embedding=vec.tolist(), hits=0))
+        db.commit()
+
+    def drop(self, db: Session, entry_id: int):
+        db.execute(delete(PlanCacheEntry).where(PlanCacheEntry.id == entry_id))
+        db.commit()
+
+
+class Planner:
+    def __init__(self, planner=None, embedder=None, fallback=None, min_similarity: float = MIN_SIMILARITY):
+        self.planner = planner or make_planner()
+        self.fallback = fallback or RulePlanner()
+        self.cache = PlanCache(embedder or make_embedder(), min_similarity)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                       "planner_errors": 0, "embedder_errors": 0}
+        self.ms = {"hit": 0.0, "miss": 0.0}
+
+    def _generate(self, prompt: str) -> Tuple[Dict[str, Any], str]:
+        try:
+            spec = self.planner.plan(prompt)
+            parse_steps(spec)
+            return spec, self.planner.name
+        except Exception as e:   # remote planner down or produced an invalid spec
+            if self.planner is self.fallback:
+                raise
+            with self._lock:
+                self.counts["planner_errors"] += 1
+            print(f"[planner] {self.planner.name} failed ({e}); using {self.fallback.name}")
+            spec = self.fallback.plan(prompt)
+            parse_steps(spec)
+            return spec, self.fallback.name
+
+    def _embed(self, norm: str) -> Optional[np.ndarray]:
+        # None when the embedder is down: the prompt is planned without the cache
+        try:
+            return self.cache.embedder.embed(norm)
+        except Exception as e:
+            with self._lock:
+                self.counts["embedder_errors"] += 1
+            print(f"[planner] embedder {self.cache.embedder.name} failed ({e}); skipping the cache")
+            return None
+
+    def _degraded(self, planner_name: str) -> bool:
+        # a plan made by the fallback while the primary planner was failing
+        return self.planner.name != self.fallback.name and planner_name == self.fallback.name
+
+    def plan_prompt(self, db: Session, prompt: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # -> (pipeline spec, {"source": "exact" | "semantic" | "planner", ...}).
+        # Fallback plans are served but never cached, so an outage of the primary
+        # planner doesn't pin its prompts to rule-based plans; degraded entries
+        # cached before that are replaced on their next hit.
+        t0 = time.perf_counter()
+        norm = normalize(prompt)
+        prompt_hash = hashlib.sha256(norm.encode()).hexdigest()
+        ents = entities(prompt)
+        info: Dict[str, Any] = {}
+        stale_id: Optional[int] = None
+
+        entry = self.cache.exact(db, prompt_hash, ents)
+        if entry is not None and self._degraded(entry.planner):
+            stale_id, entry = entry.id, None
+        if entry is not None:
+            source, spec, info["cached_prompt"] = "exact", entry.spec, entry.prompt
+            self.cache.touch(db, entry.id)
+        else:
+            vec = self._embed(norm)
+            entry_id, sim = self.cache.nearest(db, vec, ents) if vec is not None else (None, 0.0)
+            if entry_id is not None and sim >= self.cache.min_similarity:
+                entry = db.get(PlanCacheEntry, entry_id)
+                if self._degraded(entry.planner):
+                    stale_id, entry = stale_id or entry_id, None
+            if entry is not None:
+                source, spec = "semantic", entry.spec
+                info.update(similarity=round(sim, 4), cached_prompt=entry.prompt)
+                self.cache.touch(db, entry_id)
+            else:
+                source = "planner"
+                spec, info["planner"] = self._generate(prompt)
+                if vec is None or self._degraded(info["planner"]):
+                    info["cached"] = False
+                else:
+                    if stale_id is not None:
+                        self.cache.drop(db, stale_id)
+                    self.cache.put(db, prompt, prompt_hash, ents, vec, spec, info["planner"])
+                if entry_id is not None:
+                    info["nearest_similarity"] = round(sim, 4)
+
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["misses" if source == "planner" else f"{source}_hits"] += 1
+            self.ms["miss" if source == "planner" else "hit"] += ms
+        info.update(source=source, ms=round(ms, 2))
+        return spec, info
+
+    def stats(self, db: Optional[Session] = None) -> Dict[str, Any]:
+        with self._lock:
+            c, ms = dict(self.counts), dict(self.ms)
+        hits = c["exact_hits"] + c["semantic_hits"]
+        out = {
+            **c,
+            "hit_rate": round(hits / c["requests"], 4) if c["requests"] else None,
+            "avg_hit_ms": round(ms["hit"] / hits, 2) if hits else None,
+            "avg_miss_ms": round(ms["miss"] / c["misses"], 2) if c["misses"] else None,
+            "planner": self.planner.name,
+            "embedder": self.cache.embedder.name,
+            "min_similarity": self.cache.min_similarity,
+        }
+        if db is not None:
+            # lifetime numbers, across processes and restarts
+            row = db.execute(text(
+                "SELECT COUNT(*) AS n, COALESCE(SUM(hits), 0) AS hits FROM plan_cache WHERE embedder = :e"
+            ), {"e": self.cache.embedder.name}).one()
+            out["cached_plans"] = int(row.n)
+            out["lifetime_hits"] = int(row.hits)
+            total = int(row.n) + int(row.hits)
+            out["lifetime_hit_rate"] = round(int(row.hits) / total, 4) if total else None
+        return out
+
+
+_planner: Optional[Planner] = None
+_planner_lock = threading.Lock()
+
+
+def get_planner() -> Planner:
+    global _planner
+    with _planner_lock:
+        if _planner is None:
+            _planner = Planner()
+        return _planner
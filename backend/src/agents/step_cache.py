@@ -0,0 +1,127 @@
+# backend/src/agents/step_cache.py
+# Content-addressed cache of pipeline step results.
+#
+# key = sha256(step type + canonical params JSON + hashes of the input
+# artifacts + fingerprints of the external data the step reads). Results are pickled into STEP_CACHE_DIR (on the shared /models
+# volume) and indexed in the step_cache table, which also drives LRU eviction
+# once the cache grows past STEP_CACHE_MAX_BYTES.
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models import StepCacheEntry, utcnow_naive
+
+CACHE_DIR = os.getenv("STEP_CACHE_DIR", "/models/step-cache")
+MAX_BYTES = int(os.getenv("STEP_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+
+def artifact_hash(value: Any) -> Optional[str]:
+    # None when the value can't be pickled (such results are never cached)
+    try:
+        return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+    except Exception:
+        return None
+
+
+def step_key(step_type: str, params: Dict[str, Any], input_hashes: Dict[str, Optional[str]],
+             data: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    # `data`: what the files/URLs named in params currently hold (dataset digest,
+    # file size and mtime), so changed data behind the same params is a miss
+    if any(h is None for h in input_hashes.values()):
+        return None
+    doc = {"type": step_type, "params": params, "inputs": dict(sorted(input_hashes.items()))}
+    if data:
+        doc["data"] = data
+    canonical = json.dumps(doc, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class StepCache:
+    def __init__(self, session_factory: Callable[[], Session], root: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.session_factory = session_factory
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def get(self, key: str) -> Tuple[bool, Any, Optional[str]]:
+        with self.session_factory() as db:
+            entry = db.get(StepCacheEntry, key)
+            if entry is None:
+                return False, None, None
+            try:
+                with open(entry.path, "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                # blob vanished or is torn: drop the stale index row
+                db.delete(entry)
+                db.commit()
+                return False, None, None
+            db.execute(
+                update(StepCacheEntry)
+                .where(StepCacheEntry.key == key)
+                .values(hits=StepCacheEntry.hits + 1, last_used_at=utcnow_naive())
+            )
+            db.commit()
+            return True, value, entry.artifact_hash
+
+    def put(self, key: str, step_type: str, value: Any) -> Optional[str]:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+        digest = hashlib.sha256(blob).hexdigest()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write-then-rename so concurrent readers never see a partial blob
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+
+        now = utcnow_naive()
+        with self.session_factory() as db:
+            entry = db.get(StepCacheEntry, key)
+            if entry is None:
+                db.add(StepCacheEntry(key=key, step_type=step_type, path=path, size_bytes=len(blob),
+                                      artifact_hash=digest, hits=0, created_at=now, last_used_at=now))
+            else:
+                entry.size_bytes, entry.artifact_hash, entry.last_used_at = len(blob), digest, now
+            try:
+                db.commit()
+            except IntegrityError:
+                # another run cached the same key first; same content, same blob path
+                db.rollback()
+        self.evict()
+        return digest
+
+    def evict(self) -> int:
+        # least recently used first, until the cache fits its byte budget
+        removed = 0
+        with self.session_factory() as db:
+            total = db.execute(select(func.coalesce(func.sum(StepCacheEntry.size_bytes), 0))).scalar()
+            if total <= self.max_bytes:
+                return 0
+            for key, path, size in db.execute(
+                select(StepCacheEntry.key, StepCacheEntry.path, StepCacheEntry.size_bytes)
+                .order_by(StepCacheEntry.last_used_at.asc())
+            ).all():
+                if total <= self.max_bytes:
+                    break
+                db.execute(delete(StepCacheEntry).where(StepCacheEntry.key == key))
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                removed += 1
+            db.commit()
+        return removed
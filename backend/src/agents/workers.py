@@ -1,46 +1,208 @@
+import os
+import socket
+import threading
 import time
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Set
+
+from sqlalchemy import create_engine, select, update, or_, and_
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from src.models import Run, RunStatus, RunEvent
-from src.database import DATABASE_URL
+from src import event_archive, telemetry
+from src.models import Run, RunStatus, RunEvent, Workflow
+from src.database import DATABASE_URL, instrument_engine
+from src.event_writer import EventWriter
+from src.agents.pipeline import parse_steps, run_metrics, run_pipeline
+from src.agents.step_cache import StepCache
+from src.server.callbacks import merge_run_metrics
+
+# Tunables (env so each agent replica can be sized independently)
+CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", "4"))          # runs processed in parallel per process
+LEASE_SECONDS = int(os.getenv("AGENT_LEASE_SECONDS", "60"))     # claim expires unless renewed
+HEARTBEAT_SECONDS = max(1, LEASE_SECONDS // 3)
+POLL_SECONDS = float(os.getenv("AGENT_POLL_SECONDS", "5"))      # idle sleep between claim attempts
+STEP_SECONDS = 3                                                 # step length of the default pipeline
+METRICS_PORT = int(os.getenv("AGENT_METRICS_PORT", "9102"))     # GET /metrics; 0 disables
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
 
-# Setup DB session for agent loop
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
+# Setup DB session for agent loop (one connection per worker thread + claim/heartbeat)
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True,
+                       **({"pool_size": CONCURRENCY + 2} if DATABASE_URL.startswith("postgresql") else {}))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+if telemetry.ENABLED:
+    instrument_engine(engine, "agent")
+
+RUNS_CLAIMED = telemetry.Counter("flowops_agent_runs_claimed_total", "Runs claimed by this agent")
+RUNS_FINISHED = telemetry.Counter("flowops_agent_runs_finished_total", "Runs finished by outcome (completed, failed, lost_lease)",
+                                  ("outcome",))
+RUN_SECONDS = telemetry.Histogram("flowops_agent_run_duration_seconds", "Run time from pickup to final status",
+                                  buckets=telemetry.DURATION_BUCKETS)
+RUNS_INFLIGHT = telemetry.Gauge("flowops_agent_runs_inflight", "Runs this agent is processing")
+
+# Progress events are buffered and written in batches; flushed before status changes
+events = EventWriter(SessionLocal)
+
+# Step results are reused across runs when type, params and inputs match
+step_cache = StepCache(SessionLocal)
 
 def utcnow_naive():
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
-def process_run(run: Run, db: Session):
-    print(f"Processing run {run.id}...")
-    # Mark as running
-    run.status = RunStatus.running
-    db.add(RunEvent(run_id=run.id, ts=utcnow_naive(), level="info",
-                    title="Run started", detail="Agent picked up run"))
+# Lease up to `limit` runs: queued ones, plus running ones whose lease expired.
+# FOR UPDATE SKIP LOCKED lets several agent processes claim concurrently
+# without blocking on (or double-claiming) the same rows.
+def claim_runs(db: Session, limit: int, worker_id: str = WORKER_ID) -> List[int]:
+    if limit <= 0:
+        return []
+    now = utcnow_naive()
+    rows = db.execute(
+        select(Run)
+        .where(or_(
+            Run.status == RunStatus.queued,
+            and_(Run.status == RunStatus.running, Run.lease_expires_at < now),
+        ))
+        .order_by(Run.id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    claimed = []
+    for run in rows:
+        if run.status == RunStatus.running:
+            db.add(RunEvent(run_id=run.id, ts=now, level="warning", title="Run reclaimed",
+                            detail=f"Lease held by {run.claimed_by} expired; retrying on {worker_id}"))
+        run.status = RunStatus.running
+        run.claimed_by = worker_id
+        run.lease_expires_at = now + timedelta(seconds=LEASE_SECONDS)
+        claimed.append(run.id)
+    db.commit()
+    return claimed
+
+def renew_leases(db: Session, run_ids: Set[int], worker_id: str = WORKER_ID) -> int:
+    if not run_ids:
+        return 0
+    res = db.execute(
+        update(Run)
+        .where(Run.id.in_(run_ids), Run.claimed_by == worker_id, Run.status == RunStatus.running)
+        .values(lease_expires_at=utcnow_naive() + timedelta(seconds=LEASE_SECONDS))
+    )
     db.commit()
+    return res.rowcount
 
-    # Fake training steps
-    for i in range(1, 4):
-        time.sleep(3)
-        db.add(RunEvent(run_id=run.id, ts=utcnow_naive(), level="info",
-                        title=f"Step {i}", detail=f"Completed fake step {i}"))
+def _load_spec(run_id: int):
+    with SessionLocal() as db:
+        spec = db.execute(
+            select(Workflow.pipeline_spec).join(Run, Run.workflow_id == Workflow.id).where(Run.id == run_id)
+        ).scalar()
+    if not spec or not spec.get("steps"):
+        # runs without a pipeline (e.g. chat quick path) get the default three-step chain
+        spec = {"steps": [{"type": "sleep", "params": {"seconds": STEP_SECONDS}} for _ in range(3)]}
+    return spec
+
+def process_run(run_id: int, worker_id: str = WORKER_ID):
+    print(f"Processing run {run_id}...")
+    events.write(run_id, "Run started", f"Agent {worker_id} picked up run")
+
+    spec = _load_spec(run_id)
+    steps = parse_steps(spec)
+    result = run_pipeline(steps, run_id=run_id,
+                          emit=lambda title, detail=None, level="info": events.write(run_id, title, detail, level),
+                          cache=step_cache, force=bool(spec.get("force")))
+    metrics = run_metrics(steps, result["artifacts"])
+
+    # Mark as completed, but only if we still hold the lease
+    events.flush()
+    with SessionLocal() as db:
+        res = db.execute(
+            update(Run)
+            .where(Run.id == run_id, Run.claimed_by == worker_id)
+            .values(status=RunStatus.completed, lease_expires_at=None)
+        )
+        if res.rowcount:
+            if metrics:
+                merge_run_metrics(db, run_id, metrics)
+            db.add(RunEvent(run_id=run_id, ts=utcnow_naive(), level="info",
+                            title="Run completed", detail="All steps done"))
         db.commit()
+    if res.rowcount:
+        print(f"Run {run_id} completed.")
+    else:
+        print(f"Run {run_id} lost its lease; result discarded.")
+    RUNS_FINISHED.labels("completed" if res.rowcount else "lost_lease").inc()
 
-    # Mark as completed
-    run.status = RunStatus.completed
-    db.add(RunEvent(run_id=run.id, ts=utcnow_naive(), level="info",
-                    title="Run completed", detail="All steps done"))
-    db.commit()
-    print(f"Run {run.id} completed.")
-
-def run_worker():
-    print("Agent worker loop starting...")
-    while True:
-        with SessionLocal() as db:
-            queued = db.query(Run).filter(Run.status == RunStatus.queued).all()
-            for run in queued:
-                process_run(run, db)
-        time.sleep(5)
+def _fail_run(run_id: int, err: Exception, worker_id: str = WORKER_ID):
+    try:
+        events.flush()
+    except Exception as e:
+        print(f"Event flush failed for run {run_id}: {e}")
+    with SessionLocal() as db:
+        res = db.execute(
+            update(Run)
+            .where(Run.id == run_id, Run.claimed_by == worker_id)
+            .values(status=RunStatus.failed, lease_expires_at=None)
+        )
+        if res.rowcount:
+            db.add(RunEvent(run_id=run_id, ts=utcnow_naive(), level="error",
+                            title="Run failed", detail=str(err)[:4000]))
+        db.commit()
+
+def run_worker(concurrency: int = CONCURRENCY):
+    print(f"Agent worker loop starting ({WORKER_ID}, concurrency={concurrency})...")
+    inflight: Set[int] = set()
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def _heartbeat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            with lock:
+                ids = set(inflight)
+            try:
+                with SessionLocal() as db:
+                    renew_leases(db, ids)
+            except Exception as e:
+                print(f"Lease heartbeat failed: {e}")
+
+    def _run_one(run_id: int):
+        t0 = time.perf_counter()
+        RUNS_INFLIGHT.inc()
+        try:
+            process_run(run_id)
+        except Exception as e:
+            print(f"Run {run_id} failed: {e}")
+            RUNS_FINISHED.labels("failed").inc()
+            _fail_run(run_id, e)
+        finally:
+            RUNS_INFLIGHT.dec()
+            RUN_SECONDS.observe(time.perf_counter() - t0)
+            with lock:
+                inflight.discard(run_id)
+
+    threading.Thread(target=_heartbeat, name="lease-heartbeat", daemon=True).start()
+    event_archive.start_background(SessionLocal, stop)
+    if telemetry.ENABLED and METRICS_PORT:
+        telemetry.serve(METRICS_PORT)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="agent") as pool:
+        try:
+            while True:
+                with lock:
+                    free = concurrency - len(inflight)
+                claimed: List[int] = []
+                if free > 0:
+                    try:
+                        with SessionLocal() as db:
+                            claimed = claim_runs(db, free)
+                    except Exception as e:
+                        print(f"Claim failed: {e}")
+                RUNS_CLAIMED.inc(len(claimed))
+                for run_id in claimed:
+                    with lock:
+                        inflight.add(run_id)
+                    pool.submit(_run_one, run_id)
+                # keep draining while there is work (or a slot may free up soon); otherwise back off
+                time.sleep(0.5 if claimed or free <= 0 else POLL_SECONDS)
+        finally:
+            stop.set()
+            events.close()
@@ -0,0 +1,186 @@
+# backend/src/artifact_store.py
+# Content-addressed storage for generated app files.
+#
+# Every file body is written once to APP_BLOB_DIR/<aa>/<sha256> and shared by
+# all apps that contain it (app_blobs.refcount = number of app_files rows
+# pointing at it). Releasing an app drops its references and deletes only the
+# blobs nobody else uses. ZIP downloads are assembled from the blobs while
+# streaming, without a temp file.
+import hashlib
+import io
+import os
+import tempfile
+import time
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.models_app import AppBlob, AppFile
+
+BLOB_DIR = os.getenv("APP_BLOB_DIR", os.path.join(os.getenv("MODELS_ROOT", "/models"), "blobs"))
+ZIP_CHUNK = 64 * 1024
+
+
+def blob_path(digest: str, root: Optional[str] = None) -> str:
+    return os.path.join(root or BLOB_DIR, digest[:2], digest)
+
+
+def _write_blob(digest: str, data: bytes, root: Optional[str] = None) -> bool:
+    path = blob_path(digest, root)
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write-then-rename: readers never see a partial blob, racing writers write identical bytes
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _insert_blob_stmt(dialect: str):
+    # Core table insert (not the ORM bulk path) so rowcount tells whether we won the insert
+    table = AppBlob.__table__
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=["digest"])
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=["digest"])
+    return insert(table)
+
+
+def _acquire(db: Session, digest: str, size: int, n: int):
+    # refcount += n, creating the row on first use; loops only if a concurrent
+    # writer inserted the same digest between our update and insert
+    dialect = db.get_bind().dialect.name
+    while True:
+        res = db.execute(update(AppBlob).where(AppBlob.digest == digest)
+                         .values(refcount=AppBlob.refcount + n))
+        if res.rowcount:
+            return
+        res = db.execute(_insert_blob_stmt(dialect),
+                         {"digest": digest, "size_bytes": size, "refcount": n})
+        if res.rowcount:
+            return
+
+
+def store_app_files(db: Session, app_id: int, files: Dict[str, bytes], root: Optional[str] = None) -> Dict[str, int]:
+    bodies: Dict[str, bytes] = {}
+    refs: Dict[str, int] = {}
+    rows = []
+    written = 0
+    for path, data in files.items():
+        digest = hashlib.sha256(data).hexdigest()
+        bodies[digest] = data
+        refs[digest] = refs.get(digest, 0) + 1
+        rows.append({"app_id": app_id, "path": path, "digest": digest})
+        written += len(data) if _write_blob(digest, data, root) else 0
+    for digest in sorted(refs):   # fixed lock order across concurrent builds
+        _acquire(db, digest, len(bodies[digest]), refs[digest])
+    db.execute(insert(AppFile), rows)
+    db.commit()
+    # a release_app() racing with us may have removed a blob before our
+    # reference existed; put it back now that the reference is committed
+    for digest, data in bodies.items():
+        written += len(data) if _write_blob(digest, data, root) else 0
+    return {"files": len(rows), "bytes": sum(len(d) for d in files.values()), "new_bytes": written}
+
+
+def release_app(db: Session, app_id: int, root: Optional[str] = None) -> int:
+    # drop the app's references; returns bytes freed on disk
+    counts = db.execute(
+        select(AppFile.digest, func.count()).where(AppFile.app_id == app_id).group_by(AppFile.digest)
+    ).all()
+    if not counts:
+        return 0
+    db.execute(delete(AppFile).where(AppFile.app_id == app_id))
+    for digest, n in counts:
+        db.execute(update(AppBlob).where(AppBlob.digest == digest).values(refcount=AppBlob.refcount - n))
+    dead = db.execute(
+        select(AppBlob.digest, AppBlob.size_bytes)
+        .where(AppBlob.digest.in_([d for d, _ in counts]), AppBlob.refcount <= 0)
+        .with_for_update()
+    ).all()
+    db.execute(delete(AppBlob).where(AppBlob.digest.in_([d for d, _ in dead])))
+    # move dead blobs aside before committing so a failed commit can restore them
+    moved = []
+    for digest, _ in dead:
+        path = blob_path(digest, root)
+        try:
+            os.replace(path, path + ".del")
+            moved.append(path)
+        except OSError:
+            pass
+    try:
+        db.commit()
+    except Exception:
+        for path in moved:
+            os.replace(path + ".del", path)
+        raise
+    for path in moved:
+        try:
+            os.remove(path + ".del")
+        except OSError:
+            pass
+    return sum(size for _, size in dead)
+
+
+def app_files(db: Session, app_id: int) -> List[Tuple[str, str, int]]:
+    # [(path, digest, size_bytes)] in path order
+    return [tuple(r) for r in db.execute(
+        select(AppFile.path, AppFile.digest, AppBlob.size_bytes)
+        .join(AppBlob, AppBlob.digest == AppFile.digest)
+        .where(AppFile.app_id == app_id)
+        .order_by(AppFile.path)
+    ).all()]
+
+
+def app_file(db: Session, app_id: int, path: str) -> Optional[str]:
+    # blob path of one app file, None when the app has no such file
+    digest = db.scalar(select(AppFile.digest).where(AppFile.app_id == app_id, AppFile.path == path))
+    return blob_path(digest) if digest else None
+
+
+# --- streamed ZIP ---
+class _Sink(io.RawIOBase):
+    # write-only, unseekable: zipfile then emits data descriptors instead of seeking back
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+
+def stream_zip(entries: List[Tuple[str, str, int]], root: Optional[str] = None,
+               date_time: Optional[Tuple[int, ...]] = None) -> Iterator[bytes]:
+    # entries as returned by app_files(); yields the archive piece by piece
+    date_time = date_time or time.localtime()[:6]
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, digest, size in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.file_size = size
+            with open(blob_path(digest, root), "rb") as src, zf.open(info, "w") as dst:
+                while True:
+                    buf = src.read(ZIP_CHUNK)
+                    if not buf:
+                        break
+                    dst.write(buf)
+                    if sink.chunks:
+                        yield sink.drain()
+            if sink.chunks:
+                yield sink.drain()
+    if sink.chunks:   # central directory
+        yield sink.drain()
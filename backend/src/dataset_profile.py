@@ -0,0 +1,244 @@
+# backend/src/dataset_profile.py
+# Column profiles for datasets in the columnar cache (src/datasets.py), built
+# in one chunked pass over the memory-mapped columns:
+#   every column   count, nulls
+#   numeric/bool   min, max, mean, std (merged per chunk), quantiles and a
+#                  histogram from a mergeable quantile sketch
+#   int            distinct count and top-k (exact up to PROFILE_TRACK_DISTINCT
+#                  distinct values, lower bounds beyond)
+#   string/bool    distinct count and exact top-k (bincount over the codes)
+#   numeric pairs  pairwise-complete Pearson correlations, from four matrix
+#                  products per chunk
+# The profile is written next to the columns as profile.json, so each dataset
+# is scanned once whatever number of apps or requests use it.
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src import datasets
+
+PROFILE_VERSION = 1
+CHUNK_ROWS = int(os.getenv("PROFILE_CHUNK_ROWS", "262144"))            # upper bound on rows per chunk
+CHUNK_BYTES = int(os.getenv("PROFILE_CHUNK_BYTES", str(256 * 1024 ** 2)))  # working memory per chunk
+# rows x numeric-columns float64 arrays alive at once in a chunk: M, Z, the
+# np.where/M - mean temporaries and the correlation copies (W is 1 byte/cell)
+WORKING_COPIES = 6
+SKETCH_SIZE = int(os.getenv("PROFILE_SKETCH_SIZE", "2048"))
+TRACK_DISTINCT = int(os.getenv("PROFILE_TRACK_DISTINCT", "10000"))
+MAX_CORR_COLUMNS = int(os.getenv("PROFILE_MAX_CORR_COLUMNS", "50"))
+HIST_BINS = 20
+TOP_K = 10
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def _reduce(values: np.ndarray, weights: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    # sorted weighted points -> `size` evenly spaced order statistics of equal weight
+    if len(values) <= size:
+        return values, weights
+    cw = np.cumsum(weights)
+    total = cw[-1]
+    idx = np.searchsorted(cw, (np.arange(size) + 0.5) * (total / size))
+    return values[np.minimum(idx, len(values) - 1)], np.full(size, total / size)
+
+
+class QuantileSketch:
+    # Each chunk is reduced to at most `size` weighted order statistics; the
+    # summaries are concatenated and re-reduced once they pass 4*size points.
+    # Rank error is a small multiple of n/size.
+    def __init__(self, size: int = SKETCH_SIZE):
+        self.size = size
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+
+    def update(self, x: np.ndarray):
+        if not len(x):
+            return
+        v, w = _reduce(np.sort(x), np.ones(len(x)), self.size)
+        self.values = np.concatenate([self.values, v])
+        self.weights = np.concatenate([self.weights, w])
+        if len(self.values) > 4 * self.size:
+            order = np.argsort(self.values, kind="stable")
+            self.values, self.weights = _reduce(self.values[order], self.weights[order], self.size)
+
+    def _sorted(self) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(self.values, kind="stable")
+        return self.values[order], self.weights[order]
+
+    def quantiles(self, qs) -> List[float]:
+        v, w = self._sorted()
+        cw = np.cumsum(w)
+        idx = np.searchsorted(cw, np.asarray(qs) * cw[-1])
+        return v[np.minimum(idx, len(v) - 1)].tolist()
+
+    def histogram(self, lo: float, hi: float, total: int, bins: int = HIST_BINS) -> Dict[str, Any]:
+        v, w = self._sorted()
+        counts, edges = np.histogram(v, bins=bins, range=(lo, hi) if hi > lo else (lo - 0.5, lo + 0.5), weights=w)
+        # sketch weights back to whole row counts that add up (largest remainder)
+        scaled = counts * (total / max(counts.sum(), 1e-12))
+        out = np.floor(scaled).astype(np.int64)
+        out[np.argsort(out - scaled)[:total - int(out.sum())]] += 1
+        return {"edges": edges.tolist(), "counts": out.tolist()}
+
+
+def _merge_moments(a: Tuple[float, float, float], b: Tuple[float, float, float]) -> Tuple[float, float, float]:
+    # (n, mean, M2) of two parts -> of the union (Chan et al.)
+    n = a[0] + b[0]
+    if not n:
+        return a
+    d = b[1] - a[1]
+    return n, a[1] + d * b[0] / n, a[2] + b[2] + d * d * a[0] * b[0] / n
+
+
+def _top(values: np.ndarray, counts: np.ndarray, k: int = TOP_K) -> List[Tuple[Any, int]]:
+    order = np.argsort(-counts, kind="stable")[:k]
+    return [(values[i], int(counts[i])) for i in order if counts[i] > 0]
+
+
+def _clean(v: Any) -> Any:
+    # JSON has no NaN/inf
+    if isinstance(v, float) and not np.isfinite(v):
+        return None
+    return v
+
+
+def chunk_rows_for(p: int, budget: int = CHUNK_BYTES, max_rows: int = CHUNK_ROWS) -> int:
+    # rows per chunk so that a chunk's working set (p columns x 8 bytes x
+    # WORKING_COPIES) stays within budget: a wide dataset gets shorter chunks
+    if not p:
+        return max_rows
+    return max(1024, min(max_rows, budget // (p * 8 * WORKING_COPIES)))
+
+
+def build_profile(dataset: Any, chunk_rows: Optional[int] = None) -> Dict[str, Any]:
+    schema = datasets.resolve(dataset)
+    cols = datasets.load_columns(schema)
+    n = schema["rows"]
+    numeric = [c for c in schema["columns"] if c["kind"] in ("int", "float", "bool")]
+    strings = [c for c in schema["columns"] if c["kind"] == "string"]
+    p = len(numeric)
+    chunk_rows = chunk_rows or chunk_rows_for(p)
+    corr_p = min(p, MAX_CORR_COLUMNS)
+    t0 = time.perf_counter()
+
+    moments = [(0.0, 0.0, 0.0)] * p
+    lo, hi = np.full(p, np.inf), np.full(p, -np.inf)
+    sketches = [QuantileSketch() for _ in range(p)]
+    tracked: List[Optional[Dict[Any, int]]] = [{} if c["kind"] in ("int", "bool") else None for c in numeric]
+    pruned = [False] * p
+    code_counts = {c["name"]: np.zeros(c.get("cardinality", 0) + 1, dtype=np.int64) for c in strings}   # [0] = null
+    pair_n = np.zeros((corr_p, corr_p))
+    pair_sx = np.zeros((corr_p, corr_p))
+    pair_sxx = np.zeros((corr_p, corr_p))
+    pair_sxy = np.zeros((corr_p, corr_p))
+
+    for start in range(0, n, chunk_rows):
+        stop = min(n, start + chunk_rows)
+        if p:
+            M = np.empty((stop - start, p))
+            for j, c in enumerate(numeric):
+                M[:, j] = cols[c["name"]][start:stop]
+            W = ~np.isnan(M)
+            Z = np.where(W, M, 0.0)
+            cnt = W.sum(axis=0)
+            mean_b = Z.sum(axis=0) / np.maximum(cnt, 1)
+            m2_b = (np.where(W, M - mean_b, 0.0) ** 2).sum(axis=0)
+            lo = np.minimum(lo, np.where(W, M, np.inf).min(axis=0))
+            hi = np.maximum(hi, np.where(W, M, -np.inf).max(axis=0))
+            for j in range(p):
+                moments[j] = _merge_moments(moments[j], (float(cnt[j]), float(mean_b[j]), float(m2_b[j])))
+                x = M[W[:, j], j]
+                sketches[j].update(x)
+                if tracked[j] is not None and not pruned[j]:
+                    u, k = np.unique(x, return_counts=True)
+                    t = tracked[j]
+                    for value, count in zip(u.tolist(), k.tolist()):
+                        t[value] = t.get(value, 0) + count
+                    if len(t) > TRACK_DISTINCT:
+                        # too many values to count exactly: keep the heavy ones (lower bounds)
+                        keep = sorted(t.items(), key=lambda kv: -kv[1])[:TRACK_DISTINCT]
+                        tracked[j], pruned[j] = dict(keep), True
+            if corr_p:
+                Wc = W[:, :corr_p].astype(np.float64)
+                Zc = Z[:, :corr_p]
+                pair_n += Wc.T @ Wc
+                pair_sx += Zc.T @ Wc          # [i, j]: sum of x_i where x_i and x_j are present
+                pair_sxx += (Zc * Zc).T @ Wc
+                pair_sxy += Zc.T @ Zc
+        for c in strings:
+            codes = np.asarray(cols[c["name"]][start:stop])
+            code_counts[c["name"]] += np.bincount(codes + 1, minlength=len(code_counts[c["name"]]))
+
+    out_cols: Dict[str, Dict[str, Any]] = {}
+    for j, c in enumerate(numeric):
+        count, mean, m2 = moments[j]
+        prof: Dict[str, Any] = {"name": c["name"], "kind": c["kind"], "count": int(count), "nulls": n - int(count)}
+        if count:
+            prof.update(min=float(lo[j]), max=float(hi[j]), mean=mean, std=(m2 / count) ** 0.5,
+                        quantiles={f"p{round(q * 100)}": v for q, v in zip(QUANTILES, sketches[j].quantiles(QUANTILES))},
+                        histogram=sketches[j].histogram(float(lo[j]), float(hi[j]), int(count)))
+        if tracked[j] is not None:
+            t = tracked[j]
+            values = np.array(list(t.keys()))
+            counts = np.array(list(t.values()))
+            if c["kind"] == "bool":
+                prof["top_k"] = [{"value": bool(v), "count": k} for v, k in _top(values, counts)]
+            else:
+                prof["top_k"] = [{"value": int(v), "count": k} for v, k in _top(values, counts)]
+            prof["distinct"] = None if pruned[j] else len(t)
+            prof["top_k_exact"] = not pruned[j]
+        out_cols[c["name"]] = prof
+    for c in strings:
+        counts = code_counts[c["name"]]
+        present = counts[1:]
+        cats = datasets.categories(schema, c["name"]) if len(present) else []
+        out_cols[c["name"]] = {
+            "name": c["name"], "kind": "string", "count": int(present.sum()), "nulls": int(counts[0]),
+            "distinct": int(np.count_nonzero(present)),
+            "top_k": [{"value": cats[i], "count": k} for i, k in _top(np.arange(len(present)), present)],
+            "top_k_exact": True,
+        }
+
+    corr = None
+    if corr_p > 1:
+        var_i = pair_n * pair_sxx - pair_sx ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = (pair_n * pair_sxy - pair_sx * pair_sx.T) / np.sqrt(var_i * var_i.T)
+        r = np.where(np.isfinite(r), np.clip(r, -1.0, 1.0), np.nan)
+        corr = {"columns": [c["name"] for c in numeric[:corr_p]],
+                "matrix": [[_clean(round(float(v), 6)) for v in row] for row in r]}
+
+    columns = []
+    for c in schema["columns"]:
+        prof = out_cols[c["name"]]
+        prof["null_fraction"] = round(prof["nulls"] / n, 6) if n else None
+        columns.append({k: _clean(v) for k, v in prof.items()})
+    return {
+        "version": PROFILE_VERSION,
+        "digest": schema["digest"],
+        "rows": n,
+        "columns": columns,
+        "correlations": corr,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def get_profile(dataset: Any) -> Dict[str, Any]:
+    # cached next to the columns; built on first use
+    schema = datasets.resolve(dataset)
+    path = os.path.join(schema["path"], "profile.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+        if profile.get("version") == PROFILE_VERSION:
+            return profile
+    except (OSError, ValueError):
+        pass
+    profile = build_profile(schema)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f)
+    os.replace(tmp, path)
+    return profile
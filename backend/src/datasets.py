@@ -0,0 +1,577 @@
+# backend/src/datasets.py
+# Dataset ingestion with a columnar cache.
+#
+# A CSV or JSONL source (http(s) URL, or a local file under DATASET_LOCAL_ROOTS,
+# optionally gzipped) is hashed while it is fetched; its sha256 is the cache
+# key. On a miss the text is stream-parsed once, in chunks of
+# DATASET_CHUNK_ROWS, and every column is appended to its own .npy file while
+# its type is inferred (int, float, bool or string; a column is rewritten in
+# place the few times its type has to widen). Strings are dictionary-encoded
+# (int32 codes, -1 = null, categories in a JSON file).
+#
+#   DATASET_CACHE_DIR/<sha256>/schema.json
+#                             /c0000.npy, c0001.npy, ...
+#                             /c0002.categories.json
+#                             /train/<key>/X.npy, y.npy   (training_set)
+#
+# Training, evaluation and analyze-mode apps then memory-map the columns
+# instead of re-parsing text. Least recently used entries are evicted once the
+# cache grows past DATASET_CACHE_MAX_BYTES.
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+MODELS_ROOT = os.getenv("MODELS_ROOT", "/models")
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(MODELS_ROOT, "datasets"))
+CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+LOCAL_ROOTS = [r for r in os.getenv("DATASET_LOCAL_ROOTS", MODELS_ROOT).split(os.pathsep) if r]
+MAX_SOURCE_BYTES = int(os.getenv("DATASET_MAX_SOURCE_BYTES", str(10 * 1024 ** 3)))
+CHUNK_ROWS = int(os.getenv("DATASET_CHUNK_ROWS", "65536"))
+FETCH_TIMEOUT = float(os.getenv("DATASET_FETCH_TIMEOUT", "30"))
+READ_BLOCK = 1024 * 1024
+
+NULL_TOKENS = {"", "NA", "N/A", "null", "NULL", "None"}
+TRUE_TOKENS = ["true", "True", "TRUE"]
+BOOL_TOKENS = TRUE_TOKENS + ["false", "False", "FALSE"]
+
+
+class DatasetError(ValueError):
+    pass
+
+
+# --- fetching ---
+def _resolve_local(source: str) -> str:
+    path = os.path.realpath(source[len("file://"):] if source.startswith("file://") else source)
+    for root in LOCAL_ROOTS:
+        root = os.path.realpath(root)
+        if os.path.commonpath([root, path]) == root:
+            if not os.path.isfile(path):
+                raise DatasetError(f"{source}: no such file")
+            return path
+    raise DatasetError(f"{source}: local datasets must live under {os.pathsep.join(LOCAL_ROOTS)}")
+
+
+def _fetch(source: str, tmp_dir: str) -> Tuple[str, str, int]:
+    # -> (local path, sha256, size); remote sources are downloaded into tmp_dir
+    h, size = hashlib.sha256(), 0
+    if source.startswith(("http://", "https://")):
+        path = os.path.join(tmp_dir, "source")
+        try:
+            with requests.get(source, stream=True, timeout=FETCH_TIMEOUT) as r, open(path, "wb") as f:
+                r.raise_for_status()
+                for block in r.iter_content(READ_BLOCK):
+                    size += len(block)
+                    if size > MAX_SOURCE_BYTES:
+                        raise DatasetError(f"{source}: larger than {MAX_SOURCE_BYTES} bytes")
+                    h.update(block)
+                    f.write(block)
+        except requests.RequestException as e:
+            raise DatasetError(f"{source}: download failed: {e}") from e
+        return path, h.hexdigest(), size
+    path = _resolve_local(source)
+    with open(path, "rb") as f:
+        while block := f.read(READ_BLOCK):
+            size += len(block)
+            h.update(block)
+    return path, h.hexdigest(), size
+
+
+# --- parsing ---
+def _open_text(path: str) -> io.TextIOBase:
+    with open(path, "rb") as f:
+        gz = f.read(2) == b"\x1f\x8b"
+    raw = gzip.open(path, "rb") if gz else open(path, "rb")
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+
+def _sniff(path: str) -> Dict[str, Any]:
+    # decided from the content alone, so equal bytes always parse the same way
+    with _open_text(path) as f:
+        head = f.read(64 * 1024)
+    if head.lstrip().startswith("{"):
+        return {"format": "jsonl"}
+    try:
+        delimiter = csv.Sniffer().sniff("\n".join(head.split("\n")[:20]), delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    return {"format": "csv", "delimiter": delimiter}
+
+
+def _norm(v: Any) -> Optional[str]:
+    # JSON values as the strings a CSV would hold, so both share one type path
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, separators=(",", ":"))
+    v = str(v)
+    return None if v in NULL_TOKENS else v
+
+
+Chunk = Tuple[List[str], Dict[str, List[Optional[str]]], int]   # (column names, values by column, rows)
+
+
+def _csv_chunks(path: str, delimiter: str, chunk_rows: int) -> Iterator[Chunk]:
+    with _open_text(path) as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            return
+        names = _unique_names(header)
+        width = len(names)
+        while True:
+            rows = []
+            for row in reader:
+                if len(row) != width:
+                    if not row:
+                        continue
+                    row = row[:width] + [""] * (width - len(row))
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    break
+            if not rows:
+                return
+            cols = zip(*rows)
+            yield names, {n: [None if v in NULL_TOKENS else v for v in col] for n, col in zip(names, cols)}, len(rows)
+
+
+def _jsonl_chunks(path: str, chunk_rows: int) -> Iterator[Chunk]:
+    found: Dict[str, None] = {}   # columns in first-seen order
+    with _open_text(path) as f:
+        rows = []
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                raise DatasetError(f"line {lineno}: invalid JSON: {e}") from e
+            if not isinstance(obj, dict):
+                raise DatasetError(f"line {lineno}: expected an object")
+            found.update(dict.fromkeys(obj))
+            rows.append(obj)
+            if len(rows) >= chunk_rows:
+                yield list(found), {n: [_norm(r.get(n)) for r in rows] for n in found}, len(rows)
+                rows = []
+        if rows:
+            yield list(found), {n: [_norm(r.get(n)) for r in rows] for n in found}, len(rows)
+
+
+def _chunks(path: str, opts: Dict[str, Any], chunk_rows: int) -> Iterator[Chunk]:
+    if opts["format"] == "jsonl":
+        return _jsonl_chunks(path, chunk_rows)
+    return _csv_chunks(path, opts["delimiter"], chunk_rows)
+
+
+def _unique_names(header: List[str]) -> List[str]:
+    seen: Dict[str, int] = {}
+    names = []
+    for i, h in enumerate(header):
+        name = h.strip() or f"column_{i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+# --- columnar writing ---
+HEADER_BYTES = 128   # fixed .npy header size: the row count is patched in at the end
+
+
+def _npy_header(dtype: str, rows: int) -> bytes:
+    d = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), rows)
+    body = (d.ljust(HEADER_BYTES - 11) + "\n").encode("latin1")
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(body)) + body
+
+
+def _parse(values: List[str]) -> Tuple[Optional[str], Optional[np.ndarray]]:
+    # -> (kind, parsed values); numeric parses fail fast on the first bad value,
+    # so they go first. Strings are left as they are
+    if not values:
+        return None, None
+    arr = np.array(values)
+    try:
+        return "int", arr.astype(np.int64)
+    except (ValueError, OverflowError):
+        pass
+    try:
+        return "float", arr.astype(np.float64)
+    except ValueError:
+        pass
+    if arr[0] in BOOL_TOKENS and np.isin(arr, BOOL_TOKENS).all():
+        return "bool", np.isin(arr, TRUE_TOKENS)
+    return "string", None
+
+
+def _merge_kind(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    if {a, b} == {"int", "float"}:
+        return "float"
+    return "string"
+
+
+def _dtype(kind: str, nulls: int) -> str:
+    if kind == "string":
+        return "int32"
+    if kind == "float" or nulls:
+        return "float64"   # NaN marks the nulls
+    return "int64" if kind == "int" else "bool"
+
+
+def _as_text(v: Any, kind: str) -> Optional[str]:
+    # a value already written as a number, once its column turns out to hold strings
+    if isinstance(v, float) and v != v:
+        return None
+    if kind == "bool":
+        return "true" if v else "false"
+    return str(int(v)) if kind == "int" else repr(float(v))
+
+
+class _ColumnWriter:
+    # Appends one column to its .npy as chunks are parsed, so the text is read
+    # once. A column's type only widens (int -> float, nulls -> float64,
+    # anything -> string codes); widening rewrites the rows written so far.
+    def __init__(self, path: str, leading_nulls: int = 0):
+        self.path = path
+        self.kind: Optional[str] = None
+        self.dtype: Optional[str] = None
+        self.rows = self.nulls = leading_nulls   # a JSONL column first seen late is null before
+        self.codes: Dict[str, int] = {}
+        self.f = None
+
+    def append(self, values: List[Optional[str]]):
+        present = [v for v in values if v is not None]
+        kind, parsed = _parse(present)
+        merged = _merge_kind(self.kind, kind)
+        nulls = self.nulls + len(values) - len(present)
+        if merged is not None:
+            dtype = _dtype(merged, nulls)
+            if (merged, dtype) != (self.kind, self.dtype):
+                self._widen(merged, dtype)
+            if merged == "string":
+                out = np.fromiter((-1 if v is None else self.codes.setdefault(v, len(self.codes)) for v in values),
+                                  dtype=np.int32, count=len(values))
+            elif len(present) == len(values):
+                out = parsed.astype(dtype, copy=False)
+            else:
+                out = np.full(len(values), np.nan)
+                if present:
+                    out[np.fromiter((v is not None for v in values), dtype=bool, count=len(values))] = parsed
+            self.f.write(out.tobytes())
+        self.rows += len(values)
+        self.nulls = nulls
+
+    def _widen(self, kind: str, dtype: str):
+        old_kind, old_dtype = self.kind, self.dtype
+        self.kind, self.dtype = kind, dtype
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(_npy_header(dtype, 0))
+            if old_kind is None:
+                # rows so far were all null
+                for s in range(0, self.rows, CHUNK_ROWS):
+                    out.write(np.full(min(CHUNK_ROWS, self.rows - s), -1 if kind == "string" else np.nan,
+                                      dtype=dtype).tobytes())
+            elif self.rows:
+                self.f.flush()
+                old = np.memmap(self.path, dtype=old_dtype, mode="r", offset=HEADER_BYTES, shape=(self.rows,))
+                for s in range(0, self.rows, CHUNK_ROWS):
+                    block = old[s:s + CHUNK_ROWS]
+                    if kind == "string":
+                        block = np.fromiter((-1 if t is None else self.codes.setdefault(t, len(self.codes))
+                                             for t in (_as_text(v, old_kind) for v in block.tolist())),
+                                            dtype=np.int32, count=len(block))
+                    out.write(np.asarray(block, dtype=dtype).tobytes())
+                del old
+        if self.f is not None:
+            self.f.close()
+        os.replace(tmp, self.path)
+        self.f = open(self.path, "r+b")
+        self.f.seek(0, os.SEEK_END)
+
+    def close(self) -> Dict[str, Any]:
+        if self.kind is None:
+            self._widen("string", "int32")   # never saw a value
+        self.f.seek(0)
+        self.f.write(_npy_header(self.dtype, self.rows))
+        self.f.close()
+        return {"kind": self.kind, "dtype": self.dtype, "nulls": self.nulls}
+
+
+def _write_columns(path: str, opts: Dict[str, Any], out_dir: str,
+                   chunk_rows: int = CHUNK_ROWS) -> Tuple[int, List[Dict[str, Any]]]:
+    # -> (rows, column schemas); one parse of the source
+    writers: Dict[str, _ColumnWriter] = {}
+    rows = 0
+    try:
+        for names, cols, n_rows in _chunks(path, opts, chunk_rows):
+            for n in names:
+                if n not in writers:
+                    writers[n] = _ColumnWriter(os.path.join(out_dir, f"c{len(writers):04d}.npy"), rows)
+                writers[n].append(cols[n])
+            rows += n_rows
+        columns = []
+        for name, w in writers.items():
+            col = {"name": name, **w.close(), "file": os.path.basename(w.path)}
+            if col["kind"] == "string":
+                col["categories"] = col["file"].replace(".npy", ".categories.json")
+                col["cardinality"] = len(w.codes)
+                with open(os.path.join(out_dir, col["categories"]), "w", encoding="utf-8") as f:
+                    json.dump(list(w.codes), f)
+            columns.append(col)
+        return rows, columns
+    finally:
+        for w in writers.values():
+            if w.f is not None and not w.f.closed:
+                w.f.close()
+
+
+# --- cache ---
+def _entry_dir(digest: str) -> str:
+    return os.path.join(CACHE_DIR, digest)
+
+
+def get_schema(digest: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(_entry_dir(digest), "schema.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)   # last use, drives eviction
+    schema["path"] = _entry_dir(digest)
+    return schema
+
+
+def list_datasets() -> List[Dict[str, Any]]:
+    out = []
+    if os.path.isdir(CACHE_DIR):
+        for digest in sorted(os.listdir(CACHE_DIR)):
+            try:
+                with open(os.path.join(CACHE_DIR, digest, "schema.json"), encoding="utf-8") as f:
+                    s = json.load(f)
+            except (OSError, ValueError):
+                continue
+            out.append({k: s[k] for k in ("digest", "source", "format", "rows", "source_bytes", "created_at")})
+    return out
+
+
+def ingest(source: str, chunk_rows: int = CHUNK_ROWS) -> Dict[str, Any]:
+    # -> schema dict (plus "path" and "cached"); same content, same entry
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=CACHE_DIR, prefix=".fetch-") as tmp:
+        path, digest, size = _fetch(source, tmp)
+        schema = get_schema(digest)
+        if schema is not None:
+            return {**schema, "cached": True}
+
+        t0 = time.perf_counter()
+        opts = _sniff(path)
+        build = os.path.join(CACHE_DIR, f".build-{uuid.uuid4().hex}")
+        os.makedirs(build)
+        try:
+            rows, columns = _write_columns(path, opts, build, chunk_rows)
+            if not columns:
+                raise DatasetError(f"{source}: no columns found")
+            schema = {
+                "digest": digest, "source": source, **opts, "rows": rows, "source_bytes": size,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "ingest_seconds": round(time.perf_counter() - t0, 3),
+                "columns": columns,
+            }
+            with open(os.path.join(build, "schema.json"), "w", encoding="utf-8") as f:
+                json.dump(schema, f)
+            try:
+                os.rename(build, _entry_dir(digest))
+            except OSError:
+                pass   # a concurrent ingest of the same content won; use its entry
+        finally:
+            shutil.rmtree(build, ignore_errors=True)
+    evict(keep=digest)
+    return {**get_schema(digest), "cached": False}
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES, keep: Optional[str] = None) -> int:
+    # drop least recently used entries until the cache fits; returns bytes freed
+    entries = []
+    for digest in os.listdir(CACHE_DIR) if os.path.isdir(CACHE_DIR) else []:
+        d = _entry_dir(digest)
+        try:
+            used = os.stat(os.path.join(d, "schema.json")).st_mtime
+        except OSError:
+            continue   # in-progress build/fetch dirs
+        size = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(d) for f in fs)
+        entries.append((used, digest, size))
+    total = sum(e[2] for e in entries)
+    freed = 0
+    for _, digest, size in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        if digest == keep:
+            continue
+        shutil.rmtree(_entry_dir(digest), ignore_errors=True)
+        freed += size
+    return freed
+
+
+# --- reading ---
+def resolve(dataset: Any) -> Dict[str, Any]:
+    # digest or schema -> schema
+    schema = get_schema(dataset) if isinstance(dataset, str) else dataset
+    if schema is None:
+        raise DatasetError(f"dataset {dataset} not found")
+    return schema
+
+
+def load_columns(dataset: Any, names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    # dataset: digest or schema; columns come back memory-mapped
+    schema = resolve(dataset)
+    by_name = {c["name"]: c for c in schema["columns"]}
+    missing = [n for n in names or [] if n not in by_name]
+    if missing:
+        raise DatasetError(f"unknown columns {missing}")
+    return {n: np.load(os.path.join(schema["path"], by_name[n]["file"]), mmap_mode="r")
+            for n in (names or list(by_name))}
+
+
+def categories(dataset: Any, name: str) -> List[str]:
+    schema = resolve(dataset)
+    col = next((c for c in schema["columns"] if c["name"] == name), None)
+    if col is None or col["kind"] != "string":
+        raise DatasetError(f"{name} is not a string column")
+    with open(os.path.join(schema["path"], col["categories"]), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_rows(dataset: Any, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    # a page of rows decoded back to JSON values (nulls as None)
+    schema = resolve(dataset)
+    cols = load_columns(schema)
+    out: List[Dict[str, Any]] = [{} for _ in range(max(0, min(limit, schema["rows"] - offset)))]
+    for c in schema["columns"]:
+        values = cols[c["name"]][offset:offset + len(out)]
+        cats = categories(schema, c["name"]) if c["kind"] == "string" else None
+        for row, v in zip(out, values.tolist()):
+            if cats is not None:
+                row[c["name"]] = cats[v] if v >= 0 else None
+            elif isinstance(v, float) and v != v:
+                row[c["name"]] = None
+            elif c["kind"] == "bool":
+                row[c["name"]] = bool(v)
+            elif c["kind"] == "int":
+                row[c["name"]] = int(v)
+            else:
+                row[c["name"]] = v
+    return out
+
+
+def target_labels(dataset: Any, target: str, positive: Optional[str] = None) -> Optional[List[str]]:
+    # [negative, positive] for a two-category string target (None for numeric
+    # ones). Category codes follow first appearance in the file, so the mapping
+    # is chosen here instead: `positive` when given, else sorted order
+    # ("no"/"yes" -> yes = 1, "0"/"1" -> 1 = 1), the same for any file.
+    schema = resolve(dataset)
+    col = next((c for c in schema["columns"] if c["name"] == target), None)
+    if col is None or col["kind"] != "string":
+        if positive is not None:
+            raise DatasetError(f"positive={positive!r} only applies to a string target")
+        return None
+    cats = sorted(categories(schema, target))
+    if positive is None:
+        return cats
+    if positive not in cats:
+        raise DatasetError(f"positive={positive!r} is not a value of {target!r} {cats}")
+    return [c for c in cats if c != positive] + [positive]
+
+
+def training_set(dataset: Any, target: str, features: Optional[List[str]] = None,
+                 chunk_rows: int = CHUNK_ROWS, labels: Optional[List[str]] = None) -> Tuple[str, List[str]]:
+    # -> (dir with X.npy / y.npy for src.mlops.trainer, feature names). Features
+    # default to every numeric/bool column but the target; nulls become the
+    # column mean. A string target must have exactly two categories; y is 0/1
+    # by `labels` ([negative, positive], default target_labels()) - pass the
+    # train set's labels when building an evaluation set.
+    schema = resolve(dataset)
+    by_name = {c["name"]: c for c in schema["columns"]}
+    if target not in by_name:
+        raise DatasetError(f"unknown target column {target!r}")
+    tcol = by_name[target]
+    if tcol["nulls"]:
+        raise DatasetError(f"target {target!r} has {tcol['nulls']} nulls")
+    if tcol["kind"] == "string" and tcol.get("cardinality") != 2:
+        raise DatasetError(f"string target {target!r} needs exactly 2 categories, has {tcol.get('cardinality')}")
+    if features is None:
+        features = [c["name"] for c in schema["columns"] if c["name"] != target and c["kind"] != "string"]
+    bad = [f for f in features if f not in by_name or by_name[f]["kind"] == "string" or f == target]
+    if bad or not features:
+        raise DatasetError(f"unusable feature columns {bad or features}")
+
+    lut = None
+    if tcol["kind"] == "string":
+        labels = list(labels or target_labels(schema, target))
+        cats = categories(schema, target)
+        if len(labels) != 2 or sorted(cats) != sorted(labels):
+            raise DatasetError(f"target {target!r} has values {sorted(cats)}, expected labels {labels}")
+        lut = np.array([labels.index(c) for c in cats], dtype=np.float32)   # file code -> 0/1
+    else:
+        labels = None
+    key = hashlib.sha256(json.dumps([target, features] + ([labels] if labels else [])).encode()).hexdigest()[:16]
+    out = os.path.join(schema["path"], "train", key)
+    if os.path.exists(os.path.join(out, "y.npy")):
+        return out, features
+    cols = load_columns(schema, features + [target])
+    n = schema["rows"]
+    fill = {}
+    for f in features:
+        if by_name[f]["nulls"]:
+            s, k = 0.0, 0
+            for start in range(0, n, chunk_rows):
+                block = np.asarray(cols[f][start:start + chunk_rows], dtype=np.float64)
+                ok = ~np.isnan(block)
+                s += float(block[ok].sum())
+                k += int(ok.sum())
+            fill[f] = s / k if k else 0.0
+
+    build = f"{out}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(build)
+    X = np.lib.format.open_memmap(os.path.join(build, "X.npy"), mode="w+", dtype=np.float32, shape=(n, len(features)))
+    y = np.lib.format.open_memmap(os.path.join(build, "y.npy"), mode="w+", dtype=np.float32, shape=(n,))
+    for start in range(0, n, chunk_rows):
+        stop = min(n, start + chunk_rows)
+        for j, f in enumerate(features):
+            block = np.asarray(cols[f][start:stop], dtype=np.float32)
+            if f in fill:
+                block = np.where(np.isnan(block), np.float32(fill[f]), block)
+            X[start:stop, j] = block
+        block = cols[target][start:stop]
+        y[start:stop] = lut[block] if lut is not None else block
+    X.flush()
+    y.flush()
+    del X, y
+    with open(os.path.join(build, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"target": target, "features": features, "labels": labels}, f)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    try:
+        os.rename(build, out)
+    except OSError:
+        shutil.rmtree(build, ignore_errors=True)   # built concurrently
+    return out, features
@@ -0,0 +1,343 @@
+# backend/src/event_archive.py
+# Retention for run_events: old events of finished runs move out of the DB
+# into append-only segment files, and stay readable through fetch_events().
+#
+# An archive pass takes the events older than EVENT_RETENTION_DAYS of every
+# completed/failed run, writes them (per run, in id order) as one gzip member
+# of ndjson appended to EVENT_ARCHIVE_DIR/segments/seg-NNNNNN.jsonl.gz, fsyncs,
+# and then - in one transaction - records (segment, offset, length, id range)
+# in run_event_archive and deletes exactly those rows. A crash in between
+# leaves unreferenced bytes in a segment, never a lost or doubled event.
+#
+# On Postgres run_events is range-partitioned by month (migration
+# 20251020_0012): the pass also creates the upcoming partitions and drops the
+# ones that archival has emptied, so old data leaves by DROP TABLE instead of
+# by vacuuming dead rows. Other databases get the archival part only.
+#
+#   python -m src.event_archive [--dry-run]     # one pass (the agent runs it hourly)
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from src import telemetry
+from src.models import Run, RunEvent, RunEventArchive, RunStatus, utcnow_naive
+
+ARCHIVE_DIR = os.getenv("EVENT_ARCHIVE_DIR", os.path.join(os.getenv("MODELS_ROOT", "/models"), "event-archive"))
+RETENTION_DAYS = float(os.getenv("EVENT_RETENTION_DAYS", "30"))
+BATCH_RUNS = int(os.getenv("EVENT_ARCHIVE_BATCH_RUNS", "200"))           # runs per candidate query
+CHUNK_EVENTS = int(os.getenv("EVENT_ARCHIVE_CHUNK_EVENTS", "5000"))      # events per gzip member
+SEGMENT_MAX_BYTES = int(os.getenv("EVENT_SEGMENT_MAX_BYTES", str(256 * 1024 ** 2)))
+INTERVAL = float(os.getenv("EVENT_ARCHIVE_INTERVAL", "3600"))            # agent-side schedule; 0 disables
+CACHE_CHUNKS = int(os.getenv("EVENT_ARCHIVE_CACHE_CHUNKS", "64"))        # decompressed chunks kept for replays
+PARTITION_MONTHS_AHEAD = 2
+# stored columns of run_events (search_vector is generated and must not be copied)
+COLUMNS = "id, run_id, ts, level, title, detail, idempotency_key"
+
+FINISHED = (RunStatus.completed, RunStatus.failed)
+
+ARCHIVED_EVENTS = telemetry.Counter("flowops_run_events_archived_total", "Run events moved to archive segments")
+ARCHIVED_BYTES = telemetry.Counter("flowops_event_archive_bytes_total", "Compressed bytes appended to archive segments")
+ARCHIVE_READS = telemetry.Counter("flowops_event_archive_chunk_reads_total",
+                                  "Archived chunks served, by whether they were cached", ("cached",))
+
+
+# --- segment files ---
+def _to_doc(ev: RunEvent) -> Dict[str, Any]:
+    # same shape as the live API (src/server/events.serialize_event) plus the key
+    return {
+        "id": ev.id,
+        "ts": ev.ts.replace(tzinfo=timezone.utc).isoformat(),
+        "level": ev.level,
+        "title": ev.title,
+        "detail": ev.detail,
+        "idempotency_key": ev.idempotency_key,
+    }
+
+
+class SegmentWriter:
+    # appends gzip members to the newest segment, starting a new one past max_bytes;
+    # only ever used under the archive lock, so there is a single writer
+    def __init__(self, root: str, max_bytes: int = SEGMENT_MAX_BYTES):
+        self.dir = os.path.join(root, "segments")
+        self.max_bytes = max_bytes
+        os.makedirs(self.dir, exist_ok=True)
+        names = sorted(n for n in os.listdir(self.dir) if re.fullmatch(r"seg-\d{6}\.jsonl\.gz", n))
+        self.seq = int(names[-1][4:10]) if names else 1
+        self._f = None
+
+    def _name(self) -> str:
+        return f"seg-{self.seq:06d}.jsonl.gz"
+
+    def append(self, data: bytes) -> Tuple[str, int]:
+        if self._f is None:
+            self._f = open(os.path.join(self.dir, self._name()), "ab")
+        offset = self._f.seek(0, os.SEEK_END)
+        if offset and offset + len(data) > self.max_bytes:
+            self._f.close()
+            self.seq += 1
+            self._f = open(os.path.join(self.dir, self._name()), "ab")
+            offset = 0
+            _fsync_dir(self.dir)
+        self._f.write(data)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return f"segments/{self._name()}", offset
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+_cache: "OrderedDict[Tuple[str, str, int], List[Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def read_chunk(segment: str, offset: int, length: int, root: Optional[str] = None) -> List[Dict[str, Any]]:
+    root = root or ARCHIVE_DIR
+    key = (root, segment, offset)
+    with _cache_lock:
+        docs = _cache.get(key)
+        if docs is not None:
+            _cache.move_to_end(key)
+    if docs is not None:
+        ARCHIVE_READS.labels("yes").inc()
+        return docs
+    with open(os.path.join(root, segment), "rb") as f:
+        f.seek(offset)
+        raw = gzip.decompress(f.read(length))
+    docs = [json.loads(line) for line in raw.splitlines() if line]
+    ARCHIVE_READS.labels("no").inc()
+    with _cache_lock:
+        _cache[key] = docs
+        while len(_cache) > CACHE_CHUNKS:
+            _cache.popitem(last=False)
+    return docs
+
+
+def read_archived(entries: Iterable[Any], after_id: int = 0, limit: Optional[int] = None,
+                  root: Optional[str] = None) -> List[Dict[str, Any]]:
+    # entries: run_event_archive rows of one run; -> API-shaped events with id > after_id
+    # (chunks of different passes may interleave ids, hence the sort per chunk)
+    out: List[Dict[str, Any]] = []
+    for e in sorted(entries, key=lambda e: e.first_id):
+        if e.last_id <= after_id:
+            continue
+        if limit and len(out) >= limit and e.first_id > out[limit - 1]["id"]:
+            break
+        for doc in read_chunk(e.segment, e.offset, e.length, root):
+            if doc["id"] > after_id:
+                out.append({k: doc[k] for k in ("id", "ts", "level", "title", "detail")})
+        out.sort(key=lambda ev: ev["id"])
+    return out[:limit] if limit else out
+
+
+# --- archive pass ---
+def _archive_run(db: Session, writer: SegmentWriter, run_id: int, cutoff: datetime) -> Tuple[int, int]:
+    # -> (events, bytes) moved for one run, one gzip member per CHUNK_EVENTS
+    events = nbytes = 0
+    while True:
+        rows = db.scalars(
+            select(RunEvent)
+            .where(RunEvent.run_id == run_id, RunEvent.ts < cutoff)
+            .order_by(RunEvent.id.asc())
+            .limit(CHUNK_EVENTS)
+        ).all()
+        if not rows:
+            return events, nbytes
+        payload = "".join(json.dumps(_to_doc(ev), separators=(",", ":")) + "\n" for ev in rows)
+        data = gzip.compress(payload.encode("utf-8"), compresslevel=6)
+        segment, offset = writer.append(data)
+        first, last = rows[0], rows[-1]
+        db.add(RunEventArchive(
+            run_id=run_id, segment=segment, offset=offset, length=len(data),
+            first_id=first.id, last_id=last.id, count=len(rows),
+            first_ts=min(ev.ts for ev in rows), last_ts=max(ev.ts for ev in rows),
+        ))
+        deleted = db.execute(
+            delete(RunEvent)
+            .where(RunEvent.run_id == run_id, RunEvent.id.between(first.id, last.id), RunEvent.ts < cutoff)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if deleted != len(rows):
+            # a row in the id range committed after our read (late insert with an old ts):
+            # drop this chunk, the orphaned segment bytes are never referenced
+            db.rollback()
+            raise RuntimeError(f"run {run_id}: expected to delete {len(rows)} events, matched {deleted}")
+        db.commit()
+        db.expunge_all()
+        events += len(rows)
+        nbytes += len(data)
+        ARCHIVED_EVENTS.inc(len(rows))
+        ARCHIVED_BYTES.inc(len(data))
+
+
+def archive_pass(session_factory: Callable[[], Session], now: Optional[datetime] = None,
+                 retention_days: float = RETENTION_DAYS, root: Optional[str] = None,
+                 dry_run: bool = False) -> Dict[str, Any]:
+    root = root or ARCHIVE_DIR
+    now = now or utcnow_naive()
+    cutoff = now - timedelta(days=retention_days)
+    summary: Dict[str, Any] = {"cutoff": cutoff.isoformat(), "runs": 0, "events": 0, "bytes": 0}
+    os.makedirs(root, exist_ok=True)
+    lock = open(os.path.join(root, ".lock"), "w")
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            summary["skipped"] = "another archive pass is running"
+            return summary
+
+        with session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql" and not dry_run:
+                summary["partitions_created"] = ensure_partitions(db, now)
+
+        writer = SegmentWriter(root)
+        skipped: set = set()
+        try:
+            while True:
+                with session_factory() as db:
+                    candidates = select(RunEvent.run_id).join(Run, Run.id == RunEvent.run_id).where(
+                        RunEvent.ts < cutoff, Run.status.in_(FINISHED))
+                    if skipped:
+                        candidates = candidates.where(RunEvent.run_id.notin_(skipped))
+                    run_ids = db.scalars(candidates.distinct().limit(BATCH_RUNS)).all()
+                    if dry_run:
+                        summary["runs"] = len(run_ids)
+                        summary["events"] = db.scalar(
+                            select(func.count()).select_from(RunEvent).where(RunEvent.run_id.in_(run_ids),
+                                                                             RunEvent.ts < cutoff)) or 0
+                        return summary
+                if not run_ids:
+                    break
+                for run_id in run_ids:
+                    try:
+                        with session_factory() as db:
+                            events, nbytes = _archive_run(db, writer, run_id, cutoff)
+                    except Exception as e:
+                        print(f"[event-archive] run {run_id} skipped: {e}")
+                        skipped.add(run_id)
+                        continue
+                    summary["runs"] += 1
+                    summary["events"] += events
+                    summary["bytes"] += nbytes
+        finally:
+            writer.close()
+
+        with session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                summary["partitions_dropped"] = drop_empty_partitions(db, cutoff)
+        return summary
+    finally:
+        lock.close()
+
+
+# --- Postgres partitions ---
+def _month(d: datetime, n: int = 0) -> datetime:
+    m = d.month - 1 + n
+    return datetime(d.year + m // 12, m % 12 + 1, 1)
+
+
+def _partitions(db: Session) -> List[str]:
+    return list(db.scalars(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'run_events'"
+    )))
+
+
+def ensure_partitions(db: Session, now: Optional[datetime] = None,
+                      months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    # monthly partitions from this month through now+months_ahead; rows that
+    # landed in the DEFAULT partition for a new range move into it (Postgres
+    # refuses to attach a range the default partition already has rows for)
+    now = now or utcnow_naive()
+    existing = set(_partitions(db))
+    created = []
+    for n in range(months_ahead + 1):
+        start, end = _month(now, n), _month(now, n + 1)
+        name = f"run_events_p{start:%Y%m}"
+        if name in existing:
+            continue
+        bounds = f"ts >= '{start:%Y-%m-%d}' AND ts < '{end:%Y-%m-%d}'"
+        db.execute(text(f"CREATE TEMP TABLE run_events_move ON COMMIT DROP AS "
+                        f"SELECT {COLUMNS} FROM run_events_default WHERE {bounds}"))
+        db.execute(text(f"DELETE FROM run_events_default WHERE {bounds}"))
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF run_events "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"))
+        # straight into the partition: no dedupe/notify triggers for rows already seen
+        db.execute(text(f"INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM run_events_move"))
+        db.commit()
+        created.append(name)
+        print(f"[event-archive] created partition {name}")
+    return created
+
+
+def drop_empty_partitions(db: Session, cutoff: datetime) -> List[str]:
+    # monthly partitions that end before the cutoff and hold nothing anymore
+    # (events of runs that never finished keep theirs alive)
+    dropped = []
+    for name in sorted(_partitions(db)):
+        m = re.fullmatch(r"run_events_p(\d{4})(\d{2})", name)
+        if not m or _month(datetime(int(m.group(1)), int(m.group(2)), 1), 1) > cutoff:
+            continue
+        if db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {name})")):
+            continue
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        dropped.append(name)
+        print(f"[event-archive] dropped empty partition {name}")
+    return dropped
+
+
+# --- runners ---
+def start_background(session_factory: Callable[[], Session], stop: threading.Event,
+                     interval: float = INTERVAL) -> Optional[threading.Thread]:
+    # periodic archive passes on a daemon thread (the agent worker starts one);
+    # several agents may run it, the file lock lets one pass through at a time
+    if interval <= 0:
+        return None
+
+    def _loop():
+        while not stop.wait(interval):
+            try:
+                summary = archive_pass(session_factory)
+                if summary.get("events"):
+                    print(f"[event-archive] {summary}")
+            except Exception as e:
+                print(f"[event-archive] pass failed: {e}")
+
+    t = threading.Thread(target=_loop, name="event-archive", daemon=True)
+    t.start()
+    return t
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Archive old run events of finished runs")
+    ap.add_argument("--retention-days", type=float, default=RETENTION_DAYS)
+    ap.add_argument("--dry-run", action="store_true", help="count the first batch of candidates, change nothing")
+    args = ap.parse_args(argv)
+    from src.database import SessionLocal
+    print(json.dumps(archive_pass(SessionLocal, retention_days=args.retention_days, dry_run=args.dry_run)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# backend/src/event_search.py
+# Full-text search over run event logs (GET /api/events/search).
+#
+# On Postgres run_events.search_vector is a stored generated tsvector of
+# title + detail with a GIN index (migration 20251025_0013), so Postgres keeps
+# it current on every insert and a query is an index lookup:
+#   websearch_to_tsquery syntax ("CUDA OOM", "out of memory" -warning, a or b),
+#   ranked by ts_rank, highlighted with ts_headline (computed for the page only).
+# Other databases (SQLite in tests) fall back to case-insensitive LIKE on each
+# term, newest first. Only live rows are searched: events already moved to the
+# archive (src/event_archive.py) are not.
+#
+# Results are ordered by (rank desc, id desc) and paged by keyset: the cursor
+# "<rank>:<id>" of the last row resumes strictly after it.
+import html
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, cast, func, literal, literal_column, not_, or_, select
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.orm import Session
+
+from src.models import RunEvent
+
+SEARCH_CONFIG = "english"   # text search configuration of the generated column
+HIGHLIGHT_MAX_WORDS = 35
+# ts_headline marks matches with these; the text is HTML-escaped afterwards and
+# they become <mark> tags, so event text can't inject markup into the highlight
+_START, _STOP = "\x02", "\x03"
+
+
+class SearchCursorError(ValueError):
+    pass
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    if not cursor:
+        return None
+    try:
+        rank, _, last_id = cursor.rpartition(":")
+        return float(rank), int(last_id)
+    except ValueError:
+        raise SearchCursorError(f"invalid cursor {cursor!r}")
+
+
+def _mark(text: str) -> str:
+    return html.escape(text).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _naive_utc(d: Optional[datetime]) -> Optional[datetime]:
+    # the column holds naive UTC
+    if d is not None and d.tzinfo is not None:
+        return d.astimezone(timezone.utc).replace(tzinfo=None)
+    return d
+
+
+def _filters(levels: Sequence[str], run_id: Optional[int],
+             since: Optional[datetime], until: Optional[datetime]) -> List[Any]:
+    # on Postgres the ts bounds also prune the monthly partitions
+    since, until = _naive_utc(since), _naive_utc(until)
+    where = []
+    if levels:
+        where.append(RunEvent.level.in_(list(levels)))
+    if run_id is not None:
+        where.append(RunEvent.run_id == run_id)
+    if since is not None:
+        where.append(RunEvent.ts >= since)
+    if until is not None:
+        where.append(RunEvent.ts < until)
+    return where
+
+
+def _after(rank_col, after: Optional[Tuple[float, int]]):
+    if after is None:
+        return None
+    rank, last_id = after
+    return or_(rank_col < rank, and_(rank_col == rank, RunEvent.id < last_id))
+
+
+def _row(r, rank: float, highlight: str) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "run_id": r.run_id,
+        "ts": r.ts.replace(tzinfo=timezone.utc).isoformat(),
+        "level": r.level,
+        "title": r.title,
+        "detail": r.detail,
+        "rank": rank,
+        "highlight": highlight,
+    }
+
+
+# --- Postgres: tsvector + GIN ---
+def _search_pg(db: Session, q: str, where: List[Any], after: Optional[Tuple[float, int]],
+               limit: int) -> List[Dict[str, Any]]:
+    config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+    query = func.websearch_to_tsquery(config, q)
+    vector = literal_column("run_events.search_vector")
+    # ts_rank is a float4; compare and hand out float8 so the cursor round-trips exactly
+    score = cast(func.ts_rank(vector, query), DOUBLE_PRECISION)
+    rank = score.label("rank")
+    inner = (
+        select(RunEvent.id, RunEvent.run_id, RunEvent.ts, RunEvent.level, RunEvent.title, RunEvent.detail, rank)
+        .where(vector.op("@@")(query), *where)
+    )
+    keyset = _after(score, after)
+    if keyset is not None:
+        inner = inner.where(keyset)
+    page = inner.order_by(rank.desc(), RunEvent.id.desc()).limit(limit).subquery()
+    document = func.concat_ws(" ", page.c.title, page.c.detail)
+    options = f"StartSel={_START}, StopSel={_STOP}, MaxWords={HIGHLIGHT_MAX_WORDS}, MinWords=5, MaxFragments=2"
+    headline = func.ts_headline(config, document, query, options).label("headline")
+    rows = db.execute(select(page, headline).order_by(page.c.rank.desc(), page.c.id.desc())).all()
+    return [_row(r, float(r.rank), _mark(r.headline)) for r in rows]
+
+
+# --- fallback: LIKE per term ---
+_TERM = re.compile(r'(-?)"([^"]+)"|(\S+)')
+
+
+def _terms(q: str) -> Tuple[List[str], List[str]]:
+    # -> (required, excluded); "or" is not supported here and is just ignored
+    required, excluded = [], []
+    for m in _TERM.finditer(q):
+        if m.group(2) is not None:
+            (excluded if m.group(1) else required).append(m.group(2).lower())
+            continue
+        word = m.group(3)
+        if word.lower() == "or":
+            continue
+        if word.startswith("-") and len(word) > 1:
+            excluded.append(word[1:].lower())
+        else:
+            required.append(word.lower())
+    return required, excluded
+
+
+def _highlight(text: str, terms: Sequence[str]) -> str:
+    if not terms:
+        return html.escape(text)
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    marked = pattern.sub(lambda m: _START + m.group(0) + _STOP, text)
+    words = marked.split()
+    if len(words) > HIGHLIGHT_MAX_WORDS:
+        first = next((i for i, w in enumerate(words) if _START in w), 0)
+        start = max(0, min(first - 5, len(words) - HIGHLIGHT_MAX_WORDS))
+        words = words[start:start + HIGHLIGHT_MAX_WORDS]
+    return _mark(" ".join(words))
+
+
+def _search_like(db: Session, q: str, where: List[Any], after: Optional[Tuple[float, int]],
+                 limit: int) -> List[Dict[str, Any]]:
+    required, excluded = _terms(q)
+    if not required:
+        return []
+    title, detail = func.lower(RunEvent.title), func.lower(func.coalesce(RunEvent.detail, ""))
+    for t in required:
+        where.append(or_(title.contains(t, autoescape=True), detail.contains(t, autoescape=True)))
+    for t in excluded:
+        where.append(not_(or_(title.contains(t, autoescape=True), detail.contains(t, autoescape=True))))
+    # no relevance score without a text index: every match ranks 1.0, newest first
+    stmt = select(RunEvent.id, RunEvent.run_id, RunEvent.ts, RunEvent.level, RunEvent.title, RunEvent.detail)
+    keyset = _after(literal(1.0), after)
+    if keyset is not None:
+        stmt = stmt.where(keyset)
+    rows = db.execute(stmt.where(*where).order_by(RunEvent.id.desc()).limit(limit)).all()
+    return [_row(r, 1.0, _highlight(" ".join(filter(None, (r.title, r.detail))), required)) for r in rows]
+
+
+def search_events(db: Session, q: str, levels: Sequence[str] = (), run_id: Optional[int] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  after: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # -> (page of results, cursor of the next page or None)
+    cursor = parse_cursor(after)
+    where = _filters(levels, run_id, since, until)
+    search = _search_pg if db.get_bind().dialect.name == "postgresql" else _search_like
+    rows = search(db, q, where, cursor, limit + 1)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, f"{rows[-1]['rank']!r}:{rows[-1]['id']}"
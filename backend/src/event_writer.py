@@ -0,0 +1,234 @@
+# backend/src/event_writer.py
+# Buffered RunEvent writer shared by the agents and the server.
+#
+# Events are queued in memory and written with one multi-row INSERT per chunk
+# and a single commit per flush. A background thread flushes when the buffer
+# reaches `batch_size` or `flush_interval` seconds pass; writers block once
+# `max_pending` events are waiting (back-pressure). Call flush() before
+# anything that must observe the events (e.g. marking a run completed).
+#
+# Failures: a batch rejected for its data (FK to a deleted run, bad value) is
+# bisected into smaller transactions until the offending rows are isolated;
+# only those are dropped. Any other error (DB down, pool timeout) puts the
+# batch back and retries with exponential backoff; it is dropped only after
+# retrying for MAX_RETRY_SECONDS.
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from src import telemetry
+from src.models import RunEvent
+
+BATCH_SIZE = int(os.getenv("EVENT_WRITER_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.getenv("EVENT_WRITER_FLUSH_MS", "200")) / 1000.0
+MAX_PENDING = int(os.getenv("EVENT_WRITER_MAX_PENDING", "10000"))
+MAX_RETRY_SECONDS = float(os.getenv("EVENT_WRITER_MAX_RETRY_SECONDS", "60"))
+BACKOFF_MAX = 5.0   # seconds between retries at most
+
+# rate(flowops_run_events_written_total) is the ingestion rate in events/s
+EVENTS_ACCEPTED = telemetry.Counter("flowops_run_events_accepted_total", "Run events buffered for writing")
+EVENTS_WRITTEN = telemetry.Counter("flowops_run_events_written_total", "Run events committed to the DB")
+EVENTS_DROPPED = telemetry.Counter("flowops_run_events_dropped_total", "Run events dropped (rejected rows, or retries exhausted)",
+                                   ("reason",))
+FLUSH_SECONDS = telemetry.Histogram("flowops_event_flush_duration_seconds", "Event writer flush (INSERTs + commit) time")
+
+TITLE_MAX = RunEvent.__table__.c.title.type.length
+DETAIL_MAX = RunEvent.__table__.c.detail.type.length
+
+
+def utcnow_naive():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def event_row(run_id: int, title: str, detail: Optional[str] = None,
+              level: str = "info", ts: Optional[datetime] = None,
+              idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    # clip to the column sizes so one oversized log line can't fail a whole batch
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "run_id": run_id,
+        "ts": ts or utcnow_naive(),
+        "level": (level or "info")[:20],
+        "title": (title or "")[:TITLE_MAX],
+        "detail": detail[:DETAIL_MAX] if detail else detail,
+        "idempotency_key": idempotency_key,
+    }
+
+
+def _insert_stmt(dialect: str):
+    # rows whose (run_id, idempotency_key) already exist are retries: skip them.
+    # On Postgres run_events is partitioned and has no unique index to conflict
+    # on; the run_events_dedupe trigger (migration 20251020_0012) drops them.
+    if dialect == "sqlite":
+        return sqlite.insert(RunEvent).on_conflict_do_nothing(index_elements=["run_id", "idempotency_key"])
+    return insert(RunEvent)
+
+
+class EventWriter:
+    def __init__(self, session_factory: Callable[[], Session],
+                 batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 max_pending: int = MAX_PENDING):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._buf: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()   # one DB flush at a time
+        self._failing_since: Optional[float] = None   # first failed flush of the current streak
+        self._retry_at = 0.0                             # background flusher waits until then
+        self._backoff = flush_interval
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    # --- producer API ---
+    def write(self, run_id: int, title: str, detail: Optional[str] = None,
+              level: str = "info", ts: Optional[datetime] = None):
+        self.write_rows([event_row(run_id, title, detail, level, ts)])
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]):
+        rows = list(rows)
+        if not rows:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("event writer is closed")
+            # back-pressure: wait for the flusher to drain instead of growing forever
+            while len(self._buf) + len(rows) > self.max_pending and self._buf:
+                self._cond.notify_all()
+                self._cond.wait(self.flush_interval)
+            self._buf.extend(rows)
+            EVENTS_ACCEPTED.inc(len(rows))
+            if len(self._buf) >= self.batch_size:
+                self._cond.notify_all()
+        self._ensure_thread()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._buf)
+
+    # --- flushing ---
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._cond:
+                batch, self._buf = self._buf, []
+            if not batch:
+                return 0
+            t0 = time.perf_counter()
+            written = 0
+            # chunks still to commit, in order; the first try is the whole batch in one commit
+            todo: List[List[Dict[str, Any]]] = [batch]
+            try:
+                while todo:
+                    chunk = todo.pop(0)
+                    try:
+                        self._insert(chunk)
+                    except (IntegrityError, DataError) as e:
+                        if len(chunk) == 1:
+                            EVENTS_DROPPED.labels("rejected").inc()
+                            print(f"event writer: dropping rejected event for run {chunk[0]['run_id']}: {e.orig}")
+                        else:
+                            half = len(chunk) // 2
+                            todo[:0] = [chunk[:half], chunk[half:]]
+                        continue
+                    written += len(chunk)
+            except Exception:
+                remaining = [row for c in [chunk] + todo for row in c]
+                self._on_failure(remaining)
+                raise
+            finally:
+                EVENTS_WRITTEN.inc(written)
+            FLUSH_SECONDS.observe(time.perf_counter() - t0)
+            self._failing_since = None
+            self._retry_at = 0.0
+            self._backoff = self.flush_interval
+            with self._cond:
+                self._cond.notify_all()   # wake producers blocked on back-pressure
+            return written
+
+    def _insert(self, rows: List[Dict[str, Any]]):
+        with self.session_factory() as db:
+            stmt = _insert_stmt(db.get_bind().dialect.name)
+            for i in range(0, len(rows), self.batch_size):
+                db.execute(stmt, rows[i:i + self.batch_size])
+            db.commit()
+
+    def _on_failure(self, rows: List[Dict[str, Any]]):
+        # transient error: requeue in front (keeps ordering) and back off, unless
+        # this streak of failures has lasted longer than MAX_RETRY_SECONDS
+        now = time.monotonic()
+        if self._failing_since is None:
+            self._failing_since = now
+        with self._cond:
+            if now - self._failing_since < MAX_RETRY_SECONDS:
+                self._buf[:0] = rows
+                self._retry_at = now + self._backoff
+                self._backoff = min(self._backoff * 2, BACKOFF_MAX)
+            else:
+                EVENTS_DROPPED.labels("retries_exhausted").inc(len(rows))
+                print(f"event writer: dropping {len(rows)} events after failing for {now - self._failing_since:.0f}s")
+                self._failing_since = None
+                self._backoff = self.flush_interval
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="event-writer", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                backoff = self._retry_at - time.monotonic()
+                if not self._closed and backoff > 0:
+                    # last flush failed: a full buffer must not turn into a hot retry loop
+                    self._cond.wait(backoff)
+                    continue
+                if not self._closed and len(self._buf) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+                if not self._buf:
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"event writer flush failed: {e}")
+
+
+_default: Optional[EventWriter] = None
+_default_lock = threading.Lock()
+
+
+def get_event_writer() -> EventWriter:
+    # process-wide writer bound to the shared SessionLocal (server side)
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                from src.database import SessionLocal
+                _default = EventWriter(SessionLocal)
+                atexit.register(_default.close)
+    return _default
@@ -0,0 +1,111 @@
+# backend/src/metrics_store.py
+# Per-step metric history (run_metrics table): columnar writes and
+# downsampled curve reads.
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.models import RunMetric, utcnow_naive
+
+INSERT_CHUNK = 1000
+
+
+def _insert_stmt(dialect: str):
+    # (run_id, key, step) is the primary key: a re-sent step is a retry, keep the first
+    if dialect == "postgresql":
+        return postgresql.insert(RunMetric).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(RunMetric).on_conflict_do_nothing()
+    return insert(RunMetric)
+
+
+def record_series(db: Session, run_id: int, steps: Sequence[int],
+                  series: Dict[str, Sequence[Optional[float]]],
+                  ts: Optional[datetime] = None) -> int:
+    # columnar input: one step array plus one value array per key (None = gap)
+    ts = ts or utcnow_naive()
+    rows = [
+        {"run_id": run_id, "key": key, "step": int(step), "value": float(v), "ts": ts}
+        for key, values in series.items()
+        for step, v in zip(steps, values)
+        if v is not None
+    ]
+    if not rows:
+        return 0
+    stmt = _insert_stmt(db.get_bind().dialect.name)
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.execute(stmt, rows[i:i + INSERT_CHUNK])
+    return len(rows)
+
+
+def record_step(db: Session, run_id: int, metrics: Dict[str, Any]) -> int:
+    # trainer-style snapshot {"step": n, "loss": ..., ...}; non-numeric values are skipped
+    step = metrics.get("step")
+    if not isinstance(step, (int, float)) or isinstance(step, bool):
+        return 0
+    series = {
+        k: [v] for k, v in metrics.items()
+        if k != "step" and isinstance(v, (int, float)) and not isinstance(v, bool)
+    }
+    return record_series(db, run_id, [int(step)], series)
+
+
+def metric_keys(db: Session, run_id: int) -> List[str]:
+    return list(db.execute(
+        select(RunMetric.key).where(RunMetric.run_id == run_id).distinct().order_by(RunMetric.key)
+    ).scalars())
+
+
+# Downsample each key to at most `max_points` buckets of equal step width, in
+# one grouped query. Every bucket reports its last step plus the min, max and
+# last value as parallel arrays (ready for numpy.asarray). With few enough
+# points the bucket width is 1 and the raw series comes back unchanged.
+def query_series(db: Session, run_id: int, keys: Optional[Sequence[str]] = None,
+                 from_step: int = 0, max_points: int = 1000) -> Dict[str, Any]:
+    keys = list(keys) if keys else metric_keys(db, run_id)
+    out: Dict[str, Any] = {"run_id": run_id, "bucket_size": 1, "series": {}}
+    if not keys:
+        return out
+
+    where = (RunMetric.run_id == run_id, RunMetric.key.in_(keys), RunMetric.step >= from_step)
+    max_step = db.execute(select(func.max(RunMetric.step)).where(*where)).scalar()
+    if max_step is None:
+        return out
+    width = max(1, math.ceil((max_step - from_step + 1) / max(1, max_points)))
+    out["bucket_size"] = width
+
+    bucket = (RunMetric.step - from_step) // width
+    ranked = (
+        select(
+            RunMetric.key, RunMetric.step, RunMetric.value,
+            bucket.label("bucket"),
+            func.row_number().over(
+                partition_by=(RunMetric.key, bucket), order_by=RunMetric.step.desc()
+            ).label("rn"),
+        )
+        .where(*where)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            ranked.c.key,
+            func.max(ranked.c.step),
+            func.min(ranked.c.value),
+            func.max(ranked.c.value),
+            func.max(case((ranked.c.rn == 1, ranked.c.value))),
+        )
+        .group_by(ranked.c.key, ranked.c.bucket)
+        .order_by(ranked.c.key, ranked.c.bucket)
+    ).all()
+
+    for key, step, vmin, vmax, last in rows:
+        s = out["series"].setdefault(key, {"step": [], "last": [], "min": [], "max": []})
+        s["step"].append(step)
+        s["last"].append(last)
+        s["min"].append(vmin)
+        s["max"].append(vmax)
+    return out
@@ -1,7 +1,8 @@
 from datetime import datetime, timezone
 from typing import Optional, Any, Dict
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import String, Integer, BigInteger, Float, DateTime, ForeignKey, JSON, Enum, UniqueConstraint, Index, Text, text
+from sqlalchemy.types import UserDefinedType
 import enum
 
 from .database import Base
@@ -10,6 +11,27 @@ def utcnow_naive():
     # timezone-aware "now" in UTC, then drop tzinfo to fit current DB schema
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
+class Vector(UserDefinedType):
+    # pgvector column without the pgvector package: values travel as '[x,y,...]'
+    # text literals (which SQLite simply stores as text)
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def get_col_spec(self, **kw):
+        return f"vector({self.dim})"
+
+    def bind_processor(self, dialect):
+        def process(value):
+            return None if value is None else "[" + ",".join(repr(float(v)) for v in value) + "]"
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            return None if value is None else [float(v) for v in value.strip("[]").split(",") if v]
+        return process
+
 class RunStatus(str, enum.Enum):
     queued = "queued"
     running = "running"
@@ -27,30 +49,143 @@ class Workflow(Base):
 
 class Run(Base):
     __tablename__ = "runs"
+    # filtered keyset listing on /api/runs
+    __table_args__ = (
+        Index("ix_runs_status_id", "status", "id"),
+        Index("ix_runs_workflow_id_id", "workflow_id", "id"),
+        Index("ix_runs_created_at", "created_at"),
+        # agent claim queue: tiny indexes over only the rows the worker polls for
+        Index("ix_runs_queued", "id",
+              postgresql_where=text("status = 'queued'"), sqlite_where=text("status = 'queued'")),
+        Index("ix_runs_running_lease", "lease_expires_at",
+              postgresql_where=text("status = 'running'"), sqlite_where=text("status = 'running'")),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     workflow_id: Mapped[Optional[int]] = mapped_column(ForeignKey("workflows.id"), nullable=True)
     status: Mapped[RunStatus] = mapped_column(Enum(RunStatus), default=RunStatus.queued, nullable=False)
     metrics: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, onupdate=utcnow_naive, nullable=False)
+    # agent lease: which worker holds the run and until when (renewed by heartbeat)
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     workflow: Mapped[Optional[Workflow]] = relationship("Workflow", back_populates="runs")
     events: Mapped[list["RunEvent"]] = relationship("RunEvent", back_populates="run", order_by="RunEvent.id")
 
 class RunEvent(Base):
+    # On Postgres this is a parent table range-partitioned by ts (monthly,
+    # migration 20251020_0012, maintained by src/event_archive.py); its primary
+    # key is (id, ts) and the idempotency check is a trigger, because unique
+    # indexes on a partitioned table must include the partition key. It also
+    # has a generated search_vector tsvector column (migration 20251025_0013,
+    # Postgres only, used by src/event_search.py) that is not mapped here.
     __tablename__ = "run_events"
+    __table_args__ = (
+        # retried callbacks carry the same key; NULL keys never conflict
+        UniqueConstraint("run_id", "idempotency_key", name="uq_run_events_idempotency"),
+        # WebSocket replay / hub fan-out: WHERE run_id = ? AND id > ? ORDER BY id
+        Index("ix_run_events_run_id_id", "run_id", "id"),
+        # ids must never be reused once archived rows are deleted (SQLite would
+        # otherwise hand out max(rowid) + 1 again)
+        {"sqlite_autoincrement": True},
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     run_id: Mapped[int] = mapped_column(ForeignKey("runs.id"), nullable=False)
     ts: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
     level: Mapped[str] = mapped_column(String(20), default="info", nullable=False)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     detail: Mapped[Optional[str]] = mapped_column(String(4000), nullable=True)
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
 
     run: Mapped["Run"] = relationship("Run", back_populates="events")
 
+class RunEventArchive(Base):
+    # offset index of events moved out of run_events into compressed segment
+    # files (src/event_archive.py): one row per (run, archive pass), pointing at
+    # a gzip member of ndjson events inside an append-only segment
+    __tablename__ = "run_event_archive"
+    __table_args__ = (
+        Index("ix_run_event_archive_run", "run_id", "first_id"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("runs.id"), nullable=False)
+    segment: Mapped[str] = mapped_column(String(255), nullable=False)   # relative to EVENT_ARCHIVE_DIR
+    offset: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_ts: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_ts: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
+
+class RunMetric(Base):
+    # append-only per-step metric history; Run.metrics keeps only the latest snapshot
+    __tablename__ = "run_metrics"
+    run_id: Mapped[int] = mapped_column(ForeignKey("runs.id"), primary_key=True)
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    step: Mapped[int] = mapped_column(Integer, primary_key=True)
+    value: Mapped[float] = mapped_column(Float, nullable=False)
+    ts: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
+
 class Model(Base):
     __tablename__ = "models"
+    __table_args__ = (
+        UniqueConstraint("run_id", name="uq_models_run_id"),
+        Index("ix_models_created_at", "created_at"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
     path: Mapped[str] = mapped_column(String(500), nullable=False)
+    # set when registered by a run's completion callback (at most one model per run)
+    run_id: Mapped[Optional[int]] = mapped_column(ForeignKey("runs.id"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
+    # filled when the artifact was uploaded through the parts API (path stays "" until then)
+    size_bytes: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # set while parts:complete assembles the artifact outside any transaction
+    assembling_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+class ModelPart(Base):
+    # one uploaded chunk of a model artifact, assembled in part_number order
+    __tablename__ = "model_parts"
+    model_id: Mapped[int] = mapped_column(ForeignKey("models.id", ondelete="CASCADE"), primary_key=True)
+    part_number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
+
+class StepCacheEntry(Base):
+    # index of content-addressed pipeline step results stored under STEP_CACHE_DIR
+    __tablename__ = "step_cache"
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    step_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    path: Mapped[str] = mapped_column(String(500), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    artifact_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False, index=True)
+
+PLAN_EMBED_DIM = 512   # width of plan_cache.embedding (and its HNSW index)
+
+class PlanCacheEntry(Base):
+    # semantic cache of prompt -> pipeline plans (src/agents/planner.py)
+    __tablename__ = "plan_cache"
+    __table_args__ = (
+        Index("ix_plan_cache_lookup", "embedder", "entities", "prompt_hash"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    embedder: Mapped[str] = mapped_column(String(100), nullable=False)
+    # digest of the literals in the prompt (numbers, URLs, quoted names): only plans
+    # for prompts with the same literals are reused
+    entities: Mapped[str] = mapped_column(String(64), nullable=False)
+    prompt_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    prompt: Mapped[str] = mapped_column(Text, nullable=False)
+    spec: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+    planner: Mapped[str] = mapped_column(String(100), nullable=False)
+    embedding: Mapped[list] = mapped_column(Vector(PLAN_EMBED_DIM), nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow_naive, nullable=False)
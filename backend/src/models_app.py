@@ -1,10 +1,16 @@
 # backend/src/models_app.py
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String, DateTime, JSON, Index
 from src.database import Base
 
 class App(Base):
     __tablename__ = "apps"
+    # support filtered keyset listing (WHERE ... AND id < :after ORDER BY id DESC)
+    __table_args__ = (
+        Index("ix_apps_status_id", "status", "id"),
+        Index("ix_apps_template_id", "template", "id"),
+        Index("ix_apps_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
@@ -22,3 +28,22 @@ class App(Base):
     updated_at = Column(
         DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+
+
+class AppBlob(Base):
+    # content-addressed file body shared by every app that contains it
+    __tablename__ = "app_blobs"
+
+    digest = Column(String(64), primary_key=True)   # sha256 hex
+    size_bytes = Column(BigInteger, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AppFile(Base):
+    # one generated file of an app: relative path -> blob
+    __tablename__ = "app_files"
+
+    app_id = Column(Integer, primary_key=True)
+    path = Column(String(300), primary_key=True)
+    digest = Column(String(64), ForeignKey("app_blobs.digest"), nullable=False, index=True)
@@ -0,0 +1,274 @@
+# backend/src/server/appgen.py
+# App generation: page rendering plus a bounded background job queue.
+# Generated files go to the content-addressed store (src/artifact_store.py);
+# a dataset_url is ingested into the dataset cache (src/datasets.py), and
+# analyze-mode apps ship its column profile (src/dataset_profile.py).
+#
+# POST /api/appgen/generate only inserts an `apps` row (status "building") and
+# hands the build to a small thread pool; the row flips to "ready" or "error"
+# when the job ends. Progress is published per app id so /ws/apps/{id} can
+# stream it. At most APPGEN_CONCURRENCY builds run at once and at most
+# APPGEN_MAX_PENDING are accepted (queued + running); beyond that the API
+# answers 429 instead of piling up work.
+import asyncio
+import html
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src import dataset_profile, datasets
+from src.artifact_store import release_app, store_app_files
+from src.database import SessionLocal
+from src.models_app import App as AppModel
+
+MODELS_ROOT = os.getenv("MODELS_ROOT", "/models")   # mounted volume
+APPS_DIR = os.path.join(MODELS_ROOT, "apps")        # /models/apps (apps built before the blob store)
+
+CONCURRENCY = int(os.getenv("APPGEN_CONCURRENCY", "2"))
+MAX_PENDING = int(os.getenv("APPGEN_MAX_PENDING", "50"))
+HISTORY_JOBS = 1000   # progress history kept for this many recent jobs
+
+TERMINAL = ("ready", "error")
+
+
+# shared by every generated app, so stored once in the blob store
+APP_CSS = """body { font-family: system-ui, -apple-system, Segoe UI, Roboto, sans-serif; margin: 24px; background:#0b1220; color:#fff; }
+.card { background: rgba(255,255,255,.04); border:1px solid rgba(255,255,255,.1); border-radius:16px; padding:16px; }
+.muted { color: rgba(255,255,255,.7); }
+code, pre { background: rgba(255,255,255,.06); padding: 6px 8px; border-radius: 8px; }
+table { border-collapse: collapse; font-size: 14px; }
+th, td { border-bottom: 1px solid rgba(255,255,255,.1); padding: 4px 8px; text-align: left; }
+.bar { display:inline-block; width:5px; margin-right:1px; background:#3b82f6; vertical-align:bottom; }
+a.button { display:inline-block; padding:8px 12px; border-radius:8px; background:#3b82f6; color:#fff; text-decoration:none; }
+"""
+
+APP_JS = """// If you provided a dataset, fetch & render a tiny preview (best-effort).
+const datasetId = document.body.dataset.datasetId;
+const datasetUrl = document.body.dataset.datasetUrl;
+const profileUrl = document.body.dataset.profileUrl;
+const fmt = v => v === null || v === undefined ? '' : (typeof v === 'number' ? +v.toPrecision(4) : String(v));
+if (profileUrl) {
+  // analyze mode: column profile precomputed at build time and stored with the app
+  fetch(profileUrl).then(r => r.json()).then(profile => {
+    const table = document.createElement('table');
+    const head = table.insertRow();
+    ['column', 'kind', 'nulls', 'summary', 'distribution'].forEach(h => {
+      const th = document.createElement('th'); th.textContent = h; head.appendChild(th);
+    });
+    profile.columns.forEach(c => {
+      const tr = table.insertRow();
+      tr.insertCell().textContent = c.name;
+      tr.insertCell().textContent = c.kind;
+      tr.insertCell().textContent = `${(100 * (c.null_fraction || 0)).toFixed(1)}%`;
+      const q = c.quantiles || {};
+      tr.insertCell().textContent = c.top_k && c.kind !== 'int'
+        ? c.top_k.slice(0, 3).map(t => `${fmt(t.value)} (${t.count})`).join(', ')
+        : `mean ${fmt(c.mean)} · sd ${fmt(c.std)} · p50 ${fmt(q.p50)} · [${fmt(c.min)}, ${fmt(c.max)}]`;
+      const bars = tr.insertCell();
+      const counts = c.histogram ? c.histogram.counts : (c.top_k || []).map(t => t.count);
+      const peak = Math.max(1, ...counts);
+      counts.forEach(n => {
+        const bar = document.createElement('span');
+        bar.className = 'bar';
+        bar.style.height = `${Math.round(24 * n / peak)}px`;
+        bars.appendChild(bar);
+      });
+    });
+    const p = document.createElement('p');
+    p.className = 'muted';
+    p.textContent = `${profile.rows} rows profiled`;
+    document.body.append(document.createElement('br'), table, p);
+  });
+} else if (datasetId) {
+  // ingested by the backend: first rows from the columnar cache
+  fetch(`/api/datasets/${datasetId}/rows?limit=20`).then(r => r.json()).then(page => {
+    const table = document.createElement('table');
+    const cols = page.rows.length ? Object.keys(page.rows[0]) : [];
+    const head = table.insertRow();
+    cols.forEach(c => { const th = document.createElement('th'); th.textContent = c; head.appendChild(th); });
+    page.rows.forEach(row => {
+      const tr = table.insertRow();
+      cols.forEach(c => { tr.insertCell().textContent = row[c] === null ? '' : String(row[c]); });
+    });
+    const p = document.createElement('p');
+    p.className = 'muted';
+    p.textContent = `${page.total} rows`;
+    document.body.append(document.createElement('br'), table, p);
+  });
+} else if (datasetUrl) {
+  fetch(datasetUrl).then(r => r.text()).then(txt => {
+    const pre = document.createElement('pre');
+    pre.textContent = txt.slice(0, 2000);
+    document.body.appendChild(document.createElement('br'));
+    document.body.appendChild(pre);
+  }).catch(()=>{
+    const p = document.createElement('p');
+    p.textContent = 'Could not fetch dataset (CORS or network).';
+    document.body.appendChild(p);
+  });
+}
+"""
+
+
+def render_app(app_id: int, title: str, mode: str, dataset_url: Optional[str],
+               dataset_id: Optional[str] = None, profile: Optional[Dict[str, Any]] = None) -> Dict[str, bytes]:
+    # extremely small, dependency-free page; only index.html (and an analyze
+    # app's profile.json) differs between apps
+    base = f"/api/apps/{app_id}/files"
+    dataset_attr = f' data-dataset-url="{html.escape(dataset_url)}"' if dataset_url else ""
+    if dataset_id:
+        dataset_attr += f' data-dataset-id="{html.escape(dataset_id)}"'
+    if profile is not None:
+        dataset_attr += f' data-profile-url="{base}/profile.json"'
+    dataset_p = f"<p class='muted'>Dataset URL: <code>{html.escape(dataset_url)}</code></p>" if dataset_url else ""
+    index = f"""<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8" />
+  <title>{html.escape(title)}</title>
+  <meta name="viewport" content="width=device-width, initial-scale=1" />
+  <link rel="stylesheet" href="{base}/assets/app.css" />
+</head>
+<body{dataset_attr}>
+  <h1>{html.escape(title)}</h1>
+  <div class="card">
+    <p class="muted">Mode: <b>{html.escape(mode)}</b></p>
+    {dataset_p}
+    <p>This is a lightweight starter app generated by FlowOpsAI.</p>
+    <p class="muted">Next steps: wire data loading & add widgets.</p>
+  </div>
+  <script src="{base}/assets/app.js"></script>
+</body>
+</html>
+"""
+    files = {
+        "index.html": index.encode("utf-8"),
+        "assets/app.css": APP_CSS.encode("utf-8"),
+        "assets/app.js": APP_JS.encode("utf-8"),
+    }
+    if profile is not None:
+        files["profile.json"] = json.dumps(profile, separators=(",", ":")).encode("utf-8")
+    return files
+
+
+def build_app(app_id: int, title: str, mode: str, dataset_url: Optional[str],
+              progress=lambda stage, pct: None) -> Dict[str, Any]:
+    dataset, profile = None, None
+    if dataset_url:
+        # ingest once on the backend; the page reads rows from the columnar cache.
+        # Not fatal: the page falls back to fetching the URL itself
+        progress("ingesting dataset", 5)
+        try:
+            schema = datasets.ingest(dataset_url)
+            dataset = {"digest": schema["digest"], "rows": schema["rows"],
+                       "columns": [{"name": c["name"], "kind": c["kind"]} for c in schema["columns"]]}
+            if mode == "analyze":
+                # one scan (cached per dataset); shipped as the app's profile.json
+                progress("profiling dataset", 20)
+                profile = dataset_profile.get_profile(schema)
+                dataset["profile_seconds"] = profile["seconds"]
+        except Exception as e:
+            dataset = {**(dataset or {}), "error": str(e)[:500]}
+    progress("rendering", 40)
+    files = render_app(app_id, title, mode, dataset_url, (dataset or {}).get("digest"), profile)
+    progress("storing", 60)
+    with SessionLocal() as db:
+        artifact = store_app_files(db, app_id, files)
+    if dataset:
+        artifact["dataset"] = dataset
+    return artifact
+
+
+class AppGenJobs:
+    def __init__(self, concurrency: int = CONCURRENCY, max_pending: int = MAX_PENDING):
+        self.concurrency = concurrency
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="appgen")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._history: "OrderedDict[int, List[Dict[str, Any]]]" = OrderedDict()
+        self._listeners: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self.pending = 0
+
+    # --- admission ---
+    def reserve(self) -> bool:
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.pending += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def start(self, app_id: int, params: Dict[str, Any]):
+        # caller must hold a reserve()d slot; it is released when the job ends
+        self.publish(app_id, {"app_id": app_id, "status": "building", "stage": "queued", "progress": 0})
+        self._pool.submit(self._run, app_id, params)
+
+    # --- progress pub/sub (job threads -> WebSocket handlers) ---
+    def publish(self, app_id: int, event: Dict[str, Any]):
+        with self._lock:
+            self._history.setdefault(app_id, []).append(event)
+            self._history.move_to_end(app_id)
+            while len(self._history) > HISTORY_JOBS:
+                self._history.popitem(last=False)
+            listeners = list(self._listeners.get(app_id, ()))
+        for loop, q in listeners:
+            loop.call_soon_threadsafe(q.put_nowait, event)
+
+    def subscribe(self, app_id: int) -> Tuple[asyncio.Queue, List[Dict[str, Any]]]:
+        q: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._listeners.setdefault(app_id, set()).add((asyncio.get_running_loop(), q))
+            history = list(self._history.get(app_id, ()))
+        return q, history
+
+    def unsubscribe(self, app_id: int, q: asyncio.Queue):
+        with self._lock:
+            subs = self._listeners.get(app_id, set())
+            subs.difference_update({entry for entry in subs if entry[1] is q})
+            if not subs:
+                self._listeners.pop(app_id, None)
+
+    # --- job body ---
+    def _run(self, app_id: int, params: Dict[str, Any]):
+        def progress(stage: str, pct: int):
+            self.publish(app_id, {"app_id": app_id, "status": "building", "stage": stage, "progress": pct})
+
+        try:
+            artifact = build_app(app_id, params["title"], params["mode"], params.get("dataset_url"), progress)
+            status, detail = "ready", None
+        except Exception as e:
+            artifact, status, detail = None, "error", f"generation failed: {e}"
+        try:
+            with SessionLocal() as db:
+                app_row = db.get(AppModel, app_id)
+                if app_row is not None:
+                    app_row.status = status
+                    meta = dict(app_row.meta or {})
+                    if artifact:
+                        meta["artifact"] = artifact
+                    if detail:
+                        meta["error"] = detail
+                    app_row.meta = meta
+                    app_row.updated_at = datetime.utcnow()
+                    db.commit()
+                elif artifact:
+                    # deleted while building: its files were stored after delete_app
+                    # released the references, so nobody else will
+                    release_app(db, app_id)
+        except Exception as e:
+            status, detail = "error", f"could not record result: {e}"
+        finally:
+            self.release()
+        self.publish(app_id, {"app_id": app_id, "status": status, "stage": "done",
+                              "progress": 100, **({"detail": detail} if detail else {})})
+
+
+jobs = AppGenJobs()
@@ -4,17 +4,21 @@ import os
 import shutil
 from typing import List, Optional, Any, Dict
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database import SessionLocal, Base, engine
-from src.models_app import App as AppModel
+from src.database import SessionLocal, Base, engine, get_async_db
+from src.artifact_store import release_app
+from src.models_app import App as AppModel, AppBlob, AppFile
+from src.server.pagination import DEFAULT_LIMIT, MAX_LIMIT, keyset, page
 
 router = APIRouter()
 
 # --- ensure table exists on import (safe if already created) ---------------
-Base.metadata.create_all(bind=engine, tables=[AppModel.__table__])
+Base.metadata.create_all(bind=engine, tables=[AppModel.__table__, AppBlob.__table__, AppFile.__table__])
 
 # --- DB session dependency --------------------------------------------------
 def get_db():
@@ -65,13 +69,35 @@ def create_app(body: AppCreate, db: Session = Depends(get_db)):
     return app
 
 @router.get("/apps", response_model=List[AppOut])
-def list_apps(db: Session = Depends(get_db)):
-    rows = db.query(AppModel).order_by(AppModel.id.desc()).all()
-    return rows
+async def list_apps(
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: Optional[int] = Query(None, description="Cursor: return apps with id below this"),
+    status: Optional[str] = None,
+    template: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # only the AppOut columns (skips the meta JSON)
+    stmt = select(
+        AppModel.id, AppModel.name, AppModel.template, AppModel.status,
+        AppModel.preview_url, AppModel.zip_url, AppModel.created_at,
+    )
+    if status is not None:
+        stmt = stmt.where(AppModel.status == status)
+    if template is not None:
+        stmt = stmt.where(AppModel.template == template)
+    if created_from is not None:
+        stmt = stmt.where(AppModel.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(AppModel.created_at < created_to)
+    rows = page((await db.execute(keyset(stmt, AppModel.id, after, limit))).all(), limit, response)
+    return [dict(r._mapping) for r in rows]
 
 @router.get("/apps/{app_id}/meta", response_model=AppOut)
-def get_app_meta(app_id: int, db: Session = Depends(get_db)):
-    app = db.get(AppModel, app_id)
+async def get_app_meta(app_id: int, db: AsyncSession = Depends(get_async_db)):
+    app = await db.get(AppModel, app_id)
     if not app:
         raise HTTPException(status_code=404, detail="App not found")
     return app
@@ -79,14 +105,14 @@ def get_app_meta(app_id: int, db: Session = Depends(get_db)):
 @router.delete("/apps/{app_id}")
 def delete_app(
     app_id: int,
-    purge_files: bool = Query(True, description="Also delete preview/zip on disk (if paths resolvable)"),
+    purge_files: bool = Query(True, description="Also delete preview/zip of pre-blob-store apps on disk (if paths resolvable)"),
     db: Session = Depends(get_db),
 ):
     app = db.get(AppModel, app_id)
     if not app:
         raise HTTPException(status_code=404, detail="App not found")
 
-    # Best-effort file cleanup (safe no-op if not found)
+    # Best-effort cleanup of apps stored before the blob store (safe no-op if not found)
     if purge_files:
         for path in (app.zip_url, app.preview_url):
             # Only try to remove if the backend stored actual filesystem paths.
@@ -107,6 +133,11 @@ def delete_app(
                 # swallow cleanup errors; DB will still be consistent
                 pass
 
+    # generated files are shared blobs: drop this app's references (always -
+    # app_files has no FK to apps, nothing else would), the store deletes a
+    # blob only when no other app uses it. release_app commits the row delete
+    # together with the released references.
     db.delete(app)
+    freed = release_app(db, app_id)
     db.commit()
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True, "freed_bytes": freed}
\ No newline at end of file
@@ -0,0 +1,196 @@
+# backend/src/server/callbacks.py
+# Trainer -> backend callback API (events, metrics, completion or failure).
+#
+# These are hot, chatty endpoints, so handlers are async (AsyncSession): events
+# go through the buffered EventWriter, metrics are merged with a single UPDATE,
+# and only `complete` runs a full transaction.
+# Clients may send an `Idempotency-Key` header so retries are not duplicated.
+import asyncio
+import json
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.database import get_async_db
+from src.event_writer import event_row, get_event_writer, utcnow_naive
+from src.metrics_store import record_series, record_step
+from src.models import Model, Run, RunEvent, RunStatus
+
+router = APIRouter()
+
+# --- Run existence cache -----------------------------------------------------
+# run ids only ever appear, so a positive lookup can be cached for good
+_KNOWN_RUNS_MAX = 10_000
+_known_runs: "OrderedDict[int, None]" = OrderedDict()
+
+async def _require_run(db: AsyncSession, run_id: int):
+    if run_id in _known_runs:
+        _known_runs.move_to_end(run_id)
+        return
+    if await db.scalar(select(Run.id).where(Run.id == run_id)) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    _known_runs[run_id] = None
+    if len(_known_runs) > _KNOWN_RUNS_MAX:
+        _known_runs.popitem(last=False)
+
+# --- Metrics merge -----------------------------------------------------------
+def merge_run_metrics(db: Session, run_id: int, patch: Dict[str, Any]) -> bool:
+    # merge in the database in one statement, so concurrent PUTs can't lose keys
+    params = {"id": run_id, "patch": json.dumps(patch, default=str), "now": utcnow_naive()}
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        sql = ("UPDATE runs SET metrics = (COALESCE(metrics::jsonb, '{}'::jsonb) || CAST(:patch AS jsonb))::json, "
+               "updated_at = :now WHERE id = :id")
+    elif dialect == "sqlite":
+        sql = "UPDATE runs SET metrics = json_patch(COALESCE(metrics, '{}'), :patch), updated_at = :now WHERE id = :id"
+    else:
+        run = db.execute(select(Run).where(Run.id == run_id).with_for_update()).scalar_one_or_none()
+        if run is None:
+            return False
+        run.metrics = {**(run.metrics or {}), **patch}
+        return True
+    return db.execute(text(sql), params).rowcount > 0
+
+# --- Schemas -----------------------------------------------------------------
+class EventIn(BaseModel):
+    level: str = "info"
+    title: str
+    detail: Optional[str] = None
+    ts: Optional[datetime] = None
+
+class EventBatchBody(BaseModel):
+    events: List[EventIn]
+
+class MetricsBody(BaseModel):
+    metrics: Dict[str, Any]
+
+class MetricsSeriesBody(BaseModel):
+    # columnar: steps[i] pairs with series[key][i]; null marks a missing value
+    steps: List[int]
+    series: Dict[str, List[Optional[float]]]
+
+class CompleteBody(BaseModel):
+    model_name: str
+    # omitted by remote trainers, which upload through /models/{id}/parts afterwards
+    model_path: Optional[str] = None
+    metrics: Optional[Dict[str, Any]] = None
+
+class FailBody(BaseModel):
+    status: Literal["failed", "cancelled"] = "failed"
+    error: Optional[str] = None
+
+# --- Endpoints ---------------------------------------------------------------
+@router.post("/runs/{run_id}/events", status_code=202)
+async def post_run_event(run_id: int, body: EventIn,
+                         idempotency_key: Optional[str] = Header(None),
+                         db: AsyncSession = Depends(get_async_db)):
+    await _require_run(db, run_id)
+    # buffered: the row lands with the writer's next multi-row INSERT
+    get_event_writer().write_rows([
+        event_row(run_id, body.title, body.detail, body.level, body.ts, idempotency_key)
+    ])
+    return {"accepted": 1}
+
+@router.post("/runs/{run_id}/events:batch", status_code=202)
+async def post_run_events_batch(run_id: int, body: EventBatchBody,
+                                idempotency_key: Optional[str] = Header(None),
+                                db: AsyncSession = Depends(get_async_db)):
+    await _require_run(db, run_id)
+    rows = [
+        event_row(run_id, e.title, e.detail, e.level, e.ts,
+                  f"{idempotency_key}:{i}" if idempotency_key else None)
+        for i, e in enumerate(body.events)
+    ]
+    writer = get_event_writer()
+    if writer.pending() + len(rows) > writer.max_pending:
+        # let back-pressure block a pool thread, not the event loop
+        await asyncio.to_thread(writer.write_rows, rows)
+    else:
+        writer.write_rows(rows)
+    return {"accepted": len(rows)}
+
+def _put_metrics(db: Session, run_id: int, patch: Dict[str, Any]) -> bool:
+    ok = merge_run_metrics(db, run_id, patch)
+    if ok:
+        # keep the per-step history too (snapshots carrying a "step")
+        record_step(db, run_id, patch)
+    return ok
+
+@router.put("/runs/{run_id}/metrics")
+async def put_run_metrics(run_id: int, body: MetricsBody, db: AsyncSession = Depends(get_async_db)):
+    # merging is naturally idempotent, so retries need no key
+    ok = await db.run_sync(_put_metrics, run_id, body.metrics)
+    await db.commit()
+    if not ok:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"ok": True}
+
+@router.post("/runs/{run_id}/metrics:batch", status_code=202)
+async def post_run_metrics_batch(run_id: int, body: MetricsSeriesBody, db: AsyncSession = Depends(get_async_db)):
+    if any(len(v) != len(body.steps) for v in body.series.values()):
+        raise HTTPException(status_code=422, detail="every series must match the length of steps")
+    await _require_run(db, run_id)
+    n = await db.run_sync(record_series, run_id, body.steps, body.series)
+    await db.commit()
+    return {"accepted": n}
+
+async def _registered_model(db: AsyncSession, run_id: int) -> Optional[int]:
+    return await db.scalar(select(Model.id).where(Model.run_id == run_id))
+
+@router.post("/runs/{run_id}/complete")
+async def complete_run(run_id: int, body: CompleteBody, db: AsyncSession = Depends(get_async_db)):
+    # make every event the trainer sent before completing visible first
+    await asyncio.to_thread(get_event_writer().flush)
+
+    run = (await db.execute(select(Run).where(Run.id == run_id).with_for_update())).scalar_one_or_none()
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    existing = await _registered_model(db, run_id)
+    if existing is not None:
+        # retried completion: report the model registered the first time
+        return {"run_id": run_id, "model_id": existing}
+
+    model = Model(name=body.model_name, path=body.model_path or "", run_id=run_id, created_at=utcnow_naive())
+    db.add(model)
+    if body.metrics:
+        await db.run_sync(merge_run_metrics, run_id, body.metrics)
+    run.status = RunStatus.completed
+    run.lease_expires_at = None
+    db.add(RunEvent(run_id=run_id, ts=utcnow_naive(), level="info",
+                    title="Model registered",
+                    detail=f"{body.model_name} -> {body.model_path or 'artifact upload pending'}"))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # a concurrent retry registered it first
+        await db.rollback()
+        return {"run_id": run_id, "model_id": await _registered_model(db, run_id)}
+    return {"run_id": run_id, "model_id": model.id}
+
+@router.post("/runs/{run_id}/fail")
+async def fail_run(run_id: int, body: FailBody, db: AsyncSession = Depends(get_async_db)):
+    # the trainer's job failed or was cancelled; a run that already finished
+    # keeps its status, so retries and late reports are no-ops
+    await asyncio.to_thread(get_event_writer().flush)
+
+    run = (await db.execute(select(Run).where(Run.id == run_id).with_for_update())).scalar_one_or_none()
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status in (RunStatus.completed, RunStatus.failed):
+        return {"run_id": run_id, "status": run.status.value}
+
+    run.status = RunStatus.failed
+    run.lease_expires_at = None
+    cancelled = body.status == "cancelled"
+    db.add(RunEvent(run_id=run_id, ts=utcnow_naive(), level="warning" if cancelled else "error",
+                    title="Run cancelled" if cancelled else "Run failed",
+                    detail=(body.error or ("Cancelled on the trainer" if cancelled else ""))[:4000]))
+    await db.commit()
+    return {"run_id": run_id, "status": run.status.value}
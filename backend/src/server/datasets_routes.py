@@ -0,0 +1,62 @@
+# backend/src/server/datasets_routes.py
+# Dataset API over the columnar cache in src/datasets.py.
+#
+#   POST /api/datasets                    {"source": url or local path} -> schema
+#   GET  /api/datasets                    cached datasets
+#   GET  /api/datasets/{digest}           schema
+#   GET  /api/datasets/{digest}/rows      a page of decoded rows (offset, limit)
+#   GET  /api/datasets/{digest}/profile   column profile (src/dataset_profile.py)
+#
+# Ingestion and a first profile scan the data, so they run in a worker thread.
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from src import dataset_profile, datasets
+
+router = APIRouter()
+
+MAX_PAGE = 1000
+
+
+class IngestBody(BaseModel):
+    source: str
+
+
+@router.post("/datasets", status_code=201)
+async def ingest_dataset(body: IngestBody):
+    try:
+        return await asyncio.to_thread(datasets.ingest, body.source)
+    except datasets.DatasetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/datasets")
+async def list_datasets():
+    return await asyncio.to_thread(datasets.list_datasets)
+
+
+def _schema_or_404(digest: str):
+    schema = datasets.get_schema(digest) if len(digest) == 64 and digest.isalnum() else None
+    if schema is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return schema
+
+
+@router.get("/datasets/{digest}")
+async def get_dataset(digest: str):
+    return _schema_or_404(digest)
+
+
+@router.get("/datasets/{digest}/rows")
+async def dataset_rows(digest: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE)):
+    schema = _schema_or_404(digest)
+    rows = await asyncio.to_thread(datasets.read_rows, schema, offset, limit)
+    return {"digest": digest, "offset": offset, "rows": rows, "total": schema["rows"]}
+
+
+@router.get("/datasets/{digest}/profile")
+async def dataset_profile_get(digest: str):
+    schema = _schema_or_404(digest)
+    return await asyncio.to_thread(dataset_profile.get_profile, schema)
@@ -0,0 +1,224 @@
+# backend/src/server/events.py
+# In-process fan-out hub for run events.
+#
+# Each run_events row is read from the DB once by the hub and pushed to every
+# WebSocket subscribed to that run. On Postgres the hub is woken by
+# LISTEN/NOTIFY (trigger installed by migration 20250901_0002); on other
+# databases (SQLite in tests) a single shared poller covers all subscribed runs.
+# Replays (fetch_events) also cover events already moved to the archive.
+import asyncio
+import os
+from datetime import timezone
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select
+
+from src import event_archive
+from src.database import AsyncSessionLocal, engine
+from src.models import RunEvent, RunEventArchive
+
+NOTIFY_CHANNEL = "run_events"
+POLL_INTERVAL = float(os.getenv("RUN_EVENTS_POLL_INTERVAL", "1.0"))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("RUN_EVENTS_QUEUE_SIZE", "1000"))
+
+
+def serialize_event(ev: RunEvent) -> Dict[str, Any]:
+    # DB stores naive UTC; make it explicit for clients
+    return {
+        "id": ev.id,
+        "ts": ev.ts.replace(tzinfo=timezone.utc).isoformat(),
+        "level": ev.level,
+        "title": ev.title,
+        "detail": ev.detail,
+    }
+
+
+async def fetch_events(run_id: int, after_id: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    # live rows stitched with archived ones (src/event_archive.py), in id order.
+    # Live rows are read first: a chunk archived in between then shows up in
+    # both reads (deduped by id) instead of in neither.
+    stmt = (
+        select(RunEvent)
+        .where(RunEvent.run_id == run_id, RunEvent.id > after_id)
+        .order_by(RunEvent.id.asc())
+    )
+    if limit:
+        stmt = stmt.limit(limit)
+    async with AsyncSessionLocal() as db:
+        live = [serialize_event(ev) for ev in (await db.execute(stmt)).scalars()]
+        chunks = (await db.execute(
+            select(RunEventArchive)
+            .where(RunEventArchive.run_id == run_id, RunEventArchive.last_id > after_id)
+        )).scalars().all()
+    if not chunks:
+        return live
+    archived = await asyncio.to_thread(event_archive.read_archived, chunks, after_id, limit)
+    merged = {ev["id"]: ev for ev in archived}
+    merged.update((ev["id"], ev) for ev in live)
+    out = [merged[i] for i in sorted(merged)]
+    return out[:limit] if limit else out
+
+
+async def _fetch_many(cursors: Dict[int, int]) -> Dict[int, List[Dict[str, Any]]]:
+    # one query for every watched run: id > min(cursor), then trim per run
+    if not cursors:
+        return {}
+    stmt = (
+        select(RunEvent)
+        .where(RunEvent.run_id.in_(list(cursors)), RunEvent.id > min(cursors.values()))
+        .order_by(RunEvent.id.asc())
+    )
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    async with AsyncSessionLocal() as db:
+        for ev in (await db.execute(stmt)).scalars():
+            if ev.id > cursors[ev.run_id]:
+                out.setdefault(ev.run_id, []).append(serialize_event(ev))
+    return out
+
+
+async def _max_event_id(run_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        last = await db.scalar(
+            select(RunEvent.id).where(RunEvent.run_id == run_id).order_by(RunEvent.id.desc()).limit(1)
+        )
+        return last or 0
+
+
+class Subscription:
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # set when the subscriber fell behind and events were dropped;
+        # the consumer must catch up from the DB using its own last_id
+        self.overflowed = False
+
+    def push(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class RunEventHub:
+    def __init__(self):
+        self._subs: Dict[int, Set[Subscription]] = {}
+        self._cursors: Dict[int, int] = {}   # last event id fanned out, per run
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listen_conn = None
+        self.use_notify = engine.dialect.name == "postgresql"
+
+    # --- subscriber API ---
+    async def subscribe(self, run_id: int) -> Subscription:
+        self._ensure_started()
+        sub = Subscription(run_id)
+        if run_id not in self._subs:
+            # new run: start fanning out from whatever is in the DB right now;
+            # the subscriber replays older events itself
+            self._cursors[run_id] = await _max_event_id(run_id)
+            self._subs.setdefault(run_id, set())
+        self._subs[run_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subs.get(sub.run_id)
+        if not subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            self._subs.pop(sub.run_id, None)
+            self._cursors.pop(sub.run_id, None)
+
+    def subscriber_count(self, run_id: Optional[int] = None) -> int:
+        if run_id is not None:
+            return len(self._subs.get(run_id, ()))
+        return sum(len(s) for s in self._subs.values())
+
+    def notify(self, run_id: Optional[int] = None):
+        # poke the hub after a local insert (no-op for runs nobody watches)
+        if self._wakeup is not None and (run_id is None or run_id in self._subs):
+            self._wakeup.set()
+
+    # --- lifecycle ---
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        if self.use_notify:
+            try:
+                self._start_listener()
+            except Exception as e:
+                print(f"run event hub: LISTEN unavailable ({e}), falling back to polling")
+                self.use_notify = False
+        self._task = asyncio.create_task(self._run())
+
+    def _start_listener(self):
+        conn = engine.raw_connection()
+        conn.detach()  # keep this connection out of the pool for good
+        pg = conn.driver_connection
+        pg.autocommit = True
+        with pg.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        asyncio.get_running_loop().add_reader(pg.fileno(), self._on_notify, pg)
+        self._listen_conn = conn
+
+    def _on_notify(self, pg):
+        pg.poll()
+        if not pg.notifies:
+            return
+        runs = set()
+        while pg.notifies:
+            n = pg.notifies.pop(0)
+            try:
+                runs.add(int(n.payload.split(":", 1)[0]))
+            except ValueError:
+                continue
+        if runs & self._subs.keys():
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._listen_conn is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._listen_conn.driver_connection.fileno())
+                self._listen_conn.close()
+            except Exception:
+                pass
+            self._listen_conn = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def _run(self):
+        # with NOTIFY we still sweep now and then in case a notification was lost
+        timeout = POLL_INTERVAL * 10 if self.use_notify else POLL_INTERVAL
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._subs:
+                continue
+            try:
+                await self._dispatch()
+            except Exception as e:
+                print(f"run event hub error: {e}")
+
+    async def _dispatch(self):
+        batches = await _fetch_many(dict(self._cursors))
+        for run_id, events in batches.items():
+            subs = self._subs.get(run_id)
+            if not subs:
+                continue
+            for ev in events:
+                for sub in subs:
+                    sub.push(ev)
+            self._cursors[run_id] = events[-1]["id"]
+
+
+hub = RunEventHub()
@@ -1,11 +1,17 @@
 # backend/src/server/main.py
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import func, select
 
-from src.server import routes, ws
+from src.server import routes, ws, callbacks, model_artifacts, datasets_routes
 from src.server import integrations  # <-- add this
 from src.server.apps_routes import router as apps_router
+from src.server.events import hub as run_event_hub
+from src.event_writer import get_event_writer
+from src.database import SessionLocal, async_engine
+from src.models import Run, RunStatus
+from src import telemetry
 
 
 app = FastAPI(title="FlowOpsAI Backend")
@@ -18,10 +24,17 @@ if os.getenv("ENABLE_CORS", "0") == "1":
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],  # keyset pagination cursor on list endpoints
     )
 
+if telemetry.ENABLED:
+    app.add_middleware(telemetry.HTTPMetrics, prefix="flowops_http")
+
 # REST under /api
 app.include_router(routes.router, prefix="/api")
+app.include_router(callbacks.router, prefix="/api")
+app.include_router(model_artifacts.router, prefix="/api")
+app.include_router(datasets_routes.router, prefix="/api")
 
 # WebSocket WITHOUT /api (nginx proxies /ws to backend)
 app.include_router(ws.router)
@@ -29,6 +42,30 @@ app.include_router(ws.router)
 app.include_router(integrations.router, prefix="/api") 
 app.include_router(apps_router, prefix="/api")
 
+@app.on_event("shutdown")
+async def _shutdown():
+    await run_event_hub.stop()
+    get_event_writer().flush()
+    await async_engine.dispose()
+
+
+# --- Prometheus scrape target (not under /api: nginx does not proxy it) ---
+RUNS = telemetry.Gauge("flowops_runs", "Runs waiting for or held by an agent", ("status",))
+WS_SUBSCRIBERS = telemetry.Gauge("flowops_ws_run_subscribers", "WebSockets subscribed to run events")
+WS_SUBSCRIBERS.set_function(run_event_hub.subscriber_count)
+
+def _count_active_runs():
+    # both counts are served by the partial indexes on runs.status
+    with SessionLocal() as db:
+        for status in (RunStatus.queued, RunStatus.running):
+            RUNS.labels(status.value).set(db.scalar(select(func.count()).select_from(Run).where(Run.status == status)))
+
+telemetry.REGISTRY.add_collector(_count_active_runs)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(telemetry.REGISTRY.render(), media_type=telemetry.CONTENT_TYPE)
+
 
 @app.get("/")
 def root():
@@ -0,0 +1,240 @@
+# backend/src/server/model_artifacts.py
+# Model artifact uploads for trainers that don't share the /models volume.
+#
+#   POST /api/models/{id}/parts?part_number=N   raw body, optional X-Part-SHA256
+#   GET  /api/models/{id}/parts                  what's already there (resume)
+#   POST /api/models/{id}/parts:complete         assemble, verify, set Model.path
+#
+# Parts are streamed to disk while hashing, so a multi-GB checkpoint never sits
+# in memory, and clients can send several parts at once. Re-sending a part
+# number replaces it. On completion the parts are copied into the final file at
+# their offsets in parallel (copy_file_range where the kernel has it), then the
+# whole file is hashed through mmap. That can take minutes for a large file, so
+# it runs outside any transaction: the model is marked assembling (parts and
+# other completes get 409 meanwhile) and finalized in a second short one.
+import asyncio
+import hashlib
+import mmap
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import AsyncSessionLocal, get_async_db
+from src.models import Model, ModelPart, utcnow_naive
+
+router = APIRouter()
+
+ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", os.path.join(os.getenv("MODELS_ROOT", "/models"), "artifacts"))
+MAX_PART_BYTES = int(os.getenv("MODEL_MAX_PART_BYTES", str(1024 ** 3)))
+MAX_PARTS = 10_000
+ASSEMBLY_WORKERS = int(os.getenv("MODEL_ASSEMBLY_WORKERS", "4"))
+COPY_CHUNK = 8 * 1024 * 1024
+# an assembly marker older than this was left by a crashed server: ignored
+ASSEMBLY_TIMEOUT = float(os.getenv("MODEL_ASSEMBLY_TIMEOUT", "900"))
+
+
+def _model_dir(model_id: int) -> str:
+    return os.path.join(ARTIFACT_DIR, str(model_id))
+
+
+def _part_path(model_id: int, part_number: int) -> str:
+    return os.path.join(_model_dir(model_id), "parts", f"{part_number:05d}")
+
+
+# --- file helpers (run in worker threads) ---
+def _copy_range(src_path: str, dst_fd: int, offset: int, size: int):
+    with open(src_path, "rb") as src:
+        done = 0
+        try:
+            while done < size:
+                n = os.copy_file_range(src.fileno(), dst_fd, size - done, done, offset + done)
+                if n == 0:
+                    break
+                done += n
+        except (AttributeError, OSError):
+            pass   # no copy_file_range here (or cross-device): plain pread/pwrite below
+        while done < size:
+            buf = os.pread(src.fileno(), min(COPY_CHUNK, size - done), done)
+            if not buf:
+                break
+            os.pwrite(dst_fd, buf, offset + done)
+            done += len(buf)
+    if done != size:
+        raise OSError(f"{src_path}: expected {size} bytes, copied {done}")
+
+
+def assemble(parts: List[Tuple[str, int]], dest: str, workers: int = ASSEMBLY_WORKERS) -> int:
+    # parts: [(path, size)] in order; returns the total size
+    offsets, total = [], 0
+    for _, size in parts:
+        offsets.append(total)
+        total += size
+    tmp = dest + ".assembling"
+    with open(tmp, "wb") as f:
+        f.truncate(total)
+    fd = os.open(tmp, os.O_WRONLY)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for fut in [pool.submit(_copy_range, p, fd, off, size) for (p, size), off in zip(parts, offsets)]:
+                fut.result()
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, dest)
+    return total
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            # hashes straight from the page cache, no read() copies
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+    return h.hexdigest()
+
+
+# --- endpoints ---
+async def _get_model(db: AsyncSession, model_id: int, lock: bool = False) -> Model:
+    stmt = select(Model).where(Model.id == model_id)
+    if lock:
+        stmt = stmt.with_for_update()
+    m = (await db.execute(stmt)).scalar_one_or_none()
+    if m is None:
+        raise HTTPException(status_code=404, detail="Model not found")
+    return m
+
+
+def _check_open(m: Model):
+    # parts can only change while the artifact is neither complete nor being assembled
+    if m.sha256:
+        raise HTTPException(status_code=409, detail="artifact already complete")
+    if m.assembling_at and m.assembling_at > utcnow_naive() - timedelta(seconds=ASSEMBLY_TIMEOUT):
+        raise HTTPException(status_code=409, detail="artifact is being assembled", headers={"Retry-After": "5"})
+
+
+@router.post("/models/{model_id}/parts", status_code=201)
+async def upload_part(
+    model_id: int,
+    request: Request,
+    part_number: int = Query(..., ge=1, le=MAX_PARTS),
+    x_part_sha256: Optional[str] = Header(None),
+):
+    # No request-scoped session: a part body can take minutes to arrive, and a
+    # pooled connection (with its transaction) must not be held meanwhile.
+    # Validate in one short session, stream, then record in another.
+    async with AsyncSessionLocal() as db:
+        _check_open(await _get_model(db, model_id))
+    path = _part_path(model_id, part_number)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{id(request):x}.tmp"
+    h, size = hashlib.sha256(), 0
+    try:
+        with open(tmp, "wb") as f:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > MAX_PART_BYTES:
+                    raise HTTPException(status_code=413, detail=f"part larger than {MAX_PART_BYTES} bytes")
+                h.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        digest = h.hexdigest()
+        if x_part_sha256 and x_part_sha256.lower() != digest:
+            raise HTTPException(status_code=400, detail=f"checksum mismatch for part {part_number}: got {digest}")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    async with AsyncSessionLocal() as db:
+        try:
+            _check_open(await _get_model(db, model_id))
+        except HTTPException:
+            # completion started while this part was in flight: it is not part of the artifact
+            os.remove(path)
+            raise
+        await db.merge(ModelPart(model_id=model_id, part_number=part_number, size_bytes=size,
+                                 sha256=digest, uploaded_at=utcnow_naive()))
+        await db.commit()
+    return {"model_id": model_id, "part_number": part_number, "size_bytes": size, "sha256": digest}
+
+
+@router.get("/models/{model_id}/parts")
+async def list_parts(model_id: int, db: AsyncSession = Depends(get_async_db)):
+    m = await _get_model(db, model_id)
+    rows = (await db.execute(
+        select(ModelPart.part_number, ModelPart.size_bytes, ModelPart.sha256)
+        .where(ModelPart.model_id == model_id).order_by(ModelPart.part_number)
+    )).all()
+    return {
+        "model_id": model_id,
+        "complete": bool(m.sha256),
+        "parts": [{"part_number": r.part_number, "size_bytes": r.size_bytes, "sha256": r.sha256} for r in rows],
+    }
+
+
+class CompleteUploadBody(BaseModel):
+    filename: str = "model.bin"
+    # expected whole-file checksum; verified after assembly when given
+    sha256: Optional[str] = None
+    # expected number of parts (1..N must all be present)
+    parts: Optional[int] = None
+
+
+@router.post("/models/{model_id}/parts:complete")
+async def complete_upload(model_id: int, body: CompleteUploadBody):
+    # No request-scoped session (see upload_part): assembling and hashing a
+    # multi-GB file must not hold a row lock or a pooled connection.
+    # 1. short transaction: check the parts and mark the model assembling
+    async with AsyncSessionLocal() as db:
+        m = await _get_model(db, model_id, lock=True)
+        if m.sha256:
+            return {"model_id": model_id, "path": m.path, "size_bytes": m.size_bytes, "sha256": m.sha256}
+        _check_open(m)
+        parts = (await db.execute(
+            select(ModelPart.part_number, ModelPart.size_bytes)
+            .where(ModelPart.model_id == model_id).order_by(ModelPart.part_number)
+        )).all()
+        numbers = [p.part_number for p in parts]
+        expected = body.parts or (numbers[-1] if numbers else 0)
+        missing = sorted(set(range(1, expected + 1)) - set(numbers))
+        if not numbers or missing or numbers[-1] != expected:
+            raise HTTPException(status_code=409, detail={"error": "missing parts", "missing": missing[:100]})
+        m.assembling_at = utcnow_naive()
+        await db.commit()
+
+    # 2. no transaction: assemble and hash
+    filename = os.path.basename(body.filename) or "model.bin"
+    dest = os.path.join(_model_dir(model_id), filename)
+    done = False
+    try:
+        size = await asyncio.to_thread(assemble, [(_part_path(model_id, p.part_number), p.size_bytes) for p in parts],
+                                       dest)
+        digest = await asyncio.to_thread(sha256_file, dest)
+        if body.sha256 and body.sha256.lower() != digest:
+            os.remove(dest)
+            raise HTTPException(status_code=400, detail=f"checksum mismatch: assembled file is {digest}")
+
+        # 3. short transaction: record the artifact
+        async with AsyncSessionLocal() as db:
+            m = await _get_model(db, model_id, lock=True)
+            m.path, m.size_bytes, m.sha256, m.assembling_at = dest, size, digest, None
+            await db.execute(delete(ModelPart).where(ModelPart.model_id == model_id))
+            await db.commit()
+        done = True
+    finally:
+        if not done:
+            # failed or cancelled: let the client fix the parts and complete again
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(Model).where(Model.id == model_id).values(assembling_at=None))
+                await db.commit()
+    shutil.rmtree(os.path.join(_model_dir(model_id), "parts"), ignore_errors=True)
+    return {"model_id": model_id, "path": dest, "size_bytes": size, "sha256": digest}
@@ -0,0 +1,30 @@
+# backend/src/server/pagination.py
+# Keyset (cursor) pagination on integer ids, newest first.
+#
+# Pages are fetched with `WHERE id < :after ORDER BY id DESC LIMIT n`, so the
+# cost of a page doesn't depend on how deep into the table it is. List
+# endpoints keep returning a plain JSON array; the cursor for the next page is
+# sent in the X-Next-Cursor header (absent on the last page).
+from typing import Any, List, Optional, Sequence
+
+from fastapi import Response
+from sqlalchemy import Select
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def keyset(stmt: Select, id_col, after: Optional[int], limit: int) -> Select:
+    if after is not None:
+        stmt = stmt.where(id_col < after)
+    # one extra row tells us whether another page exists
+    return stmt.order_by(id_col.desc()).limit(limit + 1)
+
+
+def page(rows: Sequence[Any], limit: int, response: Response) -> List[Any]:
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+    return rows
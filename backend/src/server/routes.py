@@ -1,15 +1,29 @@
+import asyncio
 from datetime import datetime
+import hashlib
+import mimetypes
 import os
-import shutil
 from typing import Any, Dict, List, Optional, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database import SessionLocal
+from src.database import SessionLocal, get_async_db
+from src.agents.pipeline import PipelineError, parse_steps
+from src.agents.planner import get_planner
+from src.artifact_store import app_file, app_files, stream_zip
+from src.event_search import SearchCursorError, search_events
+from src.metrics_store import query_series
 from src.models import Run, RunEvent, RunStatus, Workflow, Model
+from src.models_app import App as AppModel
+from src.server.appgen import APPS_DIR, jobs as appgen_jobs
+from src.server.events import fetch_events
+from src.server.pagination import DEFAULT_LIMIT, MAX_LIMIT, NEXT_CURSOR_HEADER, keyset, page
+from src.server.static_files import send_file
 
 router = APIRouter()
 
@@ -39,6 +53,9 @@ def get_features():
 class StepSpec(BaseModel):
     type: str
     params: Dict[str, Any] = Field(default_factory=dict)
+    # optional DAG wiring; without any depends_on the steps run in list order
+    id: Optional[str] = None
+    depends_on: Optional[List[str]] = None
 
 class PipelineSpec(BaseModel):
     steps: List[StepSpec]
@@ -46,12 +63,21 @@ class PipelineSpec(BaseModel):
 class CreateRunBody(BaseModel):
     pipeline: PipelineSpec
     name: Optional[str] = None
+    # re-execute every step even when a cached result matches
+    force: bool = False
 
 @router.post("/runs")
 def create_run(body: CreateRunBody, db: Session = Depends(get_db)):
+    spec = body.pipeline.dict(exclude_none=True)
+    if body.force:
+        spec["force"] = True
+    try:
+        parse_steps(spec)
+    except PipelineError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     wf = Workflow(
         name=body.name or "ad‑hoc",
-        pipeline_spec=body.pipeline.dict()
+        pipeline_spec=spec
     )
     db.add(wf)
     db.flush()
@@ -71,16 +97,25 @@ def create_run(body: CreateRunBody, db: Session = Depends(get_db)):
 
     return {"run_id": run.id}
 
-# --- Chat -> create run (legacy quick path) ---
+# --- Chat -> planned run ---
 class StartTrainRequest(BaseModel):
     prompt: str
 
 @router.post("/chat/start-train")
 def start_train(req: StartTrainRequest, db: Session = Depends(get_db)):
-    run = Run(status=RunStatus.queued, created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+    # prompt -> pipeline spec via the planner (semantic cache first, see src/agents/planner.py)
+    try:
+        spec, plan = get_planner().plan_prompt(db, req.prompt)
+    except PipelineError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    wf = Workflow(name=req.prompt.strip()[:120] or "chat", pipeline_spec=spec)
+    db.add(wf)
+    db.flush()
+
+    run = Run(workflow_id=wf.id, status=RunStatus.queued, created_at=datetime.utcnow(), updated_at=datetime.utcnow())
     db.add(run)
-    db.commit()
-    db.refresh(run)
+    db.flush()
 
     db.add(RunEvent(
         run_id=run.id,
@@ -89,14 +124,25 @@ def start_train(req: StartTrainRequest, db: Session = Depends(get_db)):
         title="Run queued",
         detail="Awaiting agent pickup",
     ))
+    db.add(RunEvent(
+        run_id=run.id,
+        ts=datetime.utcnow(),
+        level="info",
+        title="Pipeline planned",
+        detail=f"{plan['source']} plan in {plan['ms']} ms: " + " -> ".join(s["type"] for s in spec["steps"]),
+    ))
     db.commit()
 
-    return {"run_id": run.id}
+    return {"run_id": run.id, "pipeline": spec, "plan": plan}
+
+@router.get("/planner/stats")
+def planner_stats(db: Session = Depends(get_db)):
+    return get_planner().stats(db)
 
 # --- Runs ---
 @router.get("/runs/{run_id}")
-def get_run(run_id: int, db: Session = Depends(get_db)):
-    run = db.get(Run, run_id)
+async def get_run(run_id: int, db: AsyncSession = Depends(get_async_db)):
+    run = await db.get(Run, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     return {
@@ -107,13 +153,84 @@ def get_run(run_id: int, db: Session = Depends(get_db)):
         "updated_at": run.updated_at,
     }
 
+@router.get("/runs/{run_id}/metrics")
+async def get_run_metrics(
+    run_id: int,
+    keys: Optional[str] = Query(None, description="Comma-separated metric names (default: all)"),
+    from_step: int = Query(0, ge=0),
+    max_points: int = Query(1000, ge=1, le=100_000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.scalar(select(Run.id).where(Run.id == run_id)) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    wanted = [k.strip() for k in (keys or "").split(",") if k.strip()]
+    return await db.run_sync(query_series, run_id, wanted or None, from_step, max_points)
+
+@router.get("/runs/{run_id}/events")
+async def get_run_events(
+    run_id: int,
+    response: Response,
+    after: int = Query(0, ge=0, description="Cursor: return events with id above this"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # oldest first, like the WebSocket replay (archived events included)
+    if await db.scalar(select(Run.id).where(Run.id == run_id)) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    events = await fetch_events(run_id, after, limit + 1)
+    if len(events) > limit:
+        events = events[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(events[-1]["id"])
+    return events
+
+@router.get("/events/search")
+async def search_run_events(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500, description='Search terms: words, "phrases", -excluded, or'),
+    level: Optional[str] = Query(None, description="Comma-separated levels, e.g. error,warning"),
+    run_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
+    levels = [lv.strip() for lv in (level or "").split(",") if lv.strip()]
+    try:
+        rows, cursor = await db.run_sync(search_events, q, levels, run_id, since, until, after, limit)
+    except SearchCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return rows
+
 @router.get("/runs")
-def list_runs(db: Session = Depends(get_db)):
-    rows = db.query(Run).order_by(Run.id.desc()).all()
+async def list_runs(
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: Optional[int] = Query(None, description="Cursor: return runs with id below this"),
+    status: Optional[RunStatus] = None,
+    workflow_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # column projection: no ORM hydration, no metrics JSON
+    stmt = select(Run.id, Run.status, Run.workflow_id, Run.created_at, Run.updated_at)
+    if status is not None:
+        stmt = stmt.where(Run.status == status)
+    if workflow_id is not None:
+        stmt = stmt.where(Run.workflow_id == workflow_id)
+    if created_from is not None:
+        stmt = stmt.where(Run.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Run.created_at < created_to)
+    rows = page((await db.execute(keyset(stmt, Run.id, after, limit))).all(), limit, response)
     return [
         {
             "id": r.id,
             "status": r.status.value if hasattr(r.status, "value") else str(r.status),
+            "workflow_id": r.workflow_id,
             "created_at": r.created_at,
             "updated_at": r.updated_at,
         }
@@ -122,13 +239,35 @@ def list_runs(db: Session = Depends(get_db)):
 
 # --- Models ---
 @router.get("/models")
-def list_models(db: Session = Depends(get_db)):
-    rows = db.query(Model).order_by(Model.id.desc()).all()
+async def list_models(
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: Optional[int] = Query(None, description="Cursor: return models with id below this"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = select(Model.id, Model.name, Model.path, Model.created_at)
+    if created_from is not None:
+        stmt = stmt.where(Model.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Model.created_at < created_to)
+    rows = page((await db.execute(keyset(stmt, Model.id, after, limit))).all(), limit, response)
     return [
         {"id": m.id, "name": m.name, "path": m.path, "created_at": m.created_at}
         for m in rows
     ]
 
+@router.get("/models/{model_id}/download")
+async def download_model(model_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    m = await db.get(Model, model_id)
+    if not m or not m.path or not os.path.isfile(m.path):
+        raise HTTPException(status_code=404, detail="model artifact not found")
+    # checkpoints can be GBs: Range requests resume partial downloads. send_file
+    # stats, hashes and may read/compress the file: off the event loop
+    return await asyncio.to_thread(send_file, request, m.path, "application/octet-stream",
+                                   filename=os.path.basename(m.path))
+
 # --- Placeholder lists (UI uses these) ---
 @router.get("/workflows")
 def list_workflows():
@@ -141,137 +280,105 @@ def get_insights():
 # --------------------------
 # App Generator (minimal)
 # --------------------------
-
-MODELS_ROOT = "/models"                      # mounted volume
-APPS_DIR = os.path.join(MODELS_ROOT, "apps") # /models/apps
+# Builds run on the appgen job pool (src/server/appgen.py); the request only
+# records an `apps` row in status "building" and returns its id.
 
 class AppGenRequest(BaseModel):
-    prompt: str
+    # accept either `prompt` or legacy UI field `spec`
+    prompt: Optional[str] = None
+    spec: Optional[str] = None
+    name: Optional[str] = None
+    template: Optional[str] = None
     mode: Literal["app", "analyze"] = "app"
     dataset_url: Optional[str] = None
 
-def _ensure_dirs():
-    os.makedirs(APPS_DIR, exist_ok=True)
-
-def _write_minimal_app(app_dir: str, title: str, mode: str, dataset_url: Optional[str]):
-    os.makedirs(app_dir, exist_ok=True)
-    # extremely small, dependency‑free page
-    html = f"""<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8" />
-  <title>{title}</title>
-  <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <style>
-    body {{ font-family: system-ui, -apple-system, Segoe UI, Roboto, sans-serif; margin: 24px; background:#0b1220; color:#fff; }}
-    .card {{ background: rgba(255,255,255,.04); border:1px solid rgba(255,255,255,.1); border-radius:16px; padding:16px; }}
-    .muted {{ color: rgba(255,255,255,.7); }}
-    code, pre {{ background: rgba(255,255,255,.06); padding: 6px 8px; border-radius: 8px; }}
-    a.button {{ display:inline-block; padding:8px 12px; border-radius:8px; background:#3b82f6; color:#fff; text-decoration:none; }}
-  </style>
-</head>
-<body>
-  <h1>{title}</h1>
-  <div class="card">
-    <p class="muted">Mode: <b>{mode}</b></p>
-    {"<p class='muted'>Dataset URL: <code>"+dataset_url+"</code></p>" if dataset_url else ""}
-    <p>This is a lightweight starter app generated by FlowOpsAI.</p>
-    <p class="muted">Next steps: wire data loading & add widgets.</p>
-  </div>
-  <script>
-    // If you provided a dataset, fetch & render a tiny preview (best‑effort).
-    const datasetUrl = {repr(dataset_url)};
-    if (datasetUrl) {{
-      fetch(datasetUrl).then(r => r.text()).then(txt => {{
-        const pre = document.createElement('pre');
-        pre.textContent = txt.slice(0, 2000);
-        document.body.appendChild(document.createElement('br'));
-        document.body.appendChild(pre);
-      }}).catch(()=>{{
-        const p = document.createElement('p');
-        p.textContent = 'Could not fetch dataset (CORS or network).';
-        document.body.appendChild(p);
-      }});
-    }}
-  </script>
-</body>
-</html>
-"""
-    with open(os.path.join(app_dir, "index.html"), "w", encoding="utf-8") as f:
-        f.write(html)
-
-def _zip_dir(src_dir: str, zip_path: str):
-    base, _ = os.path.splitext(zip_path)
-    shutil.make_archive(base, "zip", src_dir)
-
-@router.post("/appgen/generate")
-def appgen_generate(body: AppGenRequest, request: Request, db: Session = Depends(get_db)):
-    if not body.prompt.strip():
-        raise HTTPException(status_code=400, detail="prompt is required")
-
-    _ensure_dirs()
-
-    # Create a Model row first to get an ID (no new tables today)
-    now = datetime.utcnow()
-    model = Model(name="app-pending", path="", created_at=now)  # path to be filled after write
-    db.add(model)
-    db.commit()
-    db.refresh(model)
-
-    app_id = model.id
-    app_name = f"app-{app_id}"
-    app_dir = os.path.join(APPS_DIR, str(app_id))
-    _write_minimal_app(app_dir, title=body.prompt.strip(), mode=body.mode, dataset_url=body.dataset_url)
-
-    # Zip it
-    zip_path = os.path.join(APPS_DIR, f"{app_name}.zip")
-    _zip_dir(app_dir, zip_path)
-
-    # Update model row
-    model.name = app_name
-    model.path = zip_path
-    db.add(model)
-    db.commit()
-
-    # Build absolute URLs based on this request
-    preview_url = f"/api/apps/{app_id}"
-    download_url = f"/api/apps/{app_id}/download"
-
+def _app_urls(app_id: int) -> Dict[str, str]:
     return {
-        "app_id": app_id,
-        "name": app_name,
-        "preview_url": preview_url,
-        "download_url": download_url,
+        "preview_url": f"/api/apps/{app_id}",
+        "download_url": f"/api/apps/{app_id}/download",
+        "events_url": f"/ws/apps/{app_id}",
     }
 
+@router.post("/appgen/generate", status_code=202)
+def appgen_generate(body: AppGenRequest, db: Session = Depends(get_db)):
+    prompt = (body.prompt or body.spec or "").strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="prompt is required")
+    if not appgen_jobs.reserve():
+        raise HTTPException(status_code=429, detail="app generation queue is full, retry later",
+                            headers={"Retry-After": "5"})
+    try:
+        now = datetime.utcnow()
+        app_row = AppModel(name=body.name or "app-pending", template=body.template, status="building",
+                           created_at=now, updated_at=now,
+                           meta={"prompt": prompt, "mode": body.mode, "dataset_url": body.dataset_url})
+        db.add(app_row)
+        db.flush()
+        urls = _app_urls(app_row.id)
+        if not body.name:
+            app_row.name = f"app-{app_row.id}"
+        app_row.preview_url, app_row.zip_url = urls["preview_url"], urls["download_url"]
+        db.commit()
+    except Exception:
+        appgen_jobs.release()
+        raise
+    appgen_jobs.start(app_row.id, {"title": prompt, "mode": body.mode, "dataset_url": body.dataset_url})
+    return {"app_id": app_row.id, "job_id": app_row.id, "name": app_row.name, "status": "building", **urls}
+
 @router.get("/appgen/apps/{app_id}")
-def appgen_get(app_id: int, request: Request, db: Session = Depends(get_db)):
-    m = db.get(Model, app_id)
-    if not m or not (m.name or "").startswith("app-"):
+async def appgen_get(app_id: int, db: AsyncSession = Depends(get_async_db)):
+    app_row = await db.get(AppModel, app_id)
+    if not app_row:
         raise HTTPException(status_code=404, detail="app not found")
-    preview_url = f"/api/apps/{app_id}"
-    download_url = f"/api/apps/{app_id}/download"
-    return {
-        "app_id": app_id,
-        "name": m.name,
-        "preview_url": preview_url,
-        "download_url": download_url,
-    }
+    out = {"app_id": app_id, "name": app_row.name, "status": app_row.status, **_app_urls(app_id)}
+    if app_row.status == "error":
+        out["error"] = (app_row.meta or {}).get("error")
+    return out
+
+# Serve preview & download (files live in the blob store; APPS_DIR holds apps built before it)
+def _app_file_path(db: Session, app_id: int, path: str) -> Optional[str]:
+    blob = app_file(db, app_id, path)
+    if blob is None:
+        blob = os.path.join(APPS_DIR, str(app_id), path)
+    return blob if os.path.isfile(blob) else None
 
-# Serve preview & download
 @router.get("/apps/{app_id}")
-def serve_app_index(app_id: int):
-    app_index = os.path.join(APPS_DIR, str(app_id), "index.html")
-    if not os.path.isfile(app_index):
+def serve_app_index(app_id: int, request: Request, db: Session = Depends(get_db)):
+    app_index = _app_file_path(db, app_id, "index.html")
+    if app_index is None:
         raise HTTPException(status_code=404, detail="app not found")
-    return FileResponse(app_index, media_type="text/html")
+    return send_file(request, app_index, "text/html")
+
+@router.get("/apps/{app_id}/files/{path:path}")
+def serve_app_file(app_id: int, path: str, request: Request, db: Session = Depends(get_db)):
+    blob = app_file(db, app_id, path)
+    if blob is None or not os.path.isfile(blob):
+        raise HTTPException(status_code=404, detail="file not found")
+    # blobs are content-addressed: an app's file never changes under the same URL
+    return send_file(request, blob, mimetypes.guess_type(path)[0] or "application/octet-stream",
+                     cache_control="public, max-age=86400")
 
 @router.get("/apps/{app_id}/download")
-def download_app_zip(app_id: int, db: Session = Depends(get_db)):
-    m = db.get(Model, app_id)
-    if not m or not (m.name or "").startswith("app-"):
+async def download_app_zip(app_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    app_row = await db.get(AppModel, app_id)
+    if not app_row:
         raise HTTPException(status_code=404, detail="app not found")
-    zip_path = m.path or ""
+    if app_row.status != "ready":
+        raise HTTPException(status_code=409, detail=f"app is {app_row.status}")
+    entries = await db.run_sync(app_files, app_id)
+    if entries:
+        # assembled from the blobs while streaming; no zip on disk. The archive
+        # is a function of the file digests, so they make a stable ETag.
+        etag = '"%s"' % hashlib.sha256("".join(f"{p}:{d};" for p, d, _ in entries).encode()).hexdigest()[:32]
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag})
+        return StreamingResponse(
+            stream_zip(entries, date_time=app_row.created_at.timetuple()[:6]),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="app-{app_id}.zip"', "ETag": etag},
+        )
+    zip_path = ((app_row.meta or {}).get("paths") or {}).get("zip_path") or ""
     if not (zip_path and os.path.isfile(zip_path)):
         raise HTTPException(status_code=404, detail="artifact missing")
-    return FileResponse(zip_path, media_type="application/zip", filename=os.path.basename(zip_path))
+    return await asyncio.to_thread(send_file, request, zip_path, "application/zip",
+                                   filename=os.path.basename(zip_path))
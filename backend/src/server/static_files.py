@@ -0,0 +1,176 @@
+# backend/src/server/static_files.py
+# File responses for app previews, app files and model artifacts.
+#
+# - ETag / Last-Modified on everything, 304 for If-None-Match / If-Modified-Since
+# - small files (previews, assets) come from an in-memory LRU keyed by
+#   (path, mtime, size), together with gzip (and brotli, when installed)
+#   variants compressed once at load time
+# - large files go through FileResponse: Range / If-Range (206/416), and
+#   zero-copy `http.response.pathsend` on servers that support it; a
+#   `<file>.gz` / `<file>.br` next to the file is served when the client accepts it
+# - with STATIC_ACCEL_REDIRECT set (e.g. "/_models/"), files under MODELS_ROOT
+#   are handed to nginx via X-Accel-Redirect so it can sendfile() them
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli   # optional
+except ImportError:
+    brotli = None
+
+MODELS_ROOT = os.getenv("MODELS_ROOT", "/models")
+CACHE_BYTES = int(os.getenv("STATIC_CACHE_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_FILE = int(os.getenv("STATIC_CACHE_MAX_FILE", str(256 * 1024)))
+ACCEL_REDIRECT = os.getenv("STATIC_ACCEL_REDIRECT", "")   # nginx internal location, "" = off
+MIN_COMPRESS = 1024   # smaller bodies aren't worth an encoding
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class _Entry:
+    __slots__ = ("variants", "size")
+
+    def __init__(self, variants: Dict[str, bytes]):
+        self.variants = variants   # encoding ("identity", "gzip", "br") -> body
+        self.size = sum(len(v) for v in variants.values())
+
+
+class FileCache:
+    # LRU of small file bodies, bounded by total bytes
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int, int], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, st: os.stat_result, media_type: str) -> _Entry:
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = _Entry(_load_variants(path, media_type))
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self.total += entry.size
+            while self.total > self.max_bytes and self._entries:
+                _, old = self._entries.popitem(last=False)
+                self.total -= old.size
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total = 0
+
+
+def _load_variants(path: str, media_type: str) -> Dict[str, bytes]:
+    with open(path, "rb") as f:
+        body = f.read()
+    variants = {"identity": body}
+    if len(body) >= MIN_COMPRESS and media_type.startswith(COMPRESSIBLE):
+        gz = gzip.compress(body, compresslevel=6, mtime=0)
+        if len(gz) < len(body):
+            variants["gzip"] = gz
+        if brotli is not None:
+            br = brotli.compress(body)
+            if len(br) < len(body):
+                variants["br"] = br
+    return variants
+
+
+cache = FileCache()
+
+
+def _accepted(request: Request):
+    accept = request.headers.get("accept-encoding", "")
+    encodings = set()
+    for part in accept.split(","):
+        name, _, q = part.strip().partition(";")
+        if name and q.strip() not in ("q=0", "q=0.0"):
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def _pick_encoding(request: Request, available) -> str:
+    accepted = _accepted(request)
+    for enc in ("br", "gzip"):
+        if enc in available and enc in accepted:
+            return enc
+    return "identity"
+
+
+def _not_modified(request: Request, etag: str, st: os.stat_result) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        # weak comparison; variant etags ("...-gzip") still match their base
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        base = etag.strip('"')
+        return "*" in tags or any(t.strip('"').split("-")[:2] == base.split("-")[:2] for t in tags)
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def send_file(request: Request, path: str, media_type: str, filename: Optional[str] = None,
+              cache_control: str = "no-cache") -> Response:
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="file not found")
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, st):
+        return Response(status_code=304, headers=headers)
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    # small: memory, precompressed once
+    if st.st_size <= CACHE_MAX_FILE and "range" not in request.headers:
+        entry = cache.get(path, st, media_type)
+        enc = _pick_encoding(request, entry.variants)
+        headers["Vary"] = "Accept-Encoding"
+        if enc != "identity":
+            headers["Content-Encoding"] = enc
+            headers["ETag"] = f'"{st.st_mtime_ns:x}-{st.st_size:x}-{enc}"'
+        return Response(entry.variants[enc], media_type=media_type, headers=headers)
+
+    # large: let nginx sendfile() it when it's on the shared volume
+    root = os.path.join(MODELS_ROOT, "")
+    if ACCEL_REDIRECT and os.path.abspath(path).startswith(root):
+        headers["X-Accel-Redirect"] = ACCEL_REDIRECT.rstrip("/") + "/" + os.path.relpath(path, MODELS_ROOT)
+        return Response(media_type=media_type, headers=headers)
+
+    # a precompressed sidecar, only for whole-body requests
+    if "range" not in request.headers:
+        accepted = _accepted(request)
+        for enc, ext in (("br", ".br"), ("gzip", ".gz")):
+            side = path + ext
+            if enc in accepted and os.path.isfile(side) and os.stat(side).st_mtime_ns >= st.st_mtime_ns:
+                headers.update({"Content-Encoding": enc, "Vary": "Accept-Encoding",
+                                "ETag": f'"{st.st_mtime_ns:x}-{st.st_size:x}-{enc}"'})
+                headers.pop("Accept-Ranges")
+                return FileResponse(side, media_type=media_type, headers=headers)
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=st)
@@ -1,40 +1,64 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import asyncio
-from datetime import timezone
-from sqlalchemy.orm import Session
-from src.database import SessionLocal
-from src.models import RunEvent
+from src import telemetry
+from src.database import AsyncSessionLocal
+from src.models_app import App as AppModel
+from src.server.appgen import TERMINAL, jobs as appgen_jobs
+from src.server.events import hub, fetch_events
 
 router = APIRouter()
 
+REPLAY_PAGE = 500
+
+WS_CONNECTIONS = telemetry.Gauge("flowops_ws_connections", "Open WebSocket connections", ("endpoint",))
+WS_EVENTS_SENT = telemetry.Counter("flowops_ws_events_sent_total", "Run events pushed to WebSocket clients", ("source",))
+
+async def _send_backlog(websocket: WebSocket, run_id: int, last_id: int) -> int:
+    # replay everything after last_id straight from the DB, page by page
+    while True:
+        events = await fetch_events(run_id, last_id, REPLAY_PAGE)
+        for ev in events:
+            await websocket.send_json(ev)
+            last_id = ev["id"]
+        WS_EVENTS_SENT.labels("replay").inc(len(events))
+        if len(events) < REPLAY_PAGE:
+            return last_id
+
 @router.websocket("/ws/runs/{run_id}")
-async def ws_run_events(websocket: WebSocket, run_id: int):
+async def ws_run_events(websocket: WebSocket, run_id: int, last_id: int = 0):
     # Accept without extra checks (nginx handles origin); tighten later if needed
     await websocket.accept()
     print(f"WebSocket connected for run {run_id}")
 
-    last_id = 0
+    # subscribe before replaying so nothing falls between replay and live push;
+    # duplicates are dropped by id below
+    sub = await hub.subscribe(run_id)
+    # clients never send anything, but reading lets us notice disconnects
+    # while idle instead of only on the next send
+    closed = asyncio.create_task(websocket.receive())
+    WS_CONNECTIONS.labels("runs").inc()
     try:
+        last_id = await _send_backlog(websocket, run_id, last_id)
         while True:
-            await asyncio.sleep(2)  # poll every 2s
-            with SessionLocal() as db:
-                new_events = (
-                    db.query(RunEvent)
-                    .filter(RunEvent.run_id == run_id, RunEvent.id > last_id)
-                    .order_by(RunEvent.id.asc())
-                    .all()
-                )
-                for ev in new_events:
-                    # DB stores naive UTC; make it explicit for clients
-                    ts = ev.ts.replace(tzinfo=timezone.utc).isoformat()
-                    await websocket.send_json({
-                        "id": ev.id,
-                        "ts": ts,
-                        "level": ev.level,
-                        "title": ev.title,
-                        "detail": ev.detail,
-                    })
-                    last_id = ev.id
+            if sub.overflowed:
+                sub.overflowed = False
+                last_id = await _send_backlog(websocket, run_id, last_id)
+            getter = asyncio.create_task(sub.queue.get())
+            done, _ = await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed in done:
+                getter.cancel()
+                msg = closed.result()
+                if msg.get("type") == "websocket.disconnect":
+                    raise WebSocketDisconnect(msg.get("code", 1000))
+                closed = asyncio.create_task(websocket.receive())
+                if getter not in done:
+                    continue
+            ev = getter.result()
+            if ev["id"] <= last_id:
+                continue
+            await websocket.send_json(ev)
+            last_id = ev["id"]
+            WS_EVENTS_SENT.labels("live").inc()
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for run {run_id}")
     except Exception as e:
@@ -43,3 +67,44 @@ async def ws_run_events(websocket: WebSocket, run_id: int):
             await websocket.close()
         except:
             pass
+    finally:
+        closed.cancel()
+        hub.unsubscribe(sub)
+        WS_CONNECTIONS.labels("runs").dec()
+
+@router.websocket("/ws/apps/{app_id}")
+async def ws_app_progress(websocket: WebSocket, app_id: int):
+    # app generation progress: replay what the job published so far, then
+    # stream until the build reaches ready/error
+    await websocket.accept()
+    queue, history = appgen_jobs.subscribe(app_id)
+    WS_CONNECTIONS.labels("apps").inc()
+    try:
+        for ev in history:
+            await websocket.send_json(ev)
+        if history and history[-1]["status"] in TERMINAL:
+            return
+        if not history:
+            # job finished before this process started (or ran elsewhere): report the stored state
+            async with AsyncSessionLocal() as db:
+                app_row = await db.get(AppModel, app_id)
+            if app_row is None:
+                await websocket.send_json({"app_id": app_id, "status": "error", "detail": "app not found"})
+                return
+            if app_row.status != "building":
+                await websocket.send_json({"app_id": app_id, "status": app_row.status, "stage": "done", "progress": 100})
+                return
+        while True:
+            ev = await queue.get()
+            await websocket.send_json(ev)
+            if ev["status"] in TERMINAL:
+                return
+    except WebSocketDisconnect:
+        print(f"WebSocket disconnected for app {app_id}")
+    finally:
+        appgen_jobs.unsubscribe(app_id, queue)
+        WS_CONNECTIONS.labels("apps").dec()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
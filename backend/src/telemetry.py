@@ -0,0 +1,357 @@
+# backend/src/telemetry.py
+# Prometheus-style metrics without the client library (shared with the
+# trainer image, so standard library only).
+#
+#   REQUESTS = Counter("app_requests_total", "Requests served", ("route",))
+#   REQUESTS.labels("/api/runs").inc()
+#   LATENCY.labels("/api/runs").observe(0.012)
+#   REGISTRY.render()  -> text exposition format for GET /metrics
+#
+# Hot-path updates take no lock: every writer thread gets its own cell (a
+# small list of floats) and only ever touches that one, so `+=` on it is
+# never raced; a scrape sums the cells. The only lock is taken once per new
+# thread and once per new label set.
+#
+# Also here: an ASGI middleware timing HTTP requests per route template, and
+# `serve(port)` for processes without a web app (the agent worker).
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import get_ident
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+class _Cells:
+    # per-thread accumulators; a dead thread's id may be reused by a new
+    # thread, which then simply carries on adding to the same cell
+    __slots__ = ("width", "_cells", "_lock")
+
+    def __init__(self, width: int):
+        self.width = width
+        self._cells: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        c = self._cells.get(get_ident())
+        if c is None:
+            with self._lock:
+                c = self._cells.setdefault(get_ident(), [0.0] * self.width)
+        return c
+
+    def total(self) -> List[float]:
+        out = [0.0] * self.width
+        for c in list(self._cells.values()):
+            for i, v in enumerate(c):
+                out[i] += v
+        return out
+
+
+# --- metric types ---
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self, metric):
+        self._cells = _Cells(1)
+
+    def inc(self, n: float = 1.0):
+        self._cells.cell()[0] += n
+
+    def value(self) -> float:
+        return self._cells.total()[0]
+
+
+class _GaugeChild:
+    # value = last set() + every inc()/dec() since, or fn() when set_function() was used
+    __slots__ = ("_cells", "_base", "_fn")
+
+    def __init__(self, metric):
+        self._cells = _Cells(1)
+        self._base = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+
+    def inc(self, n: float = 1.0):
+        self._cells.cell()[0] += n
+
+    def dec(self, n: float = 1.0):
+        self._cells.cell()[0] -= n
+
+    def set(self, v: float):
+        self._base = v - self._cells.total()[0]
+
+    def set_function(self, fn: Callable[[], float]):
+        self._fn = fn
+
+    def value(self) -> float:
+        if self._fn is not None:
+            return float(self._fn())
+        return self._base + self._cells.total()[0]
+
+
+class _Timer:
+    __slots__ = ("_child", "_t0")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._t0)
+
+
+class _HistogramChild:
+    # cell layout: one count per bucket (the last is +Inf), then the sum
+    __slots__ = ("_bounds", "_cells")
+
+    def __init__(self, metric):
+        self._bounds = metric.buckets
+        self._cells = _Cells(len(metric.buckets) + 2)
+
+    def observe(self, v: float):
+        c = self._cells.cell()
+        c[bisect_left(self._bounds, v)] += 1
+        c[-1] += v
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        # -> (cumulative bucket counts incl. +Inf, sum)
+        t = self._cells.total()
+        cum, acc = [], 0.0
+        for v in t[:-1]:
+            acc += v
+            cum.append(acc)
+        return cum, t[-1]
+
+
+class _Metric:
+    kind = ""
+    child_cls = None
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values: str) -> object:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self.child_cls(self))
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        return list(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+    child_cls = _CounterChild
+
+    def inc(self, n: float = 1.0):
+        self.labels().inc(n)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    child_cls = _GaugeChild
+
+    def inc(self, n: float = 1.0):
+        self.labels().inc(n)
+
+    def dec(self, n: float = 1.0):
+        self.labels().dec(n)
+
+    def set(self, v: float):
+        self.labels().set(v)
+
+    def set_function(self, fn: Callable[[], float]):
+        self.labels().set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    child_cls = _HistogramChild
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def observe(self, v: float):
+        self.labels().observe(v)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+
+# --- exposition ---
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if v != v:
+        return "NaN"
+    return str(int(v)) if v == int(v) and abs(v) < 1e15 else repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def add_collector(self, fn: Callable[[], None]):
+        # fn() runs before each render, e.g. to set gauges from a DB count
+        with self._lock:
+            self._collectors.append(fn)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        for fn in list(self._collectors):
+            try:
+                fn()
+            except Exception as e:
+                print(f"[metrics] collector {getattr(fn, '__name__', fn)} failed: {e}")
+        lines: List[str] = []
+        for m in sorted(self._metrics.values(), key=lambda m: m.name):
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for values, child in m.children():
+                if m.kind == "histogram":
+                    cum, total = child.snapshot()
+                    for bound, count in zip(m.buckets + (float("inf"),), cum):
+                        le = 'le="%s"' % _fmt(bound)
+                        lines.append(f"{m.name}_bucket{_labels(m.labelnames, values, le)} {_fmt(count)}")
+                    lines.append(f"{m.name}_sum{_labels(m.labelnames, values)} {_fmt(total)}")
+                    lines.append(f"{m.name}_count{_labels(m.labelnames, values)} {_fmt(cum[-1])}")
+                else:
+                    try:
+                        value = child.value()
+                    except Exception:
+                        continue   # a gauge function that cannot answer right now
+                    lines.append(f"{m.name}{_labels(m.labelnames, values)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# --- HTTP instrumentation ---
+def _route_template(scope) -> str:
+    # scope["route"] is the matched route; its path may be relative to an
+    # included router's prefix (/runs/{run_id} under /api), so take the prefix
+    # from the request path: the shortest one the route's pattern accepts the rest of
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if template is None:
+        return "<unmatched>"
+    path = scope.get("path", "")
+    if regex is None or regex.match(path):
+        return template
+    i = path.find("/", 1)
+    while i != -1:
+        if regex.match(path[i:]):
+            return path[:i] + template
+        i = path.find("/", i + 1)
+    return template
+
+
+class HTTPMetrics:
+    # Pure ASGI middleware (no BaseHTTPMiddleware: streaming bodies pass
+    # straight through). Requests are labelled by route template, e.g.
+    # /api/runs/{run_id}, so label sets stay bounded; unmatched paths share one.
+    def __init__(self, app, prefix: str = "http", registry: Optional[Registry] = None):
+        self.app = app
+        registry = registry or REGISTRY
+        self.requests = registry.get(f"{prefix}_requests_total") or Counter(
+            f"{prefix}_requests_total", "HTTP requests by route template and status",
+            ("method", "route", "status"), registry)
+        self.latency = registry.get(f"{prefix}_request_duration_seconds") or Histogram(
+            f"{prefix}_request_duration_seconds", "HTTP request latency until the response is fully sent",
+            ("method", "route"), registry=registry)
+        self.inflight = registry.get(f"{prefix}_requests_in_flight") or Gauge(
+            f"{prefix}_requests_in_flight", "HTTP requests being served", (), registry)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        self.inflight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.inflight.dec()
+            route = _route_template(scope)
+            self.latency.labels(scope["method"], route).observe(time.perf_counter() - t0)
+            self.requests.labels(scope["method"], route, str(status[0])).inc()
+
+
+# --- standalone endpoint ---
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, host: str = "0.0.0.0", registry: Optional[Registry] = None) -> ThreadingHTTPServer:
+    # GET /metrics on a daemon thread, for processes that have no web app
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[metrics] serving /metrics on {host}:{server.server_address[1]}")
+    return server
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# tests run against a throwaway SQLite file instead of Postgres
+_tmp = tempfile.mkdtemp(prefix="flowopsai-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("RUN_EVENTS_POLL_INTERVAL", "0.05")
+os.environ.setdefault("STEP_CACHE_DIR", os.path.join(_tmp, "step-cache"))
+os.environ.setdefault("MODELS_ROOT", os.path.join(_tmp, "models"))
+os.environ.setdefault("PLANNER_BACKEND", "local")   # offline stand-ins, never the OpenAI API
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import Base, engine  # noqa: E402
+from src import models, models_app  # noqa: F401,E402
+
+Base.metadata.create_all(bind=engine)
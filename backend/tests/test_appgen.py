@@ -0,0 +1,115 @@
+import io
+import time
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from src.server.appgen import AppGenJobs, jobs
+from src.server.main import app
+
+
+def _wait_ready(client, app_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        body = client.get(f"/api/appgen/apps/{app_id}").json()
+        if body["status"] != "building":
+            return body
+        time.sleep(0.02)
+    raise AssertionError("app stayed in building")
+
+
+def test_generate_returns_immediately_and_builds_in_background():
+    client = TestClient(app)
+    r = client.post("/api/appgen/generate", json={"prompt": "Sales dashboard", "name": "Sales"})
+    assert r.status_code == 202
+    body = r.json()
+    assert body["status"] == "building" and body["job_id"] == body["app_id"]
+
+    assert _wait_ready(client, body["app_id"])["status"] == "ready"
+    assert "Sales dashboard" in client.get(body["preview_url"]).text
+    assert "color" in client.get(f"/api/apps/{body['app_id']}/files/assets/app.css").text
+    zr = client.get(body["download_url"])
+    assert zr.status_code == 200 and zr.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(zr.content)) as zf:
+        assert set(zf.namelist()) == {"index.html", "assets/app.css", "assets/app.js"}
+        assert b"Sales dashboard" in zf.read("index.html")
+
+    listed = client.get("/api/apps", params={"status": "ready"}).json()
+    assert any(a["id"] == body["app_id"] for a in listed)
+
+
+def test_progress_is_streamed_over_websocket():
+    client = TestClient(app)
+    app_id = client.post("/api/appgen/generate", json={"spec": "Churn explorer"}).json()["app_id"]
+    statuses = []
+    with client.websocket_connect(f"/ws/apps/{app_id}") as ws:
+        while True:
+            ev = ws.receive_json()
+            statuses.append(ev["status"])
+            if ev["status"] != "building":
+                break
+    assert statuses[-1] == "ready"
+
+
+def test_generate_rejects_when_queue_is_full(monkeypatch):
+    full = AppGenJobs(concurrency=1, max_pending=1)
+    assert full.reserve()
+    monkeypatch.setattr(jobs, "reserve", full.reserve)
+    client = TestClient(app)
+    r = client.post("/api/appgen/generate", json={"prompt": "x"})
+    assert r.status_code == 429
+
+
+def test_delete_app_keeps_blobs_shared_with_other_apps():
+    client = TestClient(app)
+    a = client.post("/api/appgen/generate", json={"prompt": "one"}).json()["app_id"]
+    b = client.post("/api/appgen/generate", json={"prompt": "two"}).json()["app_id"]
+    _wait_ready(client, a)
+    _wait_ready(client, b)
+
+    r = client.delete(f"/api/apps/{a}")
+    assert r.status_code == 200
+    assert 0 < r.json()["freed_bytes"] < 1000   # only a's index.html
+    assert client.get(f"/api/apps/{b}/files/assets/app.js").status_code == 200
+    assert client.get(f"/api/apps/{a}").status_code == 404
+
+
+def _refs(app_id):
+    from sqlalchemy import select
+    from src.database import SessionLocal
+    from src.models_app import AppBlob, AppFile
+    with SessionLocal() as db:
+        files = db.execute(select(AppFile.digest).where(AppFile.app_id == app_id)).scalars().all()
+        refcounts = dict(db.execute(select(AppBlob.digest, AppBlob.refcount)).all())
+    return files, refcounts
+
+
+def test_delete_without_purge_still_releases_blob_references():
+    client = TestClient(app)
+    a = client.post("/api/appgen/generate", json={"prompt": "keep-files-flag"}).json()["app_id"]
+    _wait_ready(client, a)
+    files, before = _refs(a)
+    assert files
+
+    r = client.delete(f"/api/apps/{a}", params={"purge_files": "false"})
+    assert r.status_code == 200 and r.json()["freed_bytes"] > 0
+    left, after = _refs(a)
+    assert left == []
+    for digest in set(files):
+        assert after.get(digest, 0) == before[digest] - files.count(digest)
+
+
+def test_app_deleted_while_building_releases_its_files():
+    from src.database import SessionLocal
+    from src.models_app import App as AppModel
+    with SessionLocal() as db:
+        row = AppModel(name="gone", status="building")
+        db.add(row)
+        db.commit()
+        app_id = row.id
+        db.delete(row)
+        db.commit()
+    runner = AppGenJobs(concurrency=1, max_pending=1)
+    assert runner.reserve()
+    runner._run(app_id, {"title": "deleted mid-build", "mode": "app"})
+    assert _refs(app_id)[0] == []
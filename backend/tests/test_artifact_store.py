@@ -0,0 +1,37 @@
+import io
+import os
+import zipfile
+
+from src.artifact_store import app_files, blob_path, release_app, store_app_files, stream_zip
+from src.database import SessionLocal
+
+
+def test_shared_files_are_stored_once_and_freed_with_the_last_app(tmp_path):
+    root = str(tmp_path)
+    shared = b"body { color: red }"
+    with SessionLocal() as db:
+        first = store_app_files(db, 9001, {"index.html": b"<h1>a</h1>", "app.css": shared}, root=root)
+        second = store_app_files(db, 9002, {"index.html": b"<h1>b</h1>", "app.css": shared}, root=root)
+        assert first["new_bytes"] == first["bytes"]
+        assert second["new_bytes"] == len(b"<h1>b</h1>")   # css already stored
+
+        css_digest = dict((p, d) for p, d, _ in app_files(db, 9001))["app.css"]
+        assert release_app(db, 9001, root=root) == len(b"<h1>a</h1>")
+        assert os.path.exists(blob_path(css_digest, root))   # still used by 9002
+
+        assert release_app(db, 9002, root=root) == len(shared) + len(b"<h1>b</h1>")
+        assert not os.path.exists(blob_path(css_digest, root))
+        assert app_files(db, 9002) == []
+
+
+def test_stream_zip_builds_a_valid_archive(tmp_path):
+    root = str(tmp_path)
+    files = {"index.html": b"<h1>hi</h1>", "assets/big.bin": os.urandom(200_000)}
+    with SessionLocal() as db:
+        store_app_files(db, 9003, files, root=root)
+        entries = app_files(db, 9003)
+    data = b"".join(stream_zip(entries, root=root))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert sorted(zf.namelist()) == sorted(files)
+        for name, body in files.items():
+            assert zf.read(name) == body
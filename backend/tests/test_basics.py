@@ -1,2 +1,8 @@
 def test_math():
     assert 1 + 1 == 2
+
+
+def test_async_url_swaps_driver():
+    from src.database import async_url
+    assert async_url("postgresql+psycopg2://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+    assert async_url("sqlite:////tmp/x.db") == "sqlite+aiosqlite:////tmp/x.db"
@@ -0,0 +1,23 @@
+from benchmarks.harness import compare, summarize
+
+
+def _report(p95: float, rate: float, errors: int = 0):
+    return {"scenarios": {"runs_burst": {"ops": {"POST /api/runs": {
+        **summarize([1.0] * 90 + [p95] * 10), "throughput_per_s": rate, "errors": errors}}}}}
+
+
+def test_summary_percentiles():
+    s = summarize([float(i) for i in range(1, 101)], wall_s=2.0)
+    assert s["count"] == 100 and s["p50_ms"] == 50.5 and s["p99_ms"] == 99.01
+    assert s["max_ms"] == 100.0 and s["throughput_per_s"] == 50.0
+
+
+def test_compare_flags_regressions_beyond_tolerance_and_noise():
+    base = _report(p95=20.0, rate=100.0)
+    assert not any(r["regressed"] for r in compare(_report(23.0, 90.0), base, tolerance=0.2))
+
+    rows = {r["metric"]: r for r in compare(_report(40.0, 50.0, errors=3), base, tolerance=0.2)}
+    assert rows["p95_ms"]["regressed"] and rows["throughput_per_s"]["regressed"]
+    assert rows["errors"]["regressed"]
+    # the median did not move
+    assert not rows["p50_ms"]["regressed"]
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "ml-trainer"))
+
+import callback_client  # noqa: E402
+from callback_client import CallbackClient  # noqa: E402
+
+
+class StubBackend(BaseHTTPRequestHandler):
+    # answers with server.status and records every request it sees
+    def _handle(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        self.server.seen.append((self.command, self.path, self.headers.get("Idempotency-Key"), body))
+        payload = json.dumps({"model_id": 1}).encode()
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_POST = do_PUT = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBackend)
+    server.status, server.seen = 200, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def client(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(callback_client, "BACKOFF", 0.001)
+    c = CallbackClient(f"http://127.0.0.1:{backend.server_port}", spill_dir=str(tmp_path),
+                       flush_interval=3600, max_retries=2)
+    yield c
+    c._closed = True
+    c._wake.set()
+
+
+def _titles(seen):
+    return [e["title"] for _, path, _, body in seen if path.endswith("events:batch") for e in body["events"]]
+
+
+def test_spilled_requests_replay_in_order_under_the_same_key(backend, client):
+    backend.status = 503
+    client.event(1, "info", "a")
+    client.flush()
+    keys = [key for _, _, key, _ in backend.seen]
+    assert len(keys) == 3 and len(set(keys)) == 1   # retried under one key, then spilled
+    assert client.spilled == 1
+
+    # still down: the spill is tried once, and new requests spill after one attempt
+    backend.seen.clear()
+    client.event(1, "info", "b")
+    client.flush()
+    assert _titles(backend.seen) == ["a", "b"]
+    with open(client.spill_path) as f:
+        assert [json.loads(line)["body"]["events"][0]["title"] for line in f] == ["a", "b"]
+
+    backend.status, backend.seen = 200, []
+    client.flush()
+    assert _titles(backend.seen) == ["a", "b"]
+    assert backend.seen[0][2] == keys[0]
+    assert client.replayed == 2
+    assert not [f for f in os.listdir(client.spill_dir) if f.startswith("spill-")]
+
+
+def test_rejected_requests_are_dropped(backend, client):
+    backend.status = 404
+    client.event(1, "info", "a")
+    client.flush()
+    assert len(backend.seen) == 1 and client.dropped == 1 and client.spilled == 0
+
+
+def test_completion_that_must_not_spill(backend, client):
+    backend.status = 503
+    assert client.complete(5, {"model_name": "m"}, spill=False, wait=0) is None
+    assert len(backend.seen) == 3 and client.spilled == 0
+
+    backend.status = 200
+    assert client.complete(5, {"model_name": "m"}, spill=False) == {"model_id": 1}
+    assert {key for _, _, key, _ in backend.seen} == {"complete-5"}
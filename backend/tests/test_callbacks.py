@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.event_writer import get_event_writer
+from src.models import Model, Run, RunEvent, RunStatus
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _new_run() -> int:
+    with SessionLocal() as db:
+        run = Run()
+        db.add(run)
+        db.commit()
+        return run.id
+
+
+def _titles(run_id: int):
+    get_event_writer().flush()
+    with SessionLocal() as db:
+        return [e.title for e in db.query(RunEvent).filter(RunEvent.run_id == run_id).order_by(RunEvent.id)]
+
+
+def test_event_retries_with_same_key_are_deduplicated():
+    run_id = _new_run()
+    for _ in range(3):
+        r = client.post(f"/api/runs/{run_id}/events", json={"title": "Step 1"},
+                        headers={"Idempotency-Key": "step-1"})
+        assert r.status_code == 202
+    client.post(f"/api/runs/{run_id}/events", json={"title": "no key"})
+    client.post(f"/api/runs/{run_id}/events", json={"title": "no key"})
+    assert _titles(run_id) == ["Step 1", "no key", "no key"]
+    assert client.post("/api/runs/999999/events", json={"title": "x"}).status_code == 404
+
+
+def test_metrics_are_merged_not_overwritten():
+    run_id = _new_run()
+    client.put(f"/api/runs/{run_id}/metrics", json={"metrics": {"step": 1, "loss": 0.7}})
+    client.put(f"/api/runs/{run_id}/metrics", json={"metrics": {"step": 2, "accuracy": 0.9}})
+    assert client.get(f"/api/runs/{run_id}").json()["metrics"] == {"step": 2, "loss": 0.7, "accuracy": 0.9}
+    assert client.put("/api/runs/999999/metrics", json={"metrics": {}}).status_code == 404
+
+
+def test_complete_registers_one_model():
+    run_id = _new_run()
+    body = {"model_name": f"model-run-{run_id}", "model_path": f"/models/run-{run_id}/model.bin"}
+    first = client.post(f"/api/runs/{run_id}/complete", json=body).json()
+    again = client.post(f"/api/runs/{run_id}/complete", json=body).json()
+    assert first == again
+    with SessionLocal() as db:
+        assert db.query(Model).filter(Model.run_id == run_id).count() == 1
+        assert db.get(Run, run_id).status == RunStatus.completed
+
+
+def test_fail_marks_the_run_failed_once():
+    run_id = _new_run()
+    r = client.post(f"/api/runs/{run_id}/fail", json={"status": "cancelled"})
+    assert r.status_code == 200 and r.json()["status"] == "failed"
+    client.post(f"/api/runs/{run_id}/fail", json={"error": "late report"})
+    assert _titles(run_id) == ["Run cancelled"]
+
+    done = _new_run()
+    client.post(f"/api/runs/{done}/complete", json={"model_name": "m", "model_path": "/models/m.bin"})
+    assert client.post(f"/api/runs/{done}/fail", json={"error": "boom"}).json()["status"] == "completed"
+    assert client.post(f"/api/runs/{run_id}/fail", json={"status": "lost"}).status_code == 422
@@ -0,0 +1,108 @@
+import os
+import time
+import uuid
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src import datasets
+from src.dataset_profile import QuantileSketch, build_profile, chunk_rows_for, get_profile
+from src.server.main import app
+
+
+def _ingest(text: str):
+    root = os.path.join(os.environ["MODELS_ROOT"], "incoming", uuid.uuid4().hex)
+    os.makedirs(root)
+    path = os.path.join(root, "p.csv")
+    with open(path, "w") as f:
+        f.write(text)
+    return path, datasets.ingest(path)
+
+
+def _sample(rows=20_000):
+    rng = np.random.default_rng(7)
+    a = rng.normal(10, 2, rows)
+    b = 3 * a + rng.normal(0, 1, rows)
+    k = rng.integers(0, 5, rows)
+    city = np.array(["oslo", "lima", "pune"])[rng.choice(3, rows, p=[0.6, 0.3, 0.1])]
+    lines = ["a,b,k,city"] + [f"{x:.6f},{'' if i % 100 == 0 else f'{y:.6f}'},{z},{c}"
+                              for i, (x, y, z, c) in enumerate(zip(a, b, k, city))]
+    return a, b, k, city, "\n".join(lines) + "\n"
+
+
+def test_profile_matches_exact_statistics():
+    a, b, k, city, text = _sample()
+    _, schema = _ingest(text)
+    prof = build_profile(schema, chunk_rows=3_000)
+    cols = {c["name"]: c for c in prof["columns"]}
+
+    pa = cols["a"]
+    assert pa["count"] == 20_000 and pa["nulls"] == 0
+    assert abs(pa["mean"] - a.mean()) < 1e-5 and abs(pa["std"] - a.std()) < 1e-5
+    assert abs(pa["min"] - a.min()) < 1e-5 and abs(pa["max"] - a.max()) < 1e-5
+    for q in (5, 50, 95):
+        exact = np.quantile(a, q / 100)
+        assert abs(np.mean(a <= pa["quantiles"][f"p{q}"]) - q / 100) < 0.01, (q, exact)
+    assert sum(pa["histogram"]["counts"]) == 20_000
+
+    assert cols["b"]["nulls"] == 200 and abs(cols["b"]["null_fraction"] - 0.01) < 1e-9
+    assert cols["k"]["distinct"] == 5 and cols["k"]["top_k_exact"]
+    assert sorted(t["count"] for t in cols["k"]["top_k"]) == sorted(np.bincount(k).tolist())
+    top = cols["city"]["top_k"]
+    assert [t["value"] for t in top] == ["oslo", "lima", "pune"]
+    assert [t["count"] for t in top] == [int((city == c).sum()) for c in ("oslo", "lima", "pune")]
+
+    names = prof["correlations"]["columns"]
+    r_ab = prof["correlations"]["matrix"][names.index("a")][names.index("b")]
+    keep = np.arange(len(a)) % 100 != 0
+    assert abs(r_ab - np.corrcoef(a[keep], b[keep])[0, 1]) < 1e-4
+
+
+def test_sketch_merges_many_chunks_within_rank_error():
+    rng = np.random.default_rng(1)
+    data = rng.exponential(size=500_000)
+    sketch = QuantileSketch(size=512)
+    for chunk in np.array_split(data, 200):
+        sketch.update(chunk)
+    for q, v in zip((0.1, 0.5, 0.9, 0.99), sketch.quantiles((0.1, 0.5, 0.9, 0.99))):
+        assert abs(np.mean(data <= v) - q) < 0.01
+
+
+def test_profile_is_cached_and_served_with_analyze_apps():
+    _, _, _, _, text = _sample(2_000)
+    path, schema = _ingest(text)
+    first = get_profile(schema)
+    assert get_profile(schema)["seconds"] == first["seconds"]   # read back, not rebuilt
+
+    client = TestClient(app)
+    assert client.get(f"/api/datasets/{schema['digest']}/profile").json()["rows"] == 2_000
+    body = client.post("/api/appgen/generate",
+                       json={"prompt": "Explore", "mode": "analyze", "dataset_url": path}).json()
+    deadline = time.time() + 10
+    while client.get(f"/api/appgen/apps/{body['app_id']}").json()["status"] == "building":
+        assert time.time() < deadline
+        time.sleep(0.02)
+    assert "profile.json" in client.get(body["preview_url"]).text
+    served = client.get(f"/api/apps/{body['app_id']}/files/profile.json").json()
+    assert served["digest"] == schema["digest"] and len(served["columns"]) == 4
+
+
+def test_wide_datasets_get_chunks_sized_by_a_memory_budget():
+    import tracemalloc
+    assert chunk_rows_for(5) == 262144
+    assert chunk_rows_for(500) * 500 * 8 * 6 <= 256 * 1024 ** 2
+
+    rng = np.random.default_rng(3)
+    wide = rng.normal(size=(10_000, 100))
+    text = ",".join(f"c{j}" for j in range(100)) + "\n" + "\n".join(",".join(f"{v:.3f}" for v in row) for row in wide)
+    _, schema = _ingest(text + "\n")
+    budget = 8 * 1024 ** 2
+    tracemalloc.start()
+    try:
+        prof = build_profile(schema, chunk_rows=chunk_rows_for(100, budget))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # one 10k-row chunk of 100 float64 columns would be ~8 MB per copy, ~48 MB in all
+    assert peak < 3 * budget
+    assert prof["columns"][0]["count"] == 10_000
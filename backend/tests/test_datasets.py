@@ -0,0 +1,151 @@
+import gzip
+import http.server
+import json
+import os
+import threading
+import uuid
+from functools import partial
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src import datasets
+from src.mlops.trainer import TrainConfig, train
+from src.server.main import app
+
+client = TestClient(app)
+
+CSV = (
+    "id,score,label,city,flag\n"
+    "1,0.5,yes,Oslo,true\n"
+    "2,,no,,false\n"
+    "3,2.25,yes,Lima,TRUE\n"
+    "4,1e3,no,Oslo,false\n"
+)
+
+
+def _local(name: str, text: str, compress: bool = False) -> str:
+    # local sources must sit under DATASET_LOCAL_ROOTS (MODELS_ROOT in tests)
+    root = os.path.join(os.environ["MODELS_ROOT"], "incoming", uuid.uuid4().hex)
+    os.makedirs(root)
+    path = os.path.join(root, name)
+    data = text.encode()
+    with open(path, "wb") as f:
+        f.write(gzip.compress(data) if compress else data)
+    return path
+
+
+def test_csv_is_typed_columnar_and_cached_by_content():
+    schema = datasets.ingest(_local("a.csv", CSV), chunk_rows=2)
+    assert not schema["cached"] and schema["rows"] == 4 and schema["format"] == "csv"
+    kinds = {c["name"]: (c["kind"], c["dtype"], c["nulls"]) for c in schema["columns"]}
+    assert kinds == {"id": ("int", "int64", 0), "score": ("float", "float64", 1),
+                     "label": ("string", "int32", 0), "city": ("string", "int32", 1),
+                     "flag": ("bool", "bool", 0)}
+
+    cols = datasets.load_columns(schema, ["score", "city"])
+    assert isinstance(cols["score"], np.memmap)
+    assert np.isnan(cols["score"][1]) and cols["score"][3] == 1000.0
+    assert datasets.categories(schema, "city") == ["Oslo", "Lima"]
+    assert datasets.read_rows(schema, 1, 2) == [
+        {"id": 2, "score": None, "label": "no", "city": None, "flag": False},
+        {"id": 3, "score": 2.25, "label": "yes", "city": "Lima", "flag": True},
+    ]
+
+    again = datasets.ingest(_local("copy.csv", CSV))
+    assert again["cached"] and again["digest"] == schema["digest"]
+
+
+def test_column_types_widen_across_chunks():
+    text = "v,w,empty\n1,true,\n2,false,\n3.5,,\n,1,\n007,x,\n"
+    schema = datasets.ingest(_local("widen.csv", text), chunk_rows=2)
+    by = {c["name"]: c for c in schema["columns"]}
+    assert (by["v"]["kind"], by["v"]["dtype"], by["v"]["nulls"]) == ("float", "float64", 1)
+    assert (by["w"]["kind"], by["w"]["nulls"]) == ("string", 1)
+    assert (by["empty"]["kind"], by["empty"]["nulls"]) == ("string", 5)
+    assert [r["v"] for r in datasets.read_rows(schema, 0, 10)] == [1.0, 2.0, 3.5, None, 7.0]
+    assert [r["w"] for r in datasets.read_rows(schema, 0, 10)] == ["true", "false", None, "1", "x"]
+    assert [r["empty"] for r in datasets.read_rows(schema, 0, 10)] == [None] * 5
+
+
+def test_jsonl_columns_appear_late_and_gzip_is_read():
+    lines = [json.dumps({"a": i, "b": "x"}) for i in range(3)] + [json.dumps({"a": 3.5, "c": [1, 2]})]
+    schema = datasets.ingest(_local("rows.jsonl.gz", "\n".join(lines) + "\n", compress=True), chunk_rows=2)
+    assert schema["format"] == "jsonl"
+    by = {c["name"]: c for c in schema["columns"]}
+    assert by["a"]["kind"] == "float" and by["b"]["nulls"] == 1 and by["c"]["nulls"] == 3
+    assert datasets.read_rows(schema, 3, 1) == [{"a": 3.5, "b": None, "c": "[1,2]"}]
+
+
+def test_remote_source_and_training_set(tmp_path):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(2000, 3))
+    y = (x @ [1.0, -2.0, 0.5] > 0)
+    lines = ["f1,f2,f3,target"] + [f"{a:.4f},{b:.4f},{'' if i % 50 == 0 else f'{c:.4f}'},{t}"
+                                    for i, ((a, b, c), t) in enumerate(zip(x, y))]
+    (tmp_path / "data.csv").write_text("\n".join(lines))
+    handler = partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        schema = datasets.ingest(f"http://127.0.0.1:{server.server_port}/data.csv")
+    finally:
+        server.shutdown()
+
+    path, features = datasets.training_set(schema, "target")
+    assert features == ["f1", "f2", "f3"]
+    result = train(path, TrainConfig(epochs=5, batch_size=128))
+    assert result["accuracy"] > 0.9
+    assert datasets.training_set(schema, "target") == (path, features)
+
+
+def test_string_target_mapping_does_not_depend_on_file_order():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=(1000, 2))
+    label = np.where(x[:, 0] - x[:, 1] > 0, "yes", "no")
+
+    def csv(order):
+        rows = [f"{a:.4f},{b:.4f},{t}" for (a, b), t in zip(x[order], label[order])]
+        return "f1,f2,churn\n" + "\n".join(rows)
+
+    yes_first = np.argsort(label != "yes", kind="stable")   # "yes" rows first
+    no_first = np.argsort(label != "no", kind="stable")
+    a = datasets.ingest(_local("a.csv", csv(yes_first)))
+    b = datasets.ingest(_local("b.csv", csv(no_first)))
+    assert datasets.categories(a, "churn") == ["yes", "no"] and datasets.categories(b, "churn") == ["no", "yes"]
+
+    for schema, order in ((a, yes_first), (b, no_first)):
+        path, _ = datasets.training_set(schema, "churn")
+        assert (np.load(os.path.join(path, "y.npy")) == (label[order] == "yes")).all()
+    flipped = datasets.target_labels(a, "churn", positive="no")
+    path, _ = datasets.training_set(a, "churn", labels=flipped)
+    assert flipped == ["yes", "no"] and (np.load(os.path.join(path, "y.npy")) == (label[yes_first] == "no")).all()
+
+    # evaluate on the other file reuses the train step's mapping
+    from src.agents.pipeline import parse_steps, run_pipeline
+    spec = {"steps": [
+        {"id": "train", "type": "train", "params": {"dataset_url": a["source"], "target": "churn",
+                                                    "positive": "no", "epochs": 5}},
+        {"id": "eval", "type": "evaluate", "params": {"dataset_url": b["source"]}, "depends_on": ["train"]},
+    ]}
+    out = run_pipeline(parse_steps(spec), max_parallel=1, executor="thread")
+    assert out["artifacts"]["train"]["dataset"]["labels"] == ["yes", "no"]
+    assert out["artifacts"]["eval"]["accuracy"] > 0.9
+
+
+def test_local_sources_are_confined():
+    with pytest.raises(datasets.DatasetError):
+        datasets.ingest("/etc/passwd")
+
+
+def test_dataset_api():
+    r = client.post("/api/datasets", json={"source": _local("api.csv", CSV.replace("Oslo", "Bergen"))})
+    assert r.status_code == 201, r.text
+    digest = r.json()["digest"]
+    assert client.get(f"/api/datasets/{digest}").json()["rows"] == 4
+    page = client.get(f"/api/datasets/{digest}/rows", params={"offset": 3, "limit": 5}).json()
+    assert page["total"] == 4 and page["rows"][0]["city"] == "Bergen"
+    assert any(d["digest"] == digest for d in client.get("/api/datasets").json())
+    assert client.get("/api/datasets/" + "0" * 64).status_code == 404
+    assert client.post("/api/datasets", json={"source": "/etc/hosts"}).status_code == 400
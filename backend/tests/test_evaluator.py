@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.agents.pipeline import parse_steps, run_metrics, run_pipeline
+from src.mlops.evaluator import evaluate
+from src.mlops.trainer import TrainConfig, make_synthetic, open_dataset, train
+
+
+def _exact_auc(y, p):
+    pos, neg = p[y >= 0.5], p[y < 0.5]
+    greater = (pos[:, None] > neg[None, :]).sum() + 0.5 * (pos[:, None] == neg[None, :]).sum()
+    return greater / (len(pos) * len(neg))
+
+
+def test_streaming_metrics_match_a_full_pass(tmp_path):
+    model = train(make_synthetic(str(tmp_path / "train"), rows=10_000, features=6, seed=4),
+                  TrainConfig(epochs=3, batch_size=512))["model"]
+    test = make_synthetic(str(tmp_path / "test"), rows=3_000, features=6, seed=4, sample_seed=1)
+    m = evaluate(test, model, chunk_rows=257, auc_bins=100_000)
+
+    X, y = open_dataset(test)
+    z = ((np.asarray(X) - model["mean"]) / model["std"]) @ model["weights"][:-1] + model["weights"][-1]
+    p = 1 / (1 + np.exp(-z))
+    pred, pos = p >= 0.5, y >= 0.5
+    tp, fp = int((pred & pos).sum()), int((pred & ~pos).sum())
+    fn, tn = int((~pred & pos).sum()), int((~pred & ~pos).sum())
+    assert m["confusion_matrix"] == [[tn, fp], [fn, tp]]
+    assert m["rows"] == 3_000
+    assert abs(m["accuracy"] - (tp + tn) / 3_000) < 1e-6
+    assert abs(m["precision"] - tp / (tp + fp)) < 1e-6
+    assert abs(m["recall"] - tp / (tp + fn)) < 1e-6
+    assert abs(m["auc"] - _exact_auc(np.asarray(y), p)) < 1e-3
+    assert m["accuracy"] > 0.85
+
+
+def test_sharded_evaluation_matches_inline(tmp_path):
+    data = make_synthetic(str(tmp_path / "d"), rows=8_000, features=4, task="linear", seed=5)
+    model = train(data, TrainConfig(model="linear", epochs=3, batch_size=256, lr=0.05))["model"]
+    inline = evaluate(data, model, chunk_rows=1_000, workers=0)
+    sharded = evaluate(data, model, chunk_rows=1_000, workers=3)
+    assert inline["shards"] == 1 and sharded["shards"] == 3
+    for k in ("rows", "mse", "mae", "r2"):
+        assert abs(inline[k] - sharded[k]) < 1e-6
+    assert inline["r2"] > 0.9
+
+
+def test_pipeline_evaluates_the_trained_model():
+    steps = parse_steps({"steps": [
+        {"id": "fit", "type": "train", "params": {"rows": 5_000, "features": 5, "epochs": 2}, "depends_on": []},
+        {"id": "eval", "type": "evaluate", "params": {"rows": 2_000}, "depends_on": ["fit"]},
+    ]})
+    result = run_pipeline(steps)
+    metrics = run_metrics(steps, result["artifacts"])
+    assert metrics["evaluation"]["eval"]["rows"] == 2_000
+    assert metrics["evaluation"]["eval"]["accuracy"] > 0.8
@@ -0,0 +1,64 @@
+import os
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from src import event_archive
+from src.database import SessionLocal
+from src.models import Run, RunEvent, RunEventArchive, RunStatus, utcnow_naive
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _old_run(status: RunStatus, n: int = 5) -> int:
+    # a run whose events are all 40 days old
+    old = utcnow_naive() - timedelta(days=40)
+    with SessionLocal() as db:
+        run = Run(status=status)
+        db.add(run)
+        db.flush()
+        for i in range(n):
+            db.add(RunEvent(run_id=run.id, ts=old + timedelta(seconds=i), level="info", title=f"Step {i}"))
+        db.commit()
+        return run.id
+
+
+def test_archive_moves_old_events_of_finished_runs(tmp_path):
+    done = _old_run(RunStatus.completed)
+    running = _old_run(RunStatus.running)
+    summary = event_archive.archive_pass(SessionLocal, root=str(tmp_path))
+    assert summary["runs"] >= 1 and summary["events"] >= 5
+    with SessionLocal() as db:
+        assert db.scalar(select(RunEvent.id).where(RunEvent.run_id == done)) is None
+        assert len(db.scalars(select(RunEvent).where(RunEvent.run_id == running)).all()) == 5
+        chunks = db.scalars(select(RunEventArchive).where(RunEventArchive.run_id == done)).all()
+    assert [c.count for c in chunks] == [5]
+    assert os.path.exists(os.path.join(str(tmp_path), chunks[0].segment))
+    docs = event_archive.read_archived(chunks, 0, root=str(tmp_path))
+    assert [d["title"] for d in docs] == [f"Step {i}" for i in range(5)]
+    # a second pass has nothing left to do for that run
+    assert event_archive.archive_pass(SessionLocal, root=str(tmp_path))["events"] == 0
+
+
+def test_replay_and_rest_stitch_archived_and_live_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_archive, "ARCHIVE_DIR", str(tmp_path))
+    run_id = _old_run(RunStatus.completed)
+    event_archive.archive_pass(SessionLocal)
+    with SessionLocal() as db:
+        db.add(RunEvent(run_id=run_id, level="info", title="Late note"))
+        db.commit()
+
+    resp = client.get(f"/api/runs/{run_id}/events", params={"limit": 4})
+    assert resp.status_code == 200
+    first = resp.json()
+    rest = client.get(f"/api/runs/{run_id}/events",
+                      params={"after": resp.headers["X-Next-Cursor"], "limit": 4})
+    assert "X-Next-Cursor" not in rest.headers
+    events = first + rest.json()
+    assert [e["title"] for e in events] == [f"Step {i}" for i in range(5)] + ["Late note"]
+
+    with client.websocket_connect(f"/ws/runs/{run_id}") as ws:
+        replayed = [ws.receive_json() for _ in range(6)]
+    assert replayed == events
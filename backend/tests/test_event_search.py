@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.event_search import _terms
+from src.models import Run, RunEvent, RunStatus, utcnow_naive
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _run_with_events(events) -> int:
+    with SessionLocal() as db:
+        run = Run(status=RunStatus.failed)
+        db.add(run)
+        db.flush()
+        for level, title, detail, ts in events:
+            db.add(RunEvent(run_id=run.id, level=level, title=title, detail=detail, ts=ts))
+        db.commit()
+        return run.id
+
+
+def test_search_filters_highlights_and_pages():
+    now = utcnow_naive()
+    run_id = _run_with_events(
+        [("error", "Step train failed", f"RuntimeError: CUDA out of memory <batch {i}>", now - timedelta(minutes=i))
+         for i in range(5)]
+        + [("info", "CUDA device ready", None, now),
+           ("error", "Old CUDA failure", "out of memory", now - timedelta(days=10))]
+    )
+    params = {"q": 'cuda "out of memory"', "run_id": run_id, "level": "error",
+              "since": (now - timedelta(days=1)).isoformat() + "Z", "limit": 3}
+    resp = client.get("/api/events/search", params=params)
+    assert resp.status_code == 200
+    first = resp.json()
+    assert len(first) == 3
+    assert "<mark>CUDA</mark>" in first[0]["highlight"]
+    assert "&lt;batch" in first[0]["highlight"]   # event text is escaped, only <mark> is markup
+    rest = client.get("/api/events/search", params={**params, "after": resp.headers["X-Next-Cursor"]})
+    assert "X-Next-Cursor" not in rest.headers
+    hits = first + rest.json()
+    assert len(hits) == 5 and len({h["id"] for h in hits}) == 5
+    assert all(h["level"] == "error" and h["run_id"] == run_id for h in hits)
+
+    excluded = client.get("/api/events/search", params={"q": "cuda -memory", "run_id": run_id}).json()
+    assert [h["title"] for h in excluded] == ["CUDA device ready"]
+    assert client.get("/api/events/search", params={"q": "cuda", "after": "nope"}).status_code == 400
+
+
+def test_fallback_query_terms():
+    assert _terms('CUDA "out of memory" -warning or oom') == (["cuda", "out of memory", "oom"], ["warning"])
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from src.database import SessionLocal, engine
+from src.event_writer import EventWriter, event_row, get_event_writer
+from src.models import Run, RunEvent
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _new_run() -> int:
+    with SessionLocal() as db:
+        run = Run()
+        db.add(run)
+        db.commit()
+        return run.id
+
+
+def _count(run_id: int) -> int:
+    with SessionLocal() as db:
+        return db.query(RunEvent).filter(RunEvent.run_id == run_id).count()
+
+
+def test_flush_writes_everything_in_one_commit():
+    run_id = _new_run()
+    # batch_size is only the INSERT chunk size here; the flusher thread never fires
+    writer = EventWriter(SessionLocal, batch_size=100, flush_interval=60, max_pending=10_000)
+    writer.write_rows(event_row(run_id, f"e{i}") for i in range(99))
+    commits = []
+    listener = lambda conn: commits.append(1)
+    event.listen(engine, "commit", listener)
+    try:
+        writer.write_rows(event_row(run_id, f"f{i}") for i in range(151))
+        writer.flush()
+    finally:
+        event.remove(engine, "commit", listener)
+        writer.close()
+    assert len(commits) == 1
+    assert _count(run_id) == 250
+
+
+def test_background_flush_on_interval_and_long_values_are_clipped():
+    run_id = _new_run()
+    writer = EventWriter(SessionLocal, batch_size=1000, flush_interval=0.05)
+    writer.write(run_id, "x" * 500, "y" * 10_000)
+    deadline = time.time() + 2
+    while _count(run_id) == 0 and time.time() < deadline:
+        time.sleep(0.02)
+    writer.close()
+    with SessionLocal() as db:
+        ev = db.query(RunEvent).filter(RunEvent.run_id == run_id).one()
+        assert len(ev.title) == 200 and len(ev.detail) == 4000
+
+
+def test_back_pressure_blocks_until_drained():
+    run_id = _new_run()
+    writer = EventWriter(SessionLocal, batch_size=10, flush_interval=0.05, max_pending=10)
+    done = threading.Event()
+
+    def produce():
+        for i in range(100):
+            writer.write(run_id, f"e{i}")
+        done.set()
+
+    t = threading.Thread(target=produce)
+    t.start()
+    t.join(timeout=5)
+    assert done.is_set()
+    assert writer.pending() <= 10
+    writer.close()
+    assert _count(run_id) == 100
+
+
+def test_batch_endpoint():
+    run_id = _new_run()
+    r = client.post(f"/api/runs/{run_id}/events:batch",
+                    json={"events": [{"title": f"line {i}"} for i in range(20)]})
+    assert r.status_code == 202 and r.json() == {"accepted": 20}
+    get_event_writer().flush()
+    assert _count(run_id) == 20
+    assert client.post("/api/runs/999999/events:batch", json={"events": []}).status_code == 404
+
+
+def test_rejected_rows_are_isolated_from_the_rest_of_the_batch():
+    run_id = _new_run()
+    writer = EventWriter(SessionLocal, batch_size=100, flush_interval=60)
+    rows = [event_row(run_id, f"e{i}") for i in range(50)]
+    rows[17] = {**rows[17], "title": None}   # NOT NULL violation
+    writer.write_rows(rows)
+    assert writer.flush() == 49
+    writer.close()
+    assert _count(run_id) == 49
+
+
+def test_transient_failures_back_off_and_keep_the_batch():
+    from sqlalchemy.exc import OperationalError
+    run_id = _new_run()
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) <= 2:
+            raise OperationalError("connect", {}, Exception("db down"))
+        return SessionLocal()
+
+    writer = EventWriter(flaky, batch_size=10, flush_interval=0.05)
+    writer.write_rows(event_row(run_id, f"e{i}") for i in range(30))
+    deadline = time.time() + 5
+    while _count(run_id) < 30 and time.time() < deadline:
+        time.sleep(0.02)
+    writer.close()
+    assert _count(run_id) == 30
+    # a full buffer did not retry immediately: each retry waited out the backoff
+    assert calls[1] - calls[0] >= 0.04 and calls[2] - calls[1] >= 0.09
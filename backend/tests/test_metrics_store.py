@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.metrics_store import query_series, record_series
+from src.models import Run
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _new_run() -> int:
+    with SessionLocal() as db:
+        run = Run()
+        db.add(run)
+        db.commit()
+        return run.id
+
+
+def test_put_metrics_keeps_step_history():
+    run_id = _new_run()
+    for i in range(1, 4):
+        client.put(f"/api/runs/{run_id}/metrics",
+                   json={"metrics": {"step": i, "accuracy": 0.7 + i / 10, "loss": 1.0 / i, "note": "x"}})
+    body = client.get(f"/api/runs/{run_id}/metrics").json()
+    assert body["bucket_size"] == 1
+    assert body["series"]["loss"]["step"] == [1, 2, 3]
+    assert body["series"]["loss"]["last"] == [1.0, 0.5, 1.0 / 3]
+    assert set(body["series"]) == {"accuracy", "loss"}
+
+
+def test_downsampling_min_max_last():
+    run_id = _new_run()
+    steps = list(range(100))
+    with SessionLocal() as db:
+        record_series(db, run_id, steps, {"loss": [float(s) for s in steps]})
+        # retrying the same steps is a no-op
+        record_series(db, run_id, steps[:10], {"loss": [-1.0] * 10})
+        db.commit()
+        out = query_series(db, run_id, ["loss"], from_step=0, max_points=10)
+    s = out["series"]["loss"]
+    assert out["bucket_size"] == 10
+    assert s["step"] == list(range(9, 100, 10))
+    assert s["min"] == [float(b * 10) for b in range(10)]
+    assert s["max"] == s["last"] == [float(b * 10 + 9) for b in range(10)]
+
+
+def test_columnar_batch_endpoint():
+    run_id = _new_run()
+    r = client.post(f"/api/runs/{run_id}/metrics:batch",
+                    json={"steps": [1, 2, 3], "series": {"loss": [0.9, None, 0.5]}})
+    assert r.json() == {"accepted": 2}
+    body = client.get(f"/api/runs/{run_id}/metrics?keys=loss&from_step=2").json()
+    assert body["series"]["loss"]["step"] == [3]
+    bad = client.post(f"/api/runs/{run_id}/metrics:batch", json={"steps": [1], "series": {"loss": [1, 2]}})
+    assert bad.status_code == 422
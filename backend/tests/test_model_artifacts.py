@@ -0,0 +1,103 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.models import Run
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _remote_model() -> int:
+    with SessionLocal() as db:
+        run = Run()
+        db.add(run)
+        db.commit()
+        run_id = run.id
+    r = client.post(f"/api/runs/{run_id}/complete", json={"model_name": f"remote-{run_id}"})
+    return r.json()["model_id"]
+
+
+def test_parts_upload_in_parallel_resume_and_assemble():
+    model_id = _remote_model()
+    data = os.urandom(3 * 100_000 + 123)
+    chunks = [data[i:i + 100_000] for i in range(0, len(data), 100_000)]
+
+    def put(n):
+        body = chunks[n - 1]
+        return client.post(f"/api/models/{model_id}/parts", params={"part_number": n}, content=body,
+                           headers={"X-Part-SHA256": hashlib.sha256(body).hexdigest()})
+
+    # parts arrive out of order and concurrently; part 3 is still missing
+    with ThreadPoolExecutor(3) as pool:
+        assert all(r.status_code == 201 for r in pool.map(put, [4, 2, 1]))
+    r = client.post(f"/api/models/{model_id}/parts:complete", json={"parts": 4})
+    assert r.status_code == 409 and r.json()["detail"]["missing"] == [3]
+
+    # resume: only the missing part is sent again
+    listed = client.get(f"/api/models/{model_id}/parts").json()
+    assert [p["part_number"] for p in listed["parts"]] == [1, 2, 4]
+    assert put(3).status_code == 201
+
+    r = client.post(f"/api/models/{model_id}/parts:complete",
+                    json={"parts": 4, "sha256": hashlib.sha256(data).hexdigest()})
+    assert r.status_code == 200 and r.json()["size_bytes"] == len(data)
+    assert client.get(f"/api/models/{model_id}/download").content == data
+    # a repeated complete is a no-op
+    assert client.post(f"/api/models/{model_id}/parts:complete", json={}).json()["sha256"] == r.json()["sha256"]
+
+
+def test_corrupt_part_is_rejected():
+    model_id = _remote_model()
+    r = client.post(f"/api/models/{model_id}/parts", params={"part_number": 1}, content=b"abc",
+                    headers={"X-Part-SHA256": "0" * 64})
+    assert r.status_code == 400
+    assert client.get(f"/api/models/{model_id}/parts").json()["parts"] == []
+
+
+def test_part_body_is_streamed_without_a_db_connection_checked_out(monkeypatch):
+    import asyncio
+    from src.database import async_engine
+    from src.server import model_artifacts
+
+    model_id = _remote_model()
+    pool, seen = async_engine.sync_engine.pool, []
+    real_to_thread = asyncio.to_thread
+
+    async def to_thread(fn, *args, **kw):
+        seen.append(pool.checkedout())
+        return await real_to_thread(fn, *args, **kw)
+
+    # every chunk is written through to_thread: record the pool state at each write
+    monkeypatch.setattr(model_artifacts.asyncio, "to_thread", to_thread)
+    r = client.post(f"/api/models/{model_id}/parts", params={"part_number": 1}, content=b"x" * 1000)
+    assert r.status_code == 201
+    assert seen and set(seen) == {0}
+
+
+def test_assembly_runs_without_a_lock_or_connection(monkeypatch):
+    from src.database import async_engine
+    from src.server import model_artifacts
+
+    model_id = _remote_model()
+    assert client.post(f"/api/models/{model_id}/parts", params={"part_number": 1}, content=b"y" * 1000).status_code == 201
+    pool, seen = async_engine.sync_engine.pool, []
+    real_assemble = model_artifacts.assemble
+
+    def assemble(parts, dest, **kw):
+        # meanwhile: no connection held, other completes and part uploads are turned away
+        seen.append(pool.checkedout())
+        seen.append(client.post(f"/api/models/{model_id}/parts:complete", json={}).status_code)
+        seen.append(client.post(f"/api/models/{model_id}/parts", params={"part_number": 2}, content=b"z").status_code)
+        return real_assemble(parts, dest, **kw)
+
+    monkeypatch.setattr(model_artifacts, "assemble", assemble)
+    r = client.post(f"/api/models/{model_id}/parts:complete", json={"sha256": "0" * 64})
+    assert r.status_code == 400 and seen == [0, 409, 409]
+
+    # a failed assembly clears the mark, so the client can complete again
+    r = client.post(f"/api/models/{model_id}/parts:complete", json={"parts": 1})
+    assert r.status_code == 200 and r.json()["size_bytes"] == 1000
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.models import Run, RunStatus
+from src.models_app import App
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def test_runs_keyset_pages_cover_everything_once():
+    with SessionLocal() as db:
+        db.add_all([Run(status=RunStatus.failed) for _ in range(7)])
+        db.commit()
+    seen, after = [], None
+    while True:
+        params = {"limit": 3, "status": "failed"}
+        if after:
+            params["after"] = after
+        r = client.get("/api/runs", params=params)
+        rows = r.json()
+        assert all(row["status"] == "failed" for row in rows)
+        seen += [row["id"] for row in rows]
+        after = r.headers.get("x-next-cursor")
+        if not after:
+            break
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == len(set(seen)) >= 7
+
+
+def test_apps_list_filters_and_projects():
+    with SessionLocal() as db:
+        db.add_all([App(name=f"a{i}", template="t-page", status="ready") for i in range(3)])
+        db.commit()
+    r = client.get("/api/apps", params={"template": "t-page", "limit": 2})
+    assert r.status_code == 200
+    assert len(r.json()) == 2 and {a["template"] for a in r.json()} == {"t-page"}
+    assert "meta" not in r.json()[0]
+    nxt = client.get("/api/apps", params={"template": "t-page", "after": r.headers["x-next-cursor"]})
+    assert len(nxt.json()) == 1 and "x-next-cursor" not in nxt.headers
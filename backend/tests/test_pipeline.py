@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.agents.pipeline import PipelineError, StepContext, parse_steps, register_step, run_pipeline
+from src.server.main import app
+
+client = TestClient(app)
+
+
+@register_step("test-add")
+def _add(ctx: StepContext):
+    return ctx.step.params.get("n", 0) + sum(v for v in ctx.inputs.values() if v)
+
+
+def test_legacy_specs_run_as_a_chain():
+    steps = parse_steps({"steps": [{"type": "noop"}, {"type": "noop"}, {"type": "noop"}]})
+    assert [s.depends_on for s in steps] == [[], ["step1"], ["step2"]]
+
+
+def test_independent_steps_run_concurrently_and_pass_artifacts():
+    spec = {"steps": [
+        {"id": "a", "type": "sleep", "params": {"seconds": 0.2}, "depends_on": []},
+        {"id": "b", "type": "sleep", "params": {"seconds": 0.2}, "depends_on": []},
+        {"id": "c", "type": "sleep", "params": {"seconds": 0.2}, "depends_on": []},
+        {"id": "x", "type": "test-add", "params": {"n": 1}, "depends_on": []},
+        {"id": "y", "type": "test-add", "params": {"n": 2}, "depends_on": ["x", "a", "b", "c"]},
+    ]}
+    titles = []
+    t0 = time.perf_counter()
+    out = run_pipeline(parse_steps(spec), emit=lambda title, detail=None, level="info": titles.append(title),
+                       max_parallel=4)
+    assert time.perf_counter() - t0 < 0.5
+    assert out["artifacts"]["y"] == 3
+    assert titles.index("Step y started") > titles.index("Step x done")
+    assert titles[-1] == "Pipeline finished"
+
+
+def test_invalid_dags_are_rejected():
+    with pytest.raises(PipelineError, match="cycle"):
+        parse_steps({"steps": [{"id": "a", "type": "noop", "depends_on": ["b"]},
+                               {"id": "b", "type": "noop", "depends_on": ["a"]}]})
+    with pytest.raises(PipelineError, match="unknown type"):
+        parse_steps({"steps": [{"type": "nope"}]})
+    r = client.post("/api/runs", json={"pipeline": {"steps": [{"type": "noop", "depends_on": ["ghost"]}]}})
+    assert r.status_code == 422
+
+
+def test_failing_step_stops_the_pipeline():
+    @register_step("test-boom")
+    def _boom(ctx):
+        raise RuntimeError("boom")
+
+    spec = {"steps": [{"id": "a", "type": "test-boom", "depends_on": []},
+                      {"id": "b", "type": "noop", "depends_on": ["a"]}]}
+    with pytest.raises(PipelineError, match="step a failed"):
+        run_pipeline(parse_steps(spec))
@@ -0,0 +1,142 @@
+import hashlib
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from src.agents import planner as planner_module
+from src.agents.planner import HashEmbedder, Planner, RulePlanner, entities, normalize
+from src.database import SessionLocal
+from src.models import PlanCacheEntry, Run, RunEvent, Workflow
+from src.server.main import app
+
+client = TestClient(app)
+
+
+class CountingPlanner(RulePlanner):
+    def __init__(self):
+        self.calls = 0
+
+    def plan(self, prompt):
+        self.calls += 1
+        return super().plan(prompt)
+
+
+def test_near_duplicate_prompt_reuses_the_cached_plan():
+    inner = CountingPlanner()
+    planner = Planner(planner=inner, embedder=HashEmbedder(), min_similarity=0.8)
+    with SessionLocal() as db:
+        spec, info = planner.plan_prompt(db, "Train a logistic classifier for 7 epochs with a learning rate of 0.3")
+        assert info["source"] == "planner" and inner.calls == 1
+        assert spec["steps"][0]["params"] == {"model": "logistic", "epochs": 7, "lr": 0.3}
+        assert [s["type"] for s in spec["steps"]] == ["train", "evaluate"]
+
+        again, info = planner.plan_prompt(db, "train a  logistic classifier for 7 epochs with a learning rate of 0.3")
+        assert info["source"] == "exact" and again == spec
+
+        again, info = planner.plan_prompt(db, "Please train a logistic classifier, 7 epochs, learning rate of 0.3")
+        assert info["source"] == "semantic" and info["similarity"] >= 0.8 and again == spec
+        assert inner.calls == 1
+
+        # same wording, different literals: never served from the cache
+        other, info = planner.plan_prompt(db, "Train a logistic classifier for 9 epochs with a learning rate of 0.3")
+        assert info["source"] == "planner" and inner.calls == 2
+        assert other["steps"][0]["params"]["epochs"] == 9
+
+    stats = planner.stats()
+    assert stats["requests"] == 4 and stats["exact_hits"] == 1 and stats["semantic_hits"] == 1
+    assert stats["misses"] == 2 and stats["hit_rate"] == 0.5
+
+
+class FlakyPlanner(RulePlanner):
+    # stands in for the remote planner; fails while `down`
+    name = "flaky-v1"
+
+    def __init__(self):
+        self.down, self.calls = True, 0
+
+    def plan(self, prompt):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("planner unavailable")
+        return super().plan(prompt)
+
+
+def test_fallback_plans_are_not_cached():
+    primary = FlakyPlanner()
+    planner = Planner(planner=primary, embedder=HashEmbedder(), min_similarity=0.8)
+    prompt = "Train a linear model for 4 epochs with a learning rate of 0.05"
+    with SessionLocal() as db:
+        spec, info = planner.plan_prompt(db, prompt)
+        assert info["source"] == "planner" and info["planner"] == "rules-v1" and info["cached"] is False
+        _, info = planner.plan_prompt(db, prompt)
+        assert info["source"] == "planner" and primary.calls == 2
+
+        # a degraded plan cached before the fix is replaced once the planner is back
+        norm = normalize(prompt)
+        planner.cache.put(db, prompt, hashlib.sha256(norm.encode()).hexdigest(), entities(prompt),
+                          planner.cache.embedder.embed(norm), spec, "rules-v1")
+        primary.down = False
+        _, info = planner.plan_prompt(db, prompt)
+        assert info["source"] == "planner" and info["planner"] == "flaky-v1" and primary.calls == 3
+        _, info = planner.plan_prompt(db, prompt)
+        assert info["source"] == "exact" and primary.calls == 3
+        rows = db.scalars(select(PlanCacheEntry.planner).where(PlanCacheEntry.prompt == prompt)).all()
+    assert rows == ["flaky-v1"]
+    assert planner.stats()["planner_errors"] == 2
+
+
+def test_semantic_hits_keep_the_target_column():
+    planner = Planner(planner=RulePlanner(), embedder=HashEmbedder(), min_similarity=0.8)
+    with SessionLocal() as db:
+        churn, _ = planner.plan_prompt(db, "train a classifier on /models/data.csv to predict churn for 5 epochs")
+        tenure, info = planner.plan_prompt(db, "train a classifier on /models/data.csv to predict tenure for 5 epochs")
+    assert churn["steps"][0]["params"]["target"] == "churn"
+    assert info["source"] == "planner" and tenure["steps"][0]["params"]["target"] == "tenure"
+
+
+class DownEmbedder(HashEmbedder):
+    name = "down-v1"
+
+    def embed(self, text_):
+        raise ConnectionError("embeddings unavailable")
+
+
+def test_embedder_outage_plans_without_the_cache(monkeypatch):
+    planner = Planner(planner=RulePlanner(), embedder=DownEmbedder())
+    with SessionLocal() as db:
+        spec, info = planner.plan_prompt(db, "train logistic for 3 epochs")
+    assert info["source"] == "planner" and info["cached"] is False
+    assert spec["steps"][0]["params"]["epochs"] == 3
+    assert planner.stats()["embedder_errors"] == 1
+
+    monkeypatch.setattr(planner_module, "_planner", planner)
+    r = client.post("/api/chat/start-train", json={"prompt": "train logistic for 3 epochs"})
+    assert r.status_code == 200
+
+
+def test_rule_planner_reads_dataset_target_and_skips_eval():
+    spec = RulePlanner().plan("Fit a linear regression on https://example.com/houses.csv to predict price, no eval")
+    assert spec["steps"] == [{"id": "train", "type": "train", "depends_on": [],
+                              "params": {"dataset_url": "https://example.com/houses.csv", "target": "price",
+                                         "model": "linear"}}]
+    assert entities("predict 'x' from a.csv") == entities("from a.csv predict 'x'")
+    assert entities("train for 5 epochs") != entities("train for 50 epochs")
+
+
+def test_start_train_queues_a_planned_pipeline():
+    r = client.post("/api/chat/start-train", json={"prompt": "train logistic on 3000 rows for 2 epochs"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["plan"]["source"] in ("planner", "exact", "semantic")
+    assert body["pipeline"]["steps"][0]["params"] == {"model": "logistic", "rows": 3000, "epochs": 2}
+
+    with SessionLocal() as db:
+        run = db.get(Run, body["run_id"])
+        assert db.get(Workflow, run.workflow_id).pipeline_spec == body["pipeline"]
+        titles = db.execute(select(RunEvent.title).where(RunEvent.run_id == run.id).order_by(RunEvent.id)).scalars().all()
+        assert titles == ["Run queued", "Pipeline planned"]
+
+    r = client.post("/api/chat/start-train", json={"prompt": "Train logistic on 3000 rows for 2 epochs"})
+    assert r.json()["plan"]["source"] == "exact"
+    stats = client.get("/api/planner/stats").json()
+    assert stats["cached_plans"] >= 1 and stats["lifetime_hits"] >= 1 and stats["hit_rate"] is not None
@@ -0,0 +1,53 @@
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.server import static_files
+from src.server.static_files import send_file
+
+
+def _client(path, media_type):
+    app = FastAPI()
+
+    @app.get("/f")
+    def f(request: Request):
+        return send_file(request, path, media_type)
+
+    return TestClient(app)
+
+
+def test_small_files_are_cached_compressed_and_revalidated(tmp_path):
+    page = tmp_path / "index.html"
+    page.write_text("<p>hello</p>" * 500)
+    client = _client(str(page), "text/html")
+    static_files.cache.clear()
+
+    r = client.get("/f", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and r.headers["content-encoding"] == "gzip"
+    assert r.text == page.read_text()   # client decodes
+    hits = static_files.cache.hits
+    r2 = client.get("/f", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r2.headers and static_files.cache.hits == hits + 1
+
+    assert client.get("/f", headers={"If-None-Match": r2.headers["etag"]}).status_code == 304
+    assert client.get("/f", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert client.get("/f", headers={"If-Modified-Since": r2.headers["last-modified"]}).status_code == 304
+
+    os.utime(page, ns=(0, os.stat(page).st_mtime_ns + 10**9))   # changed file: new key, new etag
+    r3 = client.get("/f", headers={"If-None-Match": r2.headers["etag"]})
+    assert r3.status_code == 200 and r3.headers["etag"] != r2.headers["etag"]
+
+
+def test_large_files_support_range_requests(tmp_path):
+    blob = tmp_path / "model.bin"
+    data = os.urandom(static_files.CACHE_MAX_FILE + 4096)
+    blob.write_bytes(data)
+    client = _client(str(blob), "application/octet-stream")
+
+    r = client.get("/f", headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206
+    assert r.content == data[100:200]
+    assert r.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    assert client.get("/f", headers={"Range": f"bytes={len(data) + 10}-"}).status_code == 416
+    assert client.get("/f").content == data
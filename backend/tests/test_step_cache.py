@@ -0,0 +1,80 @@
+import os
+
+from src.agents.pipeline import StepContext, parse_steps, register_step, run_pipeline
+from src.agents.step_cache import StepCache
+from src.database import SessionLocal
+from src.models import StepCacheEntry
+
+calls = []
+
+
+@register_step("test-square")
+def _square(ctx: StepContext):
+    calls.append(ctx.step.id)
+    upstream = sum(ctx.inputs.values())
+    return ctx.step.params["n"] ** 2 + upstream
+
+
+SPEC = {"steps": [
+    {"id": "a", "type": "test-square", "params": {"n": 3}},
+    {"id": "b", "type": "test-square", "params": {"n": 4}},
+]}
+
+
+def test_second_run_hits_cache_until_params_change(tmp_path):
+    cache = StepCache(SessionLocal, root=str(tmp_path))
+    calls.clear()
+    first = run_pipeline(parse_steps(SPEC), cache=cache)
+    titles = []
+    second = run_pipeline(parse_steps(SPEC), cache=cache,
+                          emit=lambda title, detail=None, level="info": titles.append(title))
+    assert calls == ["a", "b"]
+    assert second["cache_hits"] == ["a", "b"]
+    assert second["artifacts"] == first["artifacts"] == {"a": 9, "b": 25}
+    assert "Step a cache hit" in titles
+
+    # changing the first step changes its output, so the downstream key changes too
+    changed = {"steps": [dict(SPEC["steps"][0], params={"n": 5}), SPEC["steps"][1]]}
+    out = run_pipeline(parse_steps(changed), cache=cache)
+    assert calls == ["a", "b", "a", "b"] and out["artifacts"]["b"] == 41
+
+    run_pipeline(parse_steps(SPEC), cache=cache, force=True)
+    assert calls[-2:] == ["a", "b"]
+
+
+def test_lru_eviction_respects_byte_budget(tmp_path):
+    cache = StepCache(SessionLocal, root=str(tmp_path), max_bytes=2500)
+    for i in range(5):
+        cache.put(f"{i:064d}", "test", b"x" * 1000)
+    with SessionLocal() as db:
+        keys = [k for (k,) in db.query(StepCacheEntry.key).filter(StepCacheEntry.step_type == "test")]
+    assert sorted(keys) == [f"{3:064d}", f"{4:064d}"]
+    assert not os.path.exists(cache._path(f"{0:064d}"))
+    assert cache.get(f"{4:064d}")[0]
+
+
+def test_changed_data_behind_the_same_params_is_a_miss(tmp_path):
+    from src.mlops.trainer import make_synthetic
+    cache = StepCache(SessionLocal, root=str(tmp_path / "cache"))
+    root = os.path.join(os.environ["MODELS_ROOT"], "incoming", "step-cache-data")
+    os.makedirs(root, exist_ok=True)
+    csv = os.path.join(root, "data.csv")
+    data_dir = str(tmp_path / "synthetic")
+
+    def write(rows, seed):
+        with open(csv, "w") as f:
+            f.write("x,y\n" + "".join(f"{i},{(i + seed) % 2}\n" for i in range(rows)))
+        make_synthetic(data_dir, rows=rows, features=3, seed=seed)
+
+    spec = {"steps": [
+        {"id": "url", "type": "train", "params": {"dataset_url": csv, "target": "y", "epochs": 1}},
+        {"id": "dir", "type": "train", "params": {"dataset": data_dir, "epochs": 1}},
+    ]}
+    write(200, 0)
+    run_pipeline(parse_steps(spec), cache=cache)
+    assert run_pipeline(parse_steps(spec), cache=cache)["cache_hits"] == ["url", "dir"]
+    # same paths, new content: both steps train again
+    write(300, 1)
+    out = run_pipeline(parse_steps(spec), cache=cache)
+    assert out["cache_hits"] == []
+    assert out["artifacts"]["url"]["rows"] == out["artifacts"]["dir"]["rows"] == 300
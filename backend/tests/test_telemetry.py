@@ -0,0 +1,51 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from src import telemetry
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def test_per_thread_cells_add_up_and_render():
+    reg = telemetry.Registry()
+    hits = telemetry.Counter("t_hits_total", "hits", ("kind",), registry=reg)
+    lat = telemetry.Histogram("t_latency_seconds", "latency", buckets=(0.1, 1.0), registry=reg)
+
+    def work():
+        for i in range(10_000):
+            hits.labels("a").inc()
+            lat.observe(0.05 if i % 2 else 0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    text = reg.render()
+    assert 't_hits_total{kind="a"} 80000' in text
+    assert 't_latency_seconds_bucket{le="0.1"} 40000' in text
+    assert 't_latency_seconds_bucket{le="1"} 80000' in text
+    assert 't_latency_seconds_bucket{le="+Inf"} 80000' in text
+    assert "t_latency_seconds_count 80000" in text
+    assert "# TYPE t_latency_seconds histogram" in text
+
+
+def test_metrics_endpoint_reports_routes_db_and_queue():
+    run_id = client.post("/api/runs", json={"pipeline": {"steps": [{"type": "noop"}]}}).json()["run_id"]
+    assert client.get(f"/api/runs/{run_id}").status_code == 200
+    client.get("/api/does-not-exist")
+
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    assert 'flowops_http_requests_total{method="GET",route="/api/runs/{run_id}",status="200"}' in text
+    assert 'route="<unmatched>",status="404"' in text
+    assert 'flowops_db_queries_total{engine="async",op="SELECT"}' in text
+    assert 'flowops_db_queries_total{engine="sync",op="INSERT"}' in text
+    assert 'flowops_db_pool_saturation{engine="sync"}' in text
+    queued = [l for l in text.splitlines() if l.startswith('flowops_runs{status="queued"}')]
+    assert queued and float(queued[0].split()[-1]) >= 1
+    assert "flowops_ws_run_subscribers 0" in text
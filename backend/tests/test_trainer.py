@@ -0,0 +1,28 @@
+import numpy as np
+
+from src.mlops.trainer import TrainConfig, load_model, make_synthetic, save_model, train
+
+
+def test_logistic_training_learns_and_reports_step_metrics(tmp_path):
+    data = make_synthetic(str(tmp_path / "d"), rows=20_000, features=8, seed=1)
+    steps = []
+    result = train(data, TrainConfig(epochs=4, batch_size=1024), on_step=steps.append)
+    assert [s["step"] for s in steps] == [1, 2, 3, 4]
+    assert steps[-1]["loss"] < steps[0]["loss"]
+    assert result["accuracy"] > 0.85 and result["rows_per_sec"] > 0
+
+    model = load_model(save_model(result["model"], str(tmp_path / "m.npz")))
+    assert np.array_equal(model["weights"], result["model"]["weights"])
+
+
+def test_pool_preprocessing_matches_inline(tmp_path):
+    data = make_synthetic(str(tmp_path / "d"), rows=5_000, features=4, seed=2)
+    inline = train(data, TrainConfig(epochs=2, batch_size=512, workers=0))
+    pooled = train(data, TrainConfig(epochs=2, batch_size=512, workers=2))
+    assert np.allclose(inline["model"]["weights"], pooled["model"]["weights"])
+
+
+def test_linear_regression_reports_r2(tmp_path):
+    data = make_synthetic(str(tmp_path / "d"), rows=10_000, features=5, task="linear", seed=3)
+    result = train(data, TrainConfig(model="linear", epochs=5, batch_size=256, lr=0.05))
+    assert result["accuracy"] > 0.9
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "ml-trainer"))
+
+import app as trainer_app  # noqa: E402
+from jobs import JobCancelled, JobQueue, QueueFull  # noqa: E402
+
+
+# job functions run in spawned pool processes, so they live at module level
+def _sleep_until_cancelled(run_id, cancelled, params):
+    deadline = time.time() + params.get("seconds", 30)
+    while time.time() < deadline:
+        if run_id in cancelled:
+            raise JobCancelled(f"run {run_id} cancelled")
+        time.sleep(0.02)
+    return {"run_id": run_id}
+
+
+def _boom(run_id, cancelled, params):
+    raise ValueError("bad dataset")
+
+
+def _wait(queue, run_id, status, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(run_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"run {run_id} still {queue.get(run_id)['status']}, expected {status}")
+
+
+@pytest.fixture
+def done():
+    return []
+
+
+@pytest.fixture
+def queue(done):
+    q = JobQueue(_sleep_until_cancelled, workers=1, max_queued=1,
+                 on_done=lambda job, result: done.append((job["run_id"], job["status"], result)))
+    yield q
+    q.shutdown()
+
+
+def test_submit_queue_and_cancel(queue, done):
+    first = queue.submit(1)
+    assert first["status"] == "running"
+    assert queue.submit(1)["submitted_at"] == first["submitted_at"]   # duplicate: the active job
+
+    assert queue.submit(2)["status"] == "queued"
+    with pytest.raises(QueueFull):
+        queue.submit(3)
+
+    # queued: dropped without ever running
+    assert queue.cancel(2)["status"] == "cancelled"
+    assert done == [(2, "cancelled", None)]
+
+    # running: cancelled through the shared dict, the job sees it between steps
+    assert queue.cancel(1)["status"] == "cancelling"
+    _wait(queue, 1, "cancelled")
+    assert done[-1] == (1, "cancelled", None)
+    assert queue.stats()["running"] == 0
+
+
+def test_finished_and_failed_jobs(done):
+    q = JobQueue(_sleep_until_cancelled, workers=1,
+                 on_done=lambda job, result: done.append((job["run_id"], job["status"], result)))
+    try:
+        q.submit(1, {"seconds": 0})
+        _wait(q, 1, "succeeded")
+    finally:
+        q.shutdown()
+    assert done == [(1, "succeeded", {"run_id": 1})]
+
+    q = JobQueue(_boom, workers=1)
+    try:
+        q.submit(2)
+        job = _wait(q, 2, "failed")
+    finally:
+        q.shutdown()
+    assert job["error"] == "bad dataset"
+
+
+def test_start_answers_429_when_the_queue_is_full(monkeypatch):
+    monkeypatch.setattr(trainer_app, "jobs", JobQueue(_boom, workers=1, max_queued=0))
+    r = TestClient(trainer_app.app).post("/start/7", json={"params": {}})
+    assert r.status_code == 429 and r.headers["Retry-After"] == "10"
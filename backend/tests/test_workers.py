@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from src.agents import workers
+from src.agents.workers import SessionLocal, claim_runs, process_run, utcnow_naive
+from src.models import Run, RunEvent, RunStatus
+
+
+def _queue_runs(n: int):
+    with SessionLocal() as db:
+        runs = [Run(status=RunStatus.queued) for _ in range(n)]
+        db.add_all(runs)
+        db.commit()
+        return [r.id for r in runs]
+
+
+def _drain_queue():
+    with SessionLocal() as db:
+        while claim_runs(db, 100, worker_id="drain"):
+            pass
+
+
+def test_claims_are_disjoint_and_bounded():
+    _drain_queue()
+    ids = _queue_runs(5)
+    with SessionLocal() as db:
+        a = claim_runs(db, 3, worker_id="a")
+        b = claim_runs(db, 3, worker_id="b")
+    assert len(a) == 3 and len(b) == 2
+    assert sorted(a + b) == ids
+    with SessionLocal() as db:
+        assert db.get(Run, a[0]).claimed_by == "a"
+        assert db.get(Run, a[0]).status == RunStatus.running
+
+
+def test_expired_lease_is_reclaimed():
+    _drain_queue()
+    (run_id,) = _queue_runs(1)
+    with SessionLocal() as db:
+        assert claim_runs(db, 1, worker_id="dead") == [run_id]
+        db.get(Run, run_id).lease_expires_at = utcnow_naive() - timedelta(seconds=1)
+        db.commit()
+        assert claim_runs(db, 1, worker_id="alive") == [run_id]
+        assert db.get(Run, run_id).claimed_by == "alive"
+
+
+def test_process_run_completes_only_with_lease(monkeypatch):
+    monkeypatch.setattr(workers, "STEP_SECONDS", 0)
+    _drain_queue()
+    (run_id,) = _queue_runs(1)
+    with SessionLocal() as db:
+        claim_runs(db, 1, worker_id="w1")
+    process_run(run_id, worker_id="someone-else")
+    with SessionLocal() as db:
+        assert db.get(Run, run_id).status == RunStatus.running
+    process_run(run_id, worker_id="w1")
+    with SessionLocal() as db:
+        assert db.get(Run, run_id).status == RunStatus.completed
+        titles = [e.title for e in db.query(RunEvent).filter(RunEvent.run_id == run_id)]
+        assert titles.count("Run completed") == 1
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.models import RunEvent
+from src.server.main import app
+
+client = TestClient(app)
+
+
+def _add_event(run_id: int, title: str):
+    with SessionLocal() as db:
+        db.add(RunEvent(run_id=run_id, level="info", title=title))
+        db.commit()
+
+
+def test_ws_replays_then_pushes_new_events():
+    run_id = client.post("/api/runs", json={"pipeline": {"steps": []}}).json()["run_id"]
+    with client.websocket_connect(f"/ws/runs/{run_id}") as ws:
+        first = ws.receive_json()
+        assert first["title"] == "Run queued"
+        _add_event(run_id, "Step 1")
+        assert ws.receive_json()["title"] == "Step 1"
+
+
+def test_ws_resumes_from_last_id():
+    run_id = client.post("/api/runs", json={"pipeline": {"steps": []}}).json()["run_id"]
+    _add_event(run_id, "Step 1")
+    with client.websocket_connect(f"/ws/runs/{run_id}") as ws:
+        queued = ws.receive_json()
+        ws.receive_json()
+    with client.websocket_connect(f"/ws/runs/{run_id}?last_id={queued['id']}") as ws:
+        assert ws.receive_json()["title"] == "Step 1"
@@ -6,6 +6,21 @@ export async function apiGet(path) {
   return r.json();
 }
 
+// List endpoints return one page (newest first) and the next page's cursor in
+// the X-Next-Cursor header; this follows the cursors and returns every row.
+export async function apiGetAll(path, pageSize = 500) {
+  const rows = [];
+  let after = null;
+  do {
+    const sep = path.includes("?") ? "&" : "?";
+    const r = await fetch(`${API}${path}${sep}limit=${pageSize}${after ? `&after=${after}` : ""}`);
+    if (!r.ok) throw new Error(await r.text());
+    rows.push(...(await r.json()));
+    after = r.headers.get("X-Next-Cursor");
+  } while (after);
+  return rows;
+}
+
 export async function apiPost(path, body) {
   const r = await fetch(`${API}${path}`, {
     method: "POST",
@@ -32,3 +47,43 @@ export function connectRunEvents(runId, onEvent) {
   };
   return ws;
 }
+
+// --- app generation progress ---
+// Streams {status, stage, progress, detail} from /ws/apps/{id} until the build
+// is "ready" or "error"; if the socket drops first, polls /appgen/apps/{id}.
+// Returns a function that stops listening.
+export function watchAppBuild(appId, onUpdate) {
+  const wsProto = location.protocol === "https:" ? "wss" : "ws";
+  const ws = new WebSocket(`${wsProto}://${location.host}/ws/apps/${appId}`);
+  let done = false;
+  let timer = null;
+
+  const finish = (ev) => {
+    onUpdate(ev);
+    if (ev.status === "ready" || ev.status === "error") {
+      done = true;
+      ws.close();
+    }
+  };
+
+  const poll = async () => {
+    if (done) return;
+    try {
+      const a = await apiGet(`/appgen/apps/${appId}`);
+      finish({ status: a.status, stage: a.status === "building" ? "building" : "done",
+               progress: a.status === "building" ? null : 100, detail: a.error });
+    } catch {}
+    if (!done) timer = setTimeout(poll, 2000);
+  };
+
+  ws.onmessage = (msg) => {
+    try { finish(JSON.parse(msg.data)); } catch {}
+  };
+  ws.onclose = () => { if (!done) poll(); };
+
+  return () => {
+    done = true;
+    clearTimeout(timer);
+    ws.close();
+  };
+}
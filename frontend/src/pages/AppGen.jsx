@@ -1,5 +1,5 @@
-import React, { useState } from "react";
-import { apiPost } from "../api";
+import React, { useEffect, useState } from "react";
+import { apiPost, watchAppBuild } from "../api";
 import { useNavigate } from "react-router-dom";
 
 export default function AppGen() {
@@ -8,12 +8,22 @@ export default function AppGen() {
   const [spec, setSpec] = useState("// describe your app here");
   const [busy, setBusy] = useState(false);
   const [last, setLast] = useState(null);
+  const [build, setBuild] = useState(null); // latest {status, stage, progress, detail}
   const navigate = useNavigate();
 
+  // builds run in the background: follow the progress stream of the current app
+  useEffect(() => {
+    if (!last?.app_id || !last.building) return;
+    return watchAppBuild(last.app_id, setBuild);
+  }, [last]);
+
+  const ready = last && (!last.building || build?.status === "ready");
+
   async function onGenerate(e) {
     e?.preventDefault?.();
     setBusy(true);
     setLast(null);
+    setBuild(null);
     try {
       // 1) Generate (your existing generator endpoint)
       // Expecting response to include: app_id (optional), preview_url, zip_url
@@ -26,12 +36,15 @@ export default function AppGen() {
 
       const appName = gen.name || name;
       const preview_url = gen.preview_url || (gen.app_id ? `/api/apps/${gen.app_id}` : null);
-      const zip_url = gen.zip_url || null;
+      const zip_url = gen.zip_url || gen.download_url || null;
 
-      setLast({ preview_url, zip_url });
+      // a queued build (status "building") has no files until it is ready
+      setLast({ app_id: gen.app_id, building: gen.status === "building", preview_url, zip_url });
+      if (gen.status === "building") setBuild({ status: "building", stage: "queued", progress: 0 });
 
-      // 2) Register in DB (new endpoint)
-      try {
+      // 2) Register in DB (new endpoint) — the queued generator already
+      //    created the row (status "building"), so only older backends need this
+      if (!gen.status) try {
         await apiPost("/apps", {
           name: appName,
           template,
@@ -91,11 +104,24 @@ export default function AppGen() {
       {last && (
         <div className="card">
           <div className="badge mb-3">Result</div>
+          {build?.status === "building" && (
+            <div className="mb-3 text-sm text-white/70">
+              Building… {build.stage}{build.progress != null ? ` (${build.progress}%)` : ""}
+              {build.progress != null && (
+                <div className="h-1 mt-1 bg-white/10 rounded">
+                  <div className="h-1 bg-white/60 rounded" style={{ width: `${build.progress}%` }} />
+                </div>
+              )}
+            </div>
+          )}
+          {build?.status === "error" && (
+            <div className="mb-3 text-sm text-red-400">Build failed: {build.detail || "unknown error"}</div>
+          )}
           <div className="flex gap-2">
-            {last.preview_url && (
+            {ready && last.preview_url && (
               <a className="btn" href={last.preview_url} target="_blank" rel="noreferrer">Open Preview</a>
             )}
-            {last.zip_url && (
+            {ready && last.zip_url && (
               <a className="btn" href={last.zip_url}>Download ZIP</a>
             )}
             <button className="btn" onClick={() => navigate("/apps")}>Go to “My Apps”</button>
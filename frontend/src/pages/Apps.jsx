@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { apiGet, apiDelete } from "../api";
+import { apiGetAll, apiDelete } from "../api";
 
 export default function Apps() {
   const [apps, setApps] = useState(null);
@@ -7,7 +7,7 @@ export default function Apps() {
 
   async function load() {
     try {
-      const data = await apiGet("/apps");
+      const data = await apiGetAll("/apps");
       setApps(data);
     } finally {
       setLoading(false);
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { apiGet } from "../api";
+import { apiGetAll } from "../api";
 
 export default function Models() {
   const [models, setModels] = useState([]);
@@ -10,7 +10,7 @@ export default function Models() {
     let mounted = true;
     (async () => {
       try {
-        const data = await apiGet("/models");
+        const data = await apiGetAll("/models");
         if (mounted) setModels(data);
       } catch (e) {
         console.error(e);
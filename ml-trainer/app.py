@@ -1,66 +1,217 @@
 # ml-trainer/app.py
 import os
-import time
-import json
-import requests
-from fastapi import FastAPI
-from pydantic import BaseModel
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel, Field
+
+from callback_client import get_client
+from jobs import JobCancelled, JobQueue, QueueFull
+from src import telemetry
+from src.mlops.trainer import TrainConfig, make_synthetic, save_model, train
 
 app = FastAPI(title="FlowOpsAI Trainer")
+if telemetry.ENABLED:
+    app.add_middleware(telemetry.HTTPMetrics, prefix="trainer_http")
 
 BACKEND_BASE = os.getenv("BACKEND_BASE_URL", "http://backend-server:8181")
-POST_EVENT_URL = lambda run_id: f"{BACKEND_BASE}/api/runs/{run_id}/events"
-PUT_METRICS_URL = lambda run_id: f"{BACKEND_BASE}/api/runs/{run_id}/metrics"
-COMPLETE_URL = lambda run_id: f"{BACKEND_BASE}/api/runs/{run_id}/complete"
+PARTS_URL = lambda model_id: f"{BACKEND_BASE}/api/models/{model_id}/parts"
+
+MODELS_DIR = os.getenv("MODELS_ROOT", "/models")
+
+# push artifacts over HTTP instead of relying on the shared /models volume
+ARTIFACT_UPLOAD = os.getenv("ARTIFACT_UPLOAD", "0") == "1"
+UPLOAD_PART_BYTES = int(os.getenv("UPLOAD_PART_BYTES", str(64 * 1024 * 1024)))
+UPLOAD_PARALLEL = int(os.getenv("UPLOAD_PARALLEL", "4"))
 
 class StartOut(BaseModel):
     ok: bool = True
+    run_id: Optional[int] = None
+    status: Optional[str] = None
 
+# buffered, batched and retried in the background (see callback_client.py);
+# neither call blocks the training loop or raises when the backend is down
 def post_event(run_id: int, level: str, title: str, detail: str = ""):
-    payload = {"level": level, "title": title, "detail": detail}
-    r = requests.post(POST_EVENT_URL(run_id), json=payload, timeout=10)
-    r.raise_for_status()
+    get_client(BACKEND_BASE).event(run_id, level, title, detail)
 
 def put_metrics(run_id: int, metrics: dict):
-    r = requests.put(PUT_METRICS_URL(run_id), json={"metrics": metrics}, timeout=10)
+    get_client(BACKEND_BASE).metrics(run_id, metrics)
+
+def _read_part(path: str, part_number: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek((part_number - 1) * UPLOAD_PART_BYTES)
+        return f.read(UPLOAD_PART_BYTES)
+
+def upload_artifact(model_id: int, path: str):
+    # chunked upload; parts already on the server (earlier attempt) are skipped
+    size = os.path.getsize(path)
+    n_parts = max(1, -(-size // UPLOAD_PART_BYTES))
+    session = get_client(BACKEND_BASE).session
+    r = session.get(PARTS_URL(model_id), timeout=10)
     r.raise_for_status()
+    have = {p["part_number"]: p["sha256"] for p in r.json()["parts"]}
+
+    def send(part_number: int):
+        body = _read_part(path, part_number)
+        digest = hashlib.sha256(body).hexdigest()
+        if have.get(part_number) == digest:
+            return
+        r = session.post(PARTS_URL(model_id), params={"part_number": part_number}, data=body,
+                          headers={"X-Part-SHA256": digest, "Content-Type": "application/octet-stream"},
+                          timeout=300)
+        r.raise_for_status()
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_PARALLEL) as pool:
+        list(pool.map(send, range(1, n_parts + 1)))
+
+    whole = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            whole.update(block)
+    r = session.post(f"{PARTS_URL(model_id)}:complete", timeout=600, json={
+        "filename": os.path.basename(path), "parts": n_parts, "sha256": whole.hexdigest(),
+    })
+    r.raise_for_status()
+    return r.json()
 
 @app.get("/")
 def root():
     return {"status": "trainer ok"}
 
-@app.post("/start/{run_id}", response_model=StartOut)
-def start_training(run_id: int):
+def _train(run_id: int, cancelled, params: Optional[dict] = None) -> Optional[dict]:
+    # runs in a pool process; `cancelled` is the queue's shared run_id set
+    try:
+        return _run_training(run_id, cancelled, params)
+    except BaseException:
+        # the run's events land before the queue reports it failed/cancelled (_job_done)
+        get_client(BACKEND_BASE).flush()
+        raise
+
+def _run_training(run_id: int, cancelled, params: Optional[dict] = None) -> dict:
+    params = dict(params or {})
+
+    def check_cancel():
+        if run_id in cancelled:
+            raise JobCancelled(f"run {run_id} cancelled")
+
     # Notify: started
     post_event(run_id, "info", "Run started", "Trainer picked up run")
 
-    # Fake steps & rolling metrics
-    for i in range(1, 4):
-        time.sleep(2)
-        # pretend metric improves each step
-        metrics = {
-            "step": i,
-            "accuracy": round(0.70 + i * 0.08, 3),
-            "loss": round(0.9 - i * 0.2, 3),
-        }
+    models_dir = MODELS_DIR
+    dataset = params.pop("dataset", None)
+    generated = not dataset
+    if generated:
+        # no dataset given: train on a generated one so the run still does real work
+        dataset = os.path.join(models_dir, f"run-{run_id}", "synthetic")
+        make_synthetic(dataset, rows=int(params.pop("rows", 200_000)), features=int(params.pop("features", 20)),
+                       task=params.get("model", "logistic"))
+
+    def on_step(metrics: dict):
+        check_cancel()
         put_metrics(run_id, metrics)
-        post_event(run_id, "info", f"Step {i}", f"Trainer finished step {i}")
-
-    # Simulate writing a tiny “artifact”
-    models_dir = "/models"
-    os.makedirs(models_dir, exist_ok=True)
-    artifact_path = os.path.join(models_dir, f"run-{run_id}", "model.bin")
-    os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
-    with open(artifact_path, "wb") as f:
-        f.write(b"\x00\x01\x02\x03")
-
-    # Notify: completed + register model
-    post_event(run_id, "info", "Run completed", "All steps done in trainer")
-    r = requests.post(
-        COMPLETE_URL(run_id),
-        json={"model_name": f"model-run-{run_id}", "model_path": artifact_path},
-        timeout=10,
-    )
-    r.raise_for_status()
+        post_event(run_id, "info", f"Step {metrics['step']}",
+                   f"accuracy {metrics['accuracy']:.4f}, loss {metrics['loss']:.4f}")
+
+    try:
+        check_cancel()
+        result = train(dataset, TrainConfig.from_params(params), on_step=on_step)
+        check_cancel()
+    finally:
+        if generated:
+            shutil.rmtree(dataset, ignore_errors=True)
+
+    artifact_path = save_model(result["model"], os.path.join(models_dir, f"run-{run_id}", "model.bin"))
+
+    # Notify: completed + register model (retried, spilled to disk if the backend is down).
+    # An uploading trainer needs the model id right away, so its completion is
+    # retried for a while but never spilled: replayed later, it would register a
+    # model whose artifact is never sent; the run is reported failed instead.
+    post_event(run_id, "info", "Run completed",
+               f"{result['rows']} rows x {result['epochs']} epochs at {result['rows_per_sec']:.0f} rows/s")
+    reply = get_client(BACKEND_BASE).complete(run_id, {
+        "model_name": f"model-run-{run_id}",
+        "model_path": None if ARTIFACT_UPLOAD else artifact_path,
+        "metrics": {"accuracy": result["accuracy"], "loss": result["loss"], "rows_per_sec": result["rows_per_sec"]},
+    }, spill=not ARTIFACT_UPLOAD)
+    if ARTIFACT_UPLOAD:
+        if reply is None:
+            raise RuntimeError("backend unreachable: model not registered, artifact not uploaded")
+        upload_artifact(reply["model_id"], artifact_path)
+    # picked up by the queue's on_done hook in the API process
+    return {"rows": result["rows"], "epochs": result["epochs"], "rows_per_sec": result["rows_per_sec"]}
+
+# --- metrics (GET /metrics); jobs run in pool processes, so everything is
+# observed here in the API process when a job finishes ---
+JOBS_FINISHED = telemetry.Counter("trainer_jobs_finished_total", "Training jobs by final status", ("status",))
+JOB_SECONDS = telemetry.Histogram("trainer_job_duration_seconds", "Training job run time",
+                                  buckets=telemetry.DURATION_BUCKETS)
+JOB_WAIT_SECONDS = telemetry.Histogram("trainer_job_queue_wait_seconds", "Time from submit to a free worker",
+                                       buckets=telemetry.DURATION_BUCKETS)
+ROWS_TRAINED = telemetry.Counter("trainer_rows_trained_total", "Rows x epochs processed by finished jobs")
+LAST_ROWS_PER_SEC = telemetry.Gauge("trainer_last_rows_per_second", "Training throughput of the latest finished job")
+QUEUE = telemetry.Gauge("trainer_queue", "Job queue state (queue_depth, running, workers, utilization)", ("stat",))
+
+def _job_done(job: dict, result: Optional[dict]):
+    JOBS_FINISHED.labels(job["status"]).inc()
+    if job["status"] in ("failed", "cancelled"):
+        # the backend marks the run failed; buffered, as this runs under the queue lock
+        get_client(BACKEND_BASE).fail(job["run_id"], job["status"], job["error"])
+    if job["started_at"]:
+        JOB_WAIT_SECONDS.observe(job["started_at"] - job["submitted_at"])
+        JOB_SECONDS.observe(job["finished_at"] - job["started_at"])
+    if result:
+        ROWS_TRAINED.inc(result["rows"] * result["epochs"])
+        LAST_ROWS_PER_SEC.set(result["rows_per_sec"])
+
+# training runs off the API process: bounded pool, jobs wait in this queue
+jobs = JobQueue(_train, on_done=_job_done)
+
+def _queue_stats():
+    stats = jobs.stats()
+    for key in ("queue_depth", "running", "workers", "utilization", "avg_utilization"):
+        QUEUE.labels(key).set(stats[key])
+
+telemetry.REGISTRY.add_collector(_queue_stats)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(telemetry.REGISTRY.render(), media_type=telemetry.CONTENT_TYPE)
+
+@app.on_event("shutdown")
+def _shutdown():
+    jobs.shutdown()
+
+class StartIn(BaseModel):
+    # optional: dataset dir (X.npy / y.npy) or rows/features for a synthetic
+    # one, plus any TrainConfig field (model, epochs, batch_size, lr, workers, threads)
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+@app.post("/start/{run_id}", response_model=StartOut, status_code=202)
+def start_training(run_id: int, body: Optional[StartIn] = None):
+    # returns as soon as the job is queued; follow it via GET /jobs/{run_id}
+    try:
+        job = jobs.submit(run_id, (body.params if body else {}))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    return StartOut(run_id=run_id, status=job["status"])
+
+@app.get("/jobs")
+def list_jobs():
+    return {"stats": jobs.stats(), "jobs": jobs.list()}
+
+@app.get("/jobs/{run_id}")
+def get_job(run_id: int):
+    job = jobs.get(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
 
-    return StartOut()
+@app.delete("/jobs/{run_id}")
+def cancel_job(run_id: int):
+    job = jobs.cancel(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
@@ -0,0 +1,221 @@
+# ml-trainer/callback_client.py
+# Trainer -> backend callbacks.
+#
+# One pooled keep-alive session per process. Events and metric steps are
+# buffered and sent in the background as /events:batch and /metrics:batch
+# calls, so a training step never waits on the network. Every request is
+# retried with exponential backoff and jitter under a stable Idempotency-Key.
+# If the backend stays down, requests are appended to a per-process spill
+# file under CALLBACK_SPILL_DIR and replayed, in order, once it answers again.
+# A failing callback never aborts the training run.
+import atexit
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BATCH_SIZE = int(os.getenv("CALLBACK_BATCH_SIZE", "200"))
+FLUSH_INTERVAL = float(os.getenv("CALLBACK_FLUSH_MS", "500")) / 1000
+MAX_RETRIES = int(os.getenv("CALLBACK_MAX_RETRIES", "5"))
+BACKOFF = float(os.getenv("CALLBACK_BACKOFF", "0.2"))
+MAX_BACKOFF = 10.0
+POOL_SIZE = int(os.getenv("CALLBACK_POOL_SIZE", "8"))
+TIMEOUT = float(os.getenv("CALLBACK_TIMEOUT", "10"))
+SPILL_DIR = os.getenv("CALLBACK_SPILL_DIR", "/tmp/flowopsai-callbacks")
+# how long complete(spill=False) keeps retrying before giving up
+COMPLETE_WAIT = float(os.getenv("CALLBACK_COMPLETE_WAIT", "300"))
+
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CallbackClient:
+    def __init__(self, base_url: str, spill_dir: str = SPILL_DIR, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, max_retries: int = MAX_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = os.path.join(spill_dir, f"spill-{os.getpid()}.jsonl")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.sent = self.retried = self.spilled = self.replayed = self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()   # one flush at a time keeps request order
+        self._events: Dict[int, List[Dict[str, Any]]] = {}
+        self._steps: Dict[int, Dict[int, Dict[str, float]]] = {}   # run -> step -> values
+        self._latest: Dict[int, Dict[str, Any]] = {}              # run -> merged snapshot
+        self._failed: Dict[int, Dict[str, Any]] = {}              # run -> terminal status
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="callback-flusher", daemon=True)
+        self._thread.start()
+
+    # --- producers (never block on the network) ---
+    def event(self, run_id: int, level: str, title: str, detail: str = ""):
+        ev = {"level": level, "title": title, "detail": detail,
+              "ts": datetime.now(timezone.utc).isoformat()}
+        with self._lock:
+            self._events.setdefault(run_id, []).append(ev)
+            n = len(self._events[run_id])
+        if n >= self.batch_size:
+            self._wake.set()
+
+    def metrics(self, run_id: int, metrics: Dict[str, Any]):
+        with self._lock:
+            self._latest.setdefault(run_id, {}).update(metrics)
+            step = metrics.get("step")
+            if isinstance(step, int) and not isinstance(step, bool):
+                self._steps.setdefault(run_id, {}).setdefault(step, {}).update({
+                    k: float(v) for k, v in metrics.items()
+                    if k != "step" and isinstance(v, (int, float)) and not isinstance(v, bool)
+                })
+
+    def fail(self, run_id: int, status: str = "failed", error: Optional[str] = None):
+        # the run ended without completing ("failed" or "cancelled"); sent after
+        # everything already buffered for it
+        with self._lock:
+            self._failed[run_id] = {"status": status, "error": error}
+        self._wake.set()
+
+    def complete(self, run_id: int, body: Dict[str, Any], spill: bool = True,
+                 wait: float = COMPLETE_WAIT) -> Optional[Dict[str, Any]]:
+        # everything the run sent goes out first; returns the backend's reply
+        # (None when the completion was spilled or not delivered). With
+        # spill=False it is retried for up to `wait` seconds and never replayed
+        # later: for callers that need the reply to go on (artifact upload)
+        # and fail the run without it.
+        self.flush()
+        path, key = f"/api/runs/{run_id}/complete", f"complete-{run_id}"
+        if spill:
+            return self._send("POST", path, body, key=key)
+        deadline = time.monotonic() + wait
+        while True:
+            delivered, reply = self._request("POST", path, body, key, self.max_retries + 1)
+            if delivered is not None or time.monotonic() >= deadline:
+                return reply
+
+    # --- sending ---
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, {}
+            steps, self._steps = self._steps, {}
+            latest, self._latest = self._latest, {}
+            failed, self._failed = self._failed, {}
+        with self._send_lock:
+            backend_up = self._drain_spill()
+            for run_id, evs in events.items():
+                for i in range(0, len(evs), self.batch_size):
+                    self._send("POST", f"/api/runs/{run_id}/events:batch", {"events": evs[i:i + self.batch_size]},
+                               key=uuid.uuid4().hex, retry=backend_up)
+            for run_id, by_step in steps.items():
+                keys = sorted({k for values in by_step.values() for k in values})
+                order = sorted(by_step)
+                series = {k: [by_step[s].get(k) for s in order] for k in keys}
+                self._send("POST", f"/api/runs/{run_id}/metrics:batch", {"steps": order, "series": series},
+                           retry=backend_up)
+            for run_id, snapshot in latest.items():
+                # the run's current metrics (merge is idempotent, no key needed)
+                self._send("PUT", f"/api/runs/{run_id}/metrics", {"metrics": snapshot}, retry=backend_up)
+            for run_id, body in failed.items():
+                self._send("POST", f"/api/runs/{run_id}/fail", body, key=f"fail-{run_id}", retry=backend_up)
+
+    def _request(self, method: str, path: str, body: Dict[str, Any], key: Optional[str],
+                 attempts: int):
+        # -> (delivered, reply); delivered is None when a later retry may still succeed
+        headers = {"Idempotency-Key": key} if key else {}
+        for attempt in range(attempts):
+            try:
+                r = self.session.request(method, self.base_url + path, json=body, headers=headers, timeout=TIMEOUT)
+                if r.status_code < 400:
+                    self.sent += 1
+                    return True, (r.json() if r.content else {})
+                if r.status_code not in RETRY_STATUS:
+                    # the backend rejected it (404 run, 422 ...): retrying can't help
+                    self.dropped += 1
+                    print(f"[callbacks] {method} {path} rejected: {r.status_code} {r.text[:200]}")
+                    return False, None
+                delay = float(r.headers.get("Retry-After") or 0)
+            except requests.RequestException:
+                delay = 0.0
+            if attempt + 1 < attempts:
+                self.retried += 1
+                time.sleep(max(delay, min(MAX_BACKOFF, BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)))
+        return None, None
+
+    def _send(self, method: str, path: str, body: Dict[str, Any], key: Optional[str] = None,
+              retry: bool = True) -> Optional[Dict[str, Any]]:
+        delivered, reply = self._request(method, path, body, key, self.max_retries + 1 if retry else 1)
+        if delivered is None:
+            self._spill({"method": method, "path": path, "body": body, "key": key})
+        return reply
+
+    # --- spill file ---
+    def _spill(self, req: Dict[str, Any]):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(req) + "\n")
+        self.spilled += 1
+
+    def _drain_spill(self) -> bool:
+        # replay spilled requests (ours and those of dead processes) in order;
+        # False while the backend is still unreachable
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "spill-*.jsonl"))):
+            claimed = f"{path}.{os.getpid()}.draining"
+            try:
+                os.replace(path, claimed)   # only one process replays a file
+            except OSError:
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                pending = [json.loads(line) for line in f if line.strip()]
+            for i, req in enumerate(pending):
+                delivered, _ = self._request(req["method"], req["path"], req["body"], req.get("key"), 1)
+                if delivered is None:
+                    # still down: keep this one and everything behind it, in order
+                    for rest in pending[i:]:
+                        self._spill(rest)
+                    os.remove(claimed)
+                    return False
+                self.replayed += 1
+            os.remove(claimed)
+        return True
+
+    # --- background flusher ---
+    def _loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:   # keep flushing whatever happens
+                print(f"[callbacks] flush failed: {e}")
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+_client: Optional[CallbackClient] = None
+_client_pid: Optional[int] = None
+
+
+def get_client(base_url: str) -> CallbackClient:
+    # one per process (pool workers each get their own session and spill file)
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client, _client_pid = CallbackClient(base_url), os.getpid()
+        atexit.register(_client.close)
+    return _client
@@ -0,0 +1,178 @@
+# ml-trainer/jobs.py
+# Training job queue: jobs wait here and are handed to a bounded process
+# pool only when a worker is free, so the queue depth, what is running and
+# how busy the pool is are all known in this process.
+#
+# Cancelling a queued job just drops it; a running job is cancelled
+# cooperatively: the job function gets a shared `cancelled` mapping and checks
+# `run_id in cancelled` between steps.
+# Every job that ends, including a queued one that is cancelled, goes through
+# the on_done hook exactly once.
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+WORKERS = int(os.getenv("TRAINER_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+MAX_QUEUED = int(os.getenv("TRAINER_MAX_QUEUED", "100"))
+START_METHOD = os.getenv("TRAINER_MP_START", "spawn")   # no fork() of a threaded server
+KEEP_FINISHED = 500
+
+ACTIVE = ("queued", "running", "cancelling")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, fn: Callable[..., Any], workers: int = WORKERS, max_queued: int = MAX_QUEUED,
+                 on_done: Optional[Callable[[Dict[str, Any], Any], None]] = None):
+        self.fn = fn   # fn(run_id, cancelled, params), module level so it pickles
+        # on_done(job, fn's return value or None), e.g. for metrics; runs with the
+        # queue lock held, so it must not block
+        self.on_done = on_done
+        self.workers = workers
+        self.max_queued = max_queued
+        self._lock = threading.RLock()   # done-callbacks may run inline in submit()
+        self._pending: deque = deque()
+        self._params: Dict[int, Dict[str, Any]] = {}
+        self._jobs: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._cancelled = None
+        self._running = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.time()
+
+    def _ensure_pool(self):
+        # lazy: importing the module (as spawned children do) starts nothing
+        if self._pool is None:
+            ctx = mp.get_context(START_METHOD)
+            self._manager = ctx.Manager()
+            self._cancelled = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+
+    # --- API ---
+    def submit(self, run_id: int, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._lock:
+            job = self._jobs.get(run_id)
+            if job is not None and job["status"] in ACTIVE:
+                return dict(job)   # already queued/running: starting twice is a no-op
+            if len(self._pending) >= self.max_queued:
+                raise QueueFull(f"{len(self._pending)} jobs already queued")
+            self._ensure_pool()
+            self._cancelled.pop(run_id, None)
+            job = {"run_id": run_id, "status": "queued", "submitted_at": time.time(),
+                   "started_at": None, "finished_at": None, "error": None}
+            self._jobs[run_id] = job
+            self._jobs.move_to_end(run_id)
+            self._params[run_id] = params or {}
+            self._pending.append(run_id)
+            self._dispatch()
+            self._trim()
+            return dict(job)
+
+    def cancel(self, run_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(run_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                self._pending.remove(run_id)
+                self._params.pop(run_id, None)
+                job.update(status="cancelled", finished_at=time.time())
+                self._finish(job, None)
+            elif job["status"] == "running":
+                self._cancelled[run_id] = True
+                job["status"] = "cancelling"
+            return dict(job)
+
+    def get(self, run_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(run_id)
+            return dict(job) if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values())]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            busy = self._busy_seconds + sum(
+                now - j["started_at"] for j in self._jobs.values()
+                if j["status"] in ("running", "cancelling") and j["started_at"]
+            )
+            uptime = max(now - self._started_at, 1e-9)
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queue_depth": len(self._pending),
+                "max_queued": self.max_queued,
+                "utilization": self._running / self.workers,
+                # share of worker-time spent on jobs since start
+                "avg_utilization": min(1.0, busy / (uptime * self.workers)),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            for run_id in list(self._pending):
+                self._jobs[run_id].update(status="cancelled", finished_at=time.time())
+                self._finish(self._jobs[run_id], None)
+            self._pending.clear()
+            if self._cancelled is not None:
+                for run_id, job in self._jobs.items():
+                    if job["status"] == "running":
+                        self._cancelled[run_id] = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+
+    # --- internals (called with the lock held) ---
+    def _dispatch(self):
+        while self._pending and self._running < self.workers:
+            run_id = self._pending.popleft()
+            job = self._jobs[run_id]
+            job.update(status="running", started_at=time.time())
+            self._running += 1
+            fut = self._pool.submit(self.fn, run_id, self._cancelled, self._params.pop(run_id, {}))
+            fut.add_done_callback(lambda f, run_id=run_id: self._done(run_id, f))
+
+    def _done(self, run_id: int, fut):
+        with self._lock:
+            self._running -= 1
+            job = self._jobs.get(run_id)
+            if job is not None:
+                now = time.time()
+                self._busy_seconds += now - (job["started_at"] or now)
+                job["finished_at"] = now
+                exc = fut.exception() if not fut.cancelled() else None
+                if fut.cancelled() or isinstance(exc, JobCancelled):
+                    job["status"] = "cancelled"
+                elif exc is not None:
+                    job.update(status="failed", error=str(exc))
+                else:
+                    job["status"] = "succeeded"
+                self._finish(job, fut.result() if job["status"] == "succeeded" else None)
+            self._cancelled.pop(run_id, None)
+            self._dispatch()
+
+    def _finish(self, job: Dict[str, Any], result: Any):
+        if self.on_done is not None:
+            try:
+                self.on_done(dict(job), result)
+            except Exception as e:
+                print(f"[jobs] on_done hook failed for run {job['run_id']}: {e}")
+
+    def _trim(self):
+        finished = [r for r, j in self._jobs.items() if j["status"] not in ACTIVE]
+        for run_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[run_id]